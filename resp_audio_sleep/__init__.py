@@ -1,4 +1,25 @@
-from . import detector, record, tasks, utils, viz
+from importlib import import_module
+
+from . import utils
 from ._version import __version__
 from .utils.config import sys_info
-from .utils.logs import add_file_handler, set_log_level
+from .utils.logs import (
+    add_file_handler,
+    disable_queue_logging,
+    enable_queue_logging,
+    set_log_level,
+)
+
+# submodules depending on the acquisition and stimulation stack (mne, mne-lsl,
+# psychopy, stimuli, ...) are imported on first access to keep the startup fast.
+_LAZY_SUBMODULES: tuple[str, ...] = ("detector", "events", "record", "tasks", "viz")
+
+
+def __getattr__(name: str):
+    if name in _LAZY_SUBMODULES:
+        return import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(_LAZY_SUBMODULES))
@@ -5,6 +5,15 @@ from pathlib import Path
 # debugging recording
 RECORDER: bool = False  # whether to record the buffer raw data
 RECORDER_BUFSIZE: float = 300  # in seconds
+# directory in which the buffer is memory-mapped, None to keep the buffer in RAM
+RECORDER_MEMMAP: Path | None = None
+# store the buffer in float32 and save it in a compact quantized NPZ file
+RECORDER_COMPACT: bool = False
+# flight recorder, keep the last seconds in a ring dumped on demand or on bad events
+RECORDER_RING: bool = False
+RECORDER_RING_BUFSIZE: float = 60  # in seconds
+RECORDER_PATH_DUMPS: Path = Path.home() / "Documents" / "ras-data" / "dumps"
+RECORDER_DUMP_KEY: str | None = "d"  # key to request a dump, None to disable
 RECORDER_PATH_RESPIRATION: Path = (
     Path.home() / "Documents" / "ras-data" / "debug-buffer-respiration-raw.fif"
 )
@@ -12,3 +21,16 @@ RECORDER_PATH_CARDIAC: Path = (
     Path.home() / "Documents" / "ras-data" / "debug-buffer-cardiac-raw.fif"
 )
 TRG_CHANNEL: str = "TRIGGER"
+# online monitoring
+TRIGGER_MONITOR: bool = False  # match the triggers sent with the trigger channel
+TRIGGER_MONITOR_TOLERANCE: float = 0.002  # in seconds, drift and jitter alert
+ONSET_MONITOR: bool = False  # pair the sound onsets in the loopback with the stimuli
+ONSET_CHANNEL: str = "AUX9"  # channel in which the sound is looped back
+ONSET_MONITOR_THRESHOLD: float = 5000  # in the unit of the channel, ~100 of noise
+ONSET_MONITOR_TOLERANCE: float = 0.005  # in seconds, onset error alert
+# publish the confirmed peaks on an LSL outlet shared with other consumers
+PEAK_OUTLET: bool = False
+# telemetry of the resources used by the process during the paradigm
+TELEMETRY: bool = False
+TELEMETRY_INTERVAL: float = 1.0  # in seconds
+TELEMETRY_PATH: Path = Path.home() / "Documents" / "ras-data"
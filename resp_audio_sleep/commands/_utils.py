@@ -1,10 +1,88 @@
+from __future__ import annotations
+
+from importlib import import_module
+
 import click
 
+
+class LazyGroup(click.Group):
+    """Click group importing its subcommands on first use.
+
+    Parameters
+    ----------
+    *args : tuple
+        Positional arguments passed to :class:`click.Group`.
+    lazy_subcommands : dict
+        Mapping between the subcommand name and its import path, formatted as
+        ``"module:attribute"``.
+    **kwargs : dict
+        Keyword arguments passed to :class:`click.Group`.
+    """
+
+    def __init__(
+        self, *args, lazy_subcommands: dict[str, str] | None = None, **kwargs
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        if lazy_subcommands is None:
+            lazy_subcommands = dict()
+        self._lazy_subcommands = lazy_subcommands
+
+    def list_commands(self, ctx: click.Context) -> list[str]:  # noqa: D102
+        return sorted(set(super().list_commands(ctx)) | set(self._lazy_subcommands))
+
+    def get_command(self, ctx: click.Context, name: str) -> click.Command | None:  # noqa: D102
+        if name in self._lazy_subcommands:
+            return self._load(name)
+        return super().get_command(ctx, name)
+
+    def _load(self, name: str) -> click.Command:
+        """Import a lazy subcommand."""
+        module, attr = self._lazy_subcommands[name].split(":")
+        command = getattr(import_module(module), attr)
+        if not isinstance(command, click.Command):
+            raise RuntimeError(
+                f"The lazy subcommand '{name}' must resolve to a click command, got "
+                f"{type(command)} instead."
+            )
+        return command
+
+
+def use_profile() -> None:
+    """Profile the task blocks of the current subcommand if requested.
+
+    The profile directory is set by the option ``--profile`` of the group. The
+    profiled backend is used until the subcommand completes, after which the summary
+    of the session is logged.
+    """
+    ctx = click.get_current_context()
+    profile = (ctx.find_object(dict) or dict()).get("profile")
+    if profile is None:
+        return
+    from ..tasks import RealBackend, use_backend
+
+    backend = RealBackend(profile=profile)
+    ctx.with_resource(use_backend(backend))
+    ctx.call_on_close(backend.profiler.summary)
+
+
+def _split_ch_names(
+    ctx: click.Context, param: click.Parameter, value: str | None
+) -> str | list[str] | None:
+    """Split a comma-separated list of channel names."""
+    if value is None or "," not in value:
+        return value
+    return [ch_name.strip() for ch_name in value.split(",")]
+
+
 ch_name_resp = click.option(
     "--ch-name-resp",
     prompt="Respiration channel name",
-    help="Name of the respiration channel in the stream.",
+    help=(
+        "Name of the respiration channel in the stream. Several channels separated by "
+        "commas are fused."
+    ),
     type=str,
+    callback=_split_ch_names,
 )
 ch_name_ecg = click.option(
     "--ch-name-ecg",
@@ -38,3 +116,8 @@ verbose = click.option(
     show_default=True,
 )
 no_viewer = click.option("--no-viewer", help="Disable the viewer.", is_flag=True)
+inline_viewer = click.option(
+    "--inline-viewer",
+    help="Render the viewer in the detection process instead of a separate process.",
+    is_flag=True,
+)
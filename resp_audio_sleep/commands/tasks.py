@@ -4,13 +4,16 @@ import click
 import numpy as np
 
 from .. import set_log_level
-from ..tasks import asynchronous as asynchronous_task
-from ..tasks import baseline as baseline_task
-from ..tasks import isochronous as isochronous_task
-from ..tasks import synchronous_cardiac as synchronous_cardiac_task
-from ..tasks import synchronous_respiration as synchronous_respiration_task
 from ..tasks._config import BASELINE_DURATION, N_DEVIANT, N_TARGET
-from ._utils import ch_name_ecg, ch_name_resp, fq_deviant, fq_target, stream, verbose
+from ._utils import (
+    ch_name_ecg,
+    ch_name_resp,
+    fq_deviant,
+    fq_target,
+    stream,
+    use_profile,
+    verbose,
+)
 
 
 @click.command()
@@ -24,7 +27,10 @@ from ._utils import ch_name_ecg, ch_name_resp, fq_deviant, fq_target, stream, ve
 @verbose
 def baseline(duration: float, verbose: str) -> None:
     """Run a baseline task."""
+    from ..tasks import baseline as baseline_task
+
     set_log_level(verbose)
+    use_profile()
     baseline_task(duration)
 
 
@@ -40,7 +46,10 @@ def baseline(duration: float, verbose: str) -> None:
 @verbose
 def isochronous(delay: float, target: float, deviant: float, verbose: str) -> None:
     """Run an isochronous task."""
+    from ..tasks import isochronous as isochronous_task
+
     set_log_level(verbose)
+    use_profile()
     isochronous_task(delay, target=target, deviant=deviant)
 
 
@@ -59,7 +68,10 @@ def asynchronous(
     delays: tuple[float, float], target: float, deviant: float, verbose: str
 ) -> None:
     """Run an asynchronous task."""
+    from ..tasks import asynchronous as asynchronous_task
+
     set_log_level(verbose)
+    use_profile()
     # create random peak position based on the min/max delays requested
     if delays[0] <= 0:
         raise ValueError("The minimum delay must be strictly positive.")
@@ -81,7 +93,10 @@ def synchronous_respiration(
     stream: str, ch_name_resp: str, target: float, deviant: float, verbose: str
 ) -> None:
     """Run a synchronous respiration task."""
+    from ..tasks import synchronous_respiration as synchronous_respiration_task
+
     set_log_level(verbose)
+    use_profile()
     synchronous_respiration_task(stream, ch_name_resp, target=target, deviant=deviant)
 
 
@@ -107,7 +122,10 @@ def synchronous_cardiac(
     verbose: str,
 ) -> None:
     """Run a synchronous cardiac task."""
+    from ..tasks import synchronous_cardiac as synchronous_cardiac_task
+
     set_log_level(verbose)
+    use_profile()
     # create random peak position based on the min/max delays requested
     if delays[0] <= 0:
         raise ValueError("The minimum delay must be strictly positive.")
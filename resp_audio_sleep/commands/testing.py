@@ -4,10 +4,8 @@ import time
 
 import click
 import numpy as np
-from mne_lsl.lsl import local_clock
 
 from .. import set_log_level
-from ..detector import Detector
 from ..tasks._config import (
     ECG_DISTANCE,
     ECG_HEIGHT,
@@ -22,6 +20,7 @@ from ._utils import (
     ch_name_resp,
     fq_deviant,
     fq_target,
+    inline_viewer,
     no_viewer,
     stream,
     verbose,
@@ -35,15 +34,21 @@ from ._utils import (
     "--n-peaks", prompt="Number of peaks", help="Number of peaks to detect.", type=int
 )
 @no_viewer
+@inline_viewer
 @verbose
 def test_detector_respiration(
     stream: str,
     ch_name_resp: str,
     n_peaks: int,
     no_viewer: bool,
+    inline_viewer: bool,
     verbose: str,
 ) -> None:
     """Test the respiration detector settings."""
+    from mne_lsl.lsl import local_clock
+
+    from ..detector import Detector
+
     set_log_level(verbose)
     if n_peaks <= 0:
         raise ValueError("The number of peaks must be greater than 0.")
@@ -57,7 +62,7 @@ def test_detector_respiration(
         resp_prominence=RESP_PROMINENCE,
         resp_distance=RESP_DISTANCE,
         detrend=False,
-        viewer=not no_viewer,
+        viewer=False if no_viewer else True if inline_viewer else "process",
     )
     counter = 0
     while counter < n_peaks:
@@ -77,15 +82,21 @@ def test_detector_respiration(
     "--n-peaks", prompt="Number of peaks", help="Number of peaks to detect.", type=int
 )
 @no_viewer
+@inline_viewer
 @verbose
 def test_detector_cardiac(
     stream: str,
     ch_name_ecg: str,
     n_peaks: int,
     no_viewer: bool,
+    inline_viewer: bool,
     verbose: str,
 ) -> None:
     """Test the cardiac detector settings."""
+    from mne_lsl.lsl import local_clock
+
+    from ..detector import Detector
+
     set_log_level(verbose)
     if n_peaks <= 0:
         raise ValueError("The number of peaks must be greater than 0.")
@@ -98,7 +109,7 @@ def test_detector_cardiac(
         ecg_prominence=ECG_PROMINENCE,
         resp_prominence=None,
         resp_distance=None,
-        viewer=not no_viewer,
+        viewer=False if no_viewer else True if inline_viewer else "process",
     )
     counter = 0
     while counter < n_peaks:
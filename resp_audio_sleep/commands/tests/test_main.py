@@ -1,7 +1,39 @@
+import subprocess
+import sys
+
+import pytest
+from click.testing import CliRunner
+
+from resp_audio_sleep.commands.main import run
+
+# modules which must not be imported to list or configure the commands
+_HEAVY_MODULES: tuple[str, ...] = (
+    "matplotlib",
+    "mne",
+    "mne_lsl",
+    "psychopy",
+    "psychtoolbox",
+    "scipy",
+    "stimuli",
+)
+_IMPORT_TIME_BUDGET: float = 1.5  # in seconds
+
+_SCRIPT: str = """
+import sys
+import time
+
+start = time.perf_counter()
 from click.testing import CliRunner
 
 from resp_audio_sleep.commands.main import run
 
+result = CliRunner().invoke(run, {args!r})
+duration = time.perf_counter() - start
+assert result.exit_code == 0, result.output
+print(duration)
+print(",".join(sorted({{name.split(".")[0] for name in sys.modules}})))
+"""
+
 
 def test_main():
     """Test the main package entry-point."""
@@ -11,3 +43,30 @@ def test_main():
     assert "Entry point to start the tasks." in result.output
     assert "Options:" in result.output
     assert "Commands:" in result.output
+    for command in ("paradigm", "baseline", "synchronous-cardiac", "test-sequence"):
+        assert command in result.output
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        ["--help"],
+        ["baseline", "--help"],
+        ["test-detector-cardiac", "--help"],
+        ["--profile", "profiles", "test-sequence", "--help"],
+    ],
+)
+def test_main_import_time(args: list[str]):
+    """Test that the entry-point starts without loading the acquisition stack."""
+    process = subprocess.run(
+        [sys.executable, "-c", _SCRIPT.format(args=args)],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    duration, modules = process.stdout.strip().split("\n")
+    modules = set(modules.split(","))
+    assert len(modules.intersection(_HEAVY_MODULES)) == 0, modules.intersection(
+        _HEAVY_MODULES
+    )
+    assert float(duration) < _IMPORT_TIME_BUDGET
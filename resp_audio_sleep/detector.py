@@ -7,12 +7,26 @@ import numpy as np
 from mne_lsl.stream import StreamLSL
 from scipy.signal import find_peaks
 
-from ._config import RECORDER_BUFSIZE, TRG_CHANNEL
+from ._config import (
+    ONSET_CHANNEL,
+    ONSET_MONITOR_THRESHOLD,
+    ONSET_MONITOR_TOLERANCE,
+    RECORDER_BUFSIZE,
+    RECORDER_COMPACT,
+    RECORDER_MEMMAP,
+    RECORDER_PATH_DUMPS,
+    RECORDER_RING,
+    RECORDER_RING_BUFSIZE,
+    TRG_CHANNEL,
+    TRIGGER_MONITOR_TOLERANCE,
+)
+from .monitors import OnsetMonitor, TriggerMonitor
+from .outlet import PeakOutlet
 from .record import Recorder
-from .utils._checks import check_type
+from .utils._checks import check_type, check_value
 from .utils._docs import fill_doc
 from .utils.logs import logger
-from .viz import Viewer
+from .viz import Viewer, ViewerProcess
 
 if TYPE_CHECKING:
     from numpy.typing import NDArray
@@ -40,25 +54,41 @@ class Detector:
         The minimum prominence of the ECG peaks. Can be set to None which will disable
         the prominence constraint.
     resp_prominence : float | None
-        The minimum prominence of the respiration peaks.
+        The minimum prominence of the respiration peaks. If several respiration channels
+        are fused, the fused signal is standardized and the prominence is expressed in
+        standard deviations of the signal within the detection window.
     resp_distance : float | None
         The minimum distance between two respiration peaks in seconds.
     detrend : bool
         If True, apply a linear detrending prior to peak detection.
-    viewer : bool
+    viewer : bool | ``"process"``
         If True, a viewer will be created to display the real-time signal and detected
         peaks. Useful for debugging or calibration, but should be set to False for
-        production.
+        production. If ``"process"``, the viewer runs in a separate process fed through
+        shared memory, which offloads the rendering from the detection.
     recorder : bool
-        If True, a recorder is started. Useful for debugging, but should be set to False
-        for production.
+        If True, a recorder is started in its own acquisition thread. Useful for
+        debugging, but should be set to False for production unless the recorder runs
+        as a flight recorder (``RECORDER_RING``), in which case it is dumped
+        automatically when too many false positive peaks are detected.
+    trigger_monitor : bool
+        If True, a :class:`~resp_audio_sleep.monitors.TriggerMonitor` is started in its
+        own acquisition thread to match the triggers sent with the trigger channel.
+    onset_monitor : bool
+        If True, an :class:`~resp_audio_sleep.monitors.OnsetMonitor` is started in its
+        own acquisition thread to pair the sound onsets looped back in the channel
+        ``ONSET_CHANNEL`` with the scheduled stimuli.
+    peak_outlet : bool
+        If True, each confirmed peak is published on a
+        :class:`~resp_audio_sleep.outlet.PeakOutlet`, which shares the detection with
+        the other processes on the machine or on the network.
     """
 
     def __init__(
         self,
         stream_name: str,
         ecg_ch_name: str | None,
-        resp_ch_name: str | None,
+        resp_ch_name: str | list[str] | tuple[str, ...] | None,
         ecg_height: float | None = None,
         ecg_distance: float | None = None,
         ecg_prominence: float | None = None,
@@ -66,35 +96,105 @@ class Detector:
         resp_distance: float | None = None,
         *,
         detrend: bool = True,
-        viewer: bool = False,
+        viewer: bool | str = False,
         recorder: bool = False,
+        trigger_monitor: bool = False,
+        onset_monitor: bool = False,
+        peak_outlet: bool = False,
     ) -> None:
         if ecg_ch_name is None and resp_ch_name is None:
             raise ValueError(
                 "At least one of 'ecg_ch_name' or 'resp_ch_name' must be set."
             )
         check_type(detrend, (bool,), "detrend")
-        check_type(viewer, (bool,), "viewer")
+        check_type(viewer, (bool, str), "viewer")
+        if isinstance(viewer, str):
+            check_value(viewer, ("process",), "viewer")
         check_type(recorder, (bool,), "recorder")
+        check_type(trigger_monitor, (bool,), "trigger_monitor")
+        check_type(onset_monitor, (bool,), "onset_monitor")
+        check_type(peak_outlet, (bool,), "peak_outlet")
         self._ecg_ch_name = ecg_ch_name
-        self._resp_ch_name = resp_ch_name
+        if isinstance(resp_ch_name, list | tuple):
+            for ch_name in resp_ch_name:
+                check_type(ch_name, (str,), "resp_ch_name")
+            if len(resp_ch_name) == 0:
+                raise ValueError("At least one respiration channel must be set.")
+            if len(set(resp_ch_name)) != len(resp_ch_name):
+                raise ValueError("The respiration channels must be unique.")
+            self._resp_ch_names = list(resp_ch_name)
+        else:
+            check_type(resp_ch_name, (str, None), "resp_ch_name")
+            self._resp_ch_names = None if resp_ch_name is None else [resp_ch_name]
+        # weights of the respiration channels in the last fused signal
+        self._resp_weights = None
         self._set_peak_detection_parameters(
             ecg_height, ecg_distance, ecg_prominence, resp_distance, resp_prominence
         )
-        self._create_stream(_BUFSIZE, stream_name, recorder)
+        self._stream = self._create_stream(_BUFSIZE, stream_name)
+        logger.info("Prefilling buffer of %.2f seconds.", self._stream._bufsize)
+        while self._stream._n_new_samples < self._stream._timestamps.size:
+            self._stream._acquire()
+            sleep(0.01)
+        logger.info("Buffer prefilled.")
         self._detrend = detrend
-        self._viewer = (
-            Viewer(ecg_ch_name, resp_ch_name, self._ecg_height) if viewer else None
+        resp_label = (
+            None if self._resp_ch_names is None else ", ".join(self._resp_ch_names)
         )
+        if viewer == "process":
+            self._viewer = ViewerProcess(
+                ecg_ch_name,
+                resp_label,
+                self._ecg_height,
+                self._stream._timestamps.size,
+            )
+        elif viewer:
+            self._viewer = Viewer(ecg_ch_name, resp_label, self._ecg_height)
+        else:
+            self._viewer = None
         if recorder:
+            # the recorder runs in its own thread on a dedicated stream to keep the
+            # recording off the detection path.
             channels = [TRG_CHANNEL]
             if ecg_ch_name is not None:
                 channels.append(ecg_ch_name)
-            if resp_ch_name is not None:
-                channels.append(resp_ch_name)
-            self._recorder = Recorder(self._stream, channels, bufsize=RECORDER_BUFSIZE)
+            if self._resp_ch_names is not None:
+                channels.extend(self._resp_ch_names)
+            self._recorder = Recorder(
+                self._create_stream(_BUFSIZE, stream_name, trigger=True),
+                channels,
+                bufsize=RECORDER_RING_BUFSIZE if RECORDER_RING else RECORDER_BUFSIZE,
+                memmap=RECORDER_MEMMAP,
+                compact=RECORDER_COMPACT,
+                ring=RECORDER_PATH_DUMPS if RECORDER_RING else None,
+            )
+            self._recorder.start()
         else:
             self._recorder = None
+        if trigger_monitor:
+            self._trigger_monitor = TriggerMonitor(
+                self._create_stream(_BUFSIZE, stream_name, trigger=True),
+                tolerance=TRIGGER_MONITOR_TOLERANCE,
+            )
+            self._trigger_monitor.start()
+        else:
+            self._trigger_monitor = None
+        if onset_monitor:
+            # the onsets are detected on the raw loopback, without filters
+            stream = StreamLSL(_BUFSIZE, name=stream_name).connect(
+                acquisition_delay=None
+            )
+            stream.pick(ONSET_CHANNEL)
+            stream.set_channel_types({ONSET_CHANNEL: "misc"}, on_unit_change="ignore")
+            self._onset_monitor = OnsetMonitor(
+                stream,
+                threshold=ONSET_MONITOR_THRESHOLD,
+                tolerance=ONSET_MONITOR_TOLERANCE,
+            )
+            self._onset_monitor.start()
+        else:
+            self._onset_monitor = None
+        self._peak_outlet = PeakOutlet(stream_name) if peak_outlet else None
         # peak detection settings
         self._last_peak = {"ecg": None, "resp": None}
         self._peak_candidates = {"ecg": None, "resp": None}
@@ -110,7 +210,7 @@ class Detector:
         """
         if ch_type not in ("resp", "ecg"):
             raise ValueError("The channel type must be either 'resp' or 'ecg'.")
-        elif ch_type == "resp" and self._resp_ch_name is None:
+        elif ch_type == "resp" and self._resp_ch_names is None:
             raise ValueError("No respiration channel was set.")
         elif ch_type == "ecg" and self._ecg_ch_name is None:
             raise ValueError("No ECG channel was set.")
@@ -136,14 +236,14 @@ class Detector:
             raise ValueError(
                 "ECG peak detection parameters were not set while ECG channel was set."
             )
-        if self._resp_ch_name is None and any(
+        if self._resp_ch_names is None and any(
             elt is not None for elt in (resp_distance, resp_prominence)
         ):
             raise ValueError(
                 "Respiration peak detection parameters were set without respiration "
                 "channel."
             )
-        elif self._resp_ch_name is not None and any(
+        elif self._resp_ch_names is not None and any(
             elt is None for elt in (resp_distance, resp_prominence)
         ):
             raise ValueError(
@@ -161,7 +261,7 @@ class Detector:
                 check_type(ecg_prominence, ("numeric",), "ecg_prominence")
                 if ecg_prominence <= 0:
                     raise ValueError("ECG prominence must be positive.")
-        if self._resp_ch_name is not None:
+        if self._resp_ch_names is not None:
             check_type(resp_distance, ("numeric",), "resp_distance")
             if resp_distance <= 0:
                 raise ValueError("Respiration distance must be positive.")
@@ -173,44 +273,42 @@ class Detector:
         self._ecg_height = ecg_height
 
     @fill_doc
-    def _create_stream(self, bufsize: float, stream_name: str, recorder: bool) -> None:
-        """Create the LSL stream and prefill the buffer.
+    def _create_stream(
+        self, bufsize: float, stream_name: str, *, trigger: bool = False
+    ) -> StreamLSL:
+        """Create and configure an LSL stream.
 
         Parameters
         ----------
         bufsize : float
-            Size of the buffer in seconds. The buffer will be filled on instantiation,
-            thus the program will hold during this duration.
+            Size of the buffer in seconds.
         %(stream_name)s
-        recorder : bool
-            If True, a recorder will be attached to the stream and the channel selection
-            differs.
+        trigger : bool
+            If True, the trigger channel is also selected, e.g. for a stream attached to
+            a recorder.
+
+        Returns
+        -------
+        stream : StreamLSL
+            The connected and configured stream.
         """
-        picks = [
-            elt for elt in (self._ecg_ch_name, self._resp_ch_name) if elt is not None
-        ]
-        self._stream = StreamLSL(bufsize, name=stream_name).connect(
+        picks = [] if self._ecg_ch_name is None else [self._ecg_ch_name]
+        if self._resp_ch_names is not None:
+            picks.extend(self._resp_ch_names)
+        stream = StreamLSL(bufsize, name=stream_name).connect(
             acquisition_delay=None, processing_flags="all"
         )
-        if recorder:
-            self._stream.pick(picks + [TRG_CHANNEL])
-            self._stream.set_channel_types(
-                {TRG_CHANNEL: "stim"}, on_unit_change="ignore"
-            )
+        if trigger:
+            stream.pick(picks + [TRG_CHANNEL])
+            stream.set_channel_types({TRG_CHANNEL: "stim"}, on_unit_change="ignore")
         else:
-            self._stream.pick(picks)
-        self._stream.set_channel_types(
-            {ch: "misc" for ch in picks}, on_unit_change="ignore"
-        )
-        self._stream.notch_filter(50, picks=picks)
-        self._stream.notch_filter(100, picks=picks)
-        if self._resp_ch_name is not None:
-            self._stream.filter(None, 20, picks=self._resp_ch_name)
-        logger.info("Prefilling buffer of %.2f seconds.", self._stream._bufsize)
-        while self._stream._n_new_samples < self._stream._timestamps.size:
-            self._stream._acquire()
-            sleep(0.01)
-        logger.info("Buffer prefilled.")
+            stream.pick(picks)
+        stream.set_channel_types({ch: "misc" for ch in picks}, on_unit_change="ignore")
+        stream.notch_filter(50, picks=picks)
+        stream.notch_filter(100, picks=picks)
+        if self._resp_ch_names is not None:
+            stream.filter(None, 20, picks=self._resp_ch_names)
+        return stream
 
     @fill_doc
     def _detect_peaks(self, ch_type: str) -> NDArray[np.float64]:
@@ -230,16 +328,18 @@ class Detector:
         self._stream._acquire()
         if self._stream._n_new_samples == 0:
             return np.array([])  # nothing new to do
-        if self._recorder is not None:
-            self._recorder.get_data(self._stream._n_new_samples)
+        # all the respiration channels are retrieved at once in a 2D array
         data, ts = self._stream.get_data(
-            picks=self._resp_ch_name if ch_type == "resp" else self._ecg_ch_name
+            picks=self._resp_ch_names if ch_type == "resp" else self._ecg_ch_name
         )
-        data = data.squeeze()
-        # linear detrending
+        # linear detrending, fitted on all channels at once
         if self._detrend:
-            z = np.polyfit(ts, data, 1)
-            data -= z[0] * ts + z[1]
+            z = np.polyfit(ts, data.T, 1)
+            data -= z[0][:, np.newaxis] * ts + z[1][:, np.newaxis]
+        if data.shape[0] == 1:
+            data = data[0]
+        else:
+            data, self._resp_weights = _fuse_channels(data)
         # channel-specific settings
         kwargs = (
             {"height": np.percentile(data, self._ecg_height * 100)}
@@ -293,6 +393,8 @@ class Detector:
         ) + len(self._peak_candidates[ch_type]):
             self._peak_candidates[ch_type] = None
             self._peak_candidates_count[ch_type] = None
+            if self._recorder is not None and self._recorder.ring:
+                self._recorder.dump(f"false-positive-{ch_type}")
             return None
         self._peak_candidates[ch_type].extend(peaks2append)
         self._peak_candidates_count[ch_type].extend([1] * len(peaks2append))
@@ -317,6 +419,8 @@ class Detector:
             self._last_peak[ch_type] = peaks[-1]
             if self._viewer is not None:
                 self._viewer.add_peak(new_peak, ch_type)
+            if self._peak_outlet is not None:
+                self._peak_outlet.push(new_peak, ch_type)
         else:
             new_peak = None
         # reset the peak candidates
@@ -324,12 +428,95 @@ class Detector:
         self._peak_candidates_count[ch_type] = None
         return new_peak
 
+    @property
+    def resp_weights(self) -> dict[str, float] | None:
+        """Weights of the respiration channels in the last fused signal.
+
+        None if a single respiration channel is set or if no signal was fused yet.
+        """
+        if self._resp_weights is None:
+            return None
+        return dict(zip(self._resp_ch_names, self._resp_weights.tolist(), strict=True))
+
+    @property
+    def peak_outlet(self) -> PeakOutlet | None:
+        """The attached peak outlet instance."""
+        return self._peak_outlet
+
     @property
     def recorder(self) -> Recorder | None:
         """The attached recorder instance."""
         return self._recorder
 
     @property
-    def viewer(self) -> Viewer | None:
+    def onset_monitor(self) -> OnsetMonitor | None:
+        """The attached onset monitor instance."""
+        return self._onset_monitor
+
+    @property
+    def trigger_monitor(self) -> TriggerMonitor | None:
+        """The attached trigger monitor instance."""
+        return self._trigger_monitor
+
+    @property
+    def viewer(self) -> Viewer | ViewerProcess | None:
         """The attached viewer instance."""
         return self._viewer
+
+
+def _fuse_channels(data: NDArray[np.float64]) -> tuple[NDArray[np.float64], NDArray]:
+    """Fuse respiration channels weighted by their signal quality.
+
+    The channels are standardized and the quality of a channel is the inverse of the
+    standard deviation of its first difference, i.e. the ratio between the slow
+    respiration and the fast noise. Each channel is aligned in polarity with the channel
+    of best quality, and weighted by its quality and by its correlation with the channel
+    of best quality, which discards the flat, noisy or out of phase channels. The fused
+    signal has the polarity of the first channel which is not flat, e.g. a thoracic
+    belt, and is standardized to a zero mean and a unit standard deviation. The unit
+    does not depend on the channel of best quality, which can change between 2 windows,
+    thus the peak detection parameters are stable across windows. If the weights are
+    degenerate, the fused signal is the standardized channel of best quality alone.
+
+    Parameters
+    ----------
+    data : array of shape (n_channels, n_samples)
+        The respiration channels.
+
+    Returns
+    -------
+    data : array of shape (n_samples,)
+        The fused respiration signal, standardized.
+    weights : array of shape (n_channels,)
+        The weight of each channel, summing to 1, or 0 for all channels if they are all
+        flat.
+    """
+    mean = data.mean(axis=1)
+    std = data.std(axis=1)
+    valid = std != 0
+    if not valid.any():
+        return data[0], np.zeros(data.shape[0])
+    z = np.zeros_like(data)
+    z[valid] = (data[valid] - mean[valid, np.newaxis]) / std[valid, np.newaxis]
+    noise = np.diff(z, axis=1).std(axis=1)
+    quality = np.divide(1, noise, out=np.zeros_like(noise), where=noise != 0)
+    # the flat channels have a null quality and must not be selected on a tie
+    best = np.flatnonzero(valid)[np.argmax(quality[valid])]
+    correlation = z @ z[best] / z.shape[1]
+    weights = quality * np.abs(correlation)
+    fused = (weights * np.sign(correlation)) @ z
+    if weights.sum() == 0 or fused.std() == 0:
+        # degenerate weights, e.g. a single channel without noise, or channels which
+        # cancel each other, fall back on the channel of best quality alone.
+        weights = np.zeros(data.shape[0])
+        weights[best] = 1
+        fused = z[best].copy()
+    else:
+        weights /= weights.sum()
+    # the polarity and the unit must not depend on the channel of best quality, which
+    # can change between 2 windows. If the reference channel is orthogonal to the
+    # channel of best quality, the polarity of the latter is kept.
+    reference = np.flatnonzero(valid)[0]
+    polarity = np.sign(correlation[reference]) or 1.0
+    fused *= polarity / fused.std()
+    return fused, weights
@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import datetime
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from .utils._checks import check_type, ensure_int, ensure_path
+from .utils.logs import logger
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from numpy.typing import NDArray
+
+
+# status of a stimulus, stored as int8 in the event log
+EVENT_STATUS: dict[str, int] = {
+    "delivered": 0,  # sound scheduled and trigger sent
+    "late": 1,  # detection received after the target time
+    "headroom": 2,  # not enough time left to schedule the sound
+}
+_EVENT_DTYPE = np.dtype(
+    [
+        ("peak", np.float64),  # timestamp of the detected peak
+        ("detection", np.float64),  # timestamp at which the peak was received
+        ("scheduled", np.float64),  # timestamp at which the stimulus is scheduled
+        ("wait", np.float64),  # delay between the detection and the schedule
+        ("trigger", np.int32),  # trigger value of the stimulus
+        ("status", np.int8),  # see EVENT_STATUS
+        ("onset_error", np.float64),  # actual minus scheduled onset, NaN if unknown
+    ]
+)
+
+
+class EventLog:
+    """Columnar log of the stimuli of a block.
+
+    The events are stored in a preallocated structured array. Adding an event writes a
+    row in place, and the log is saved in bulk at the end of the block.
+
+    Parameters
+    ----------
+    block : str
+        Name of the block, e.g. ``"synchronous-respiration"``.
+    n_events : int
+        Number of events to preallocate. The log grows if more events are added.
+    """
+
+    def __init__(self, block: str, n_events: int) -> None:
+        check_type(block, (str,), "block")
+        n_events = ensure_int(n_events, "n_events")
+        if n_events <= 0:
+            raise ValueError("The argument 'n_events' must be strictly positive.")
+        self._block = block
+        self._start = datetime.datetime.now()
+        self._events = np.zeros(n_events, dtype=_EVENT_DTYPE)
+        self._n_events = 0
+
+    def add(
+        self,
+        peak: float,
+        detection: float,
+        scheduled: float,
+        trigger: int,
+        status: int,
+    ) -> int:
+        """Add an event to the log.
+
+        Parameters
+        ----------
+        peak : float
+            Timestamp of the detected peak.
+        detection : float
+            Timestamp at which the peak was received.
+        scheduled : float
+            Timestamp at which the stimulus is scheduled.
+        trigger : int
+            Trigger value of the stimulus.
+        status : int
+            Status of the stimulus, one of the values of
+            :data:`~resp_audio_sleep.events.EVENT_STATUS`.
+
+        Returns
+        -------
+        idx : int
+            Index of the event in the log.
+        """
+        if self._n_events == self._events.size:
+            logger.debug("Growing the event log of block '%s'.", self._block)
+            self._events = np.concatenate(
+                (self._events, np.zeros(self._events.size, dtype=_EVENT_DTYPE))
+            )
+        self._events[self._n_events] = (
+            peak,
+            detection,
+            scheduled,
+            scheduled - detection,
+            trigger,
+            status,
+            np.nan,
+        )
+        self._n_events += 1
+        return self._n_events - 1
+
+    def set_onset_error(self, idx: int, error: float) -> None:
+        """Set the onset error of an event, reported after the sound started.
+
+        Parameters
+        ----------
+        idx : int
+            Index of the event in the log.
+        error : float
+            Delay in seconds between the scheduled and the actual onset of the sound.
+        """
+        self._events["onset_error"][idx] = error
+
+    def save(self, fname: str | Path, *, overwrite: bool = False) -> None:
+        """Save the event log in an NPZ file.
+
+        Parameters
+        ----------
+        fname : str | Path
+            Path to the NPZ file.
+        overwrite : bool
+            If True, overwrite an existing file.
+        """
+        fname = ensure_path(fname, must_exist=False)
+        if fname.suffix != ".npz":
+            raise ValueError("The file extension must be '.npz'.")
+        if fname.exists() and not overwrite:
+            raise FileExistsError(f"The file {fname} already exists.")
+        fname.parent.mkdir(parents=True, exist_ok=True)
+        np.savez(
+            fname,
+            events=self.events,
+            block=np.array(self._block),
+            start=np.array(self._start.isoformat()),
+        )
+
+    @property
+    def block(self) -> str:
+        """Name of the block."""
+        return self._block
+
+    @property
+    def start(self) -> datetime.datetime:
+        """Creation time of the log."""
+        return self._start
+
+    @property
+    def events(self) -> NDArray:
+        """Structured array of the logged events."""
+        return self._events[: self._n_events]
+
+    @property
+    def delivered(self) -> NDArray:
+        """Structured array of the delivered events."""
+        events = self.events
+        return events[events["status"] == EVENT_STATUS["delivered"]]
+
+
+def read_events(fnames: str | Path | list[str | Path]) -> NDArray:
+    """Read the event logs of a session.
+
+    Parameters
+    ----------
+    fnames : str | Path | list of str | list of Path
+        Path to a directory containing the ``*-events.npz`` files of a session, or
+        list of paths to the NPZ files.
+
+    Returns
+    -------
+    events : array of shape (n_events,)
+        Structured array of the events sorted by block creation time. In addition to
+        the logged fields, the field ``"block"`` contains the block name and the field
+        ``"block_idx"`` the index of the block in the session. The fields missing
+        from a log saved before they were added are filled with NaN for the float
+        fields and with ``-1`` for the integer fields.
+    """
+    if isinstance(fnames, list):
+        fnames = [ensure_path(fname, must_exist=True) for fname in fnames]
+    else:
+        directory = ensure_path(fnames, must_exist=True)
+        fnames = sorted(directory.glob("*-events.npz"))
+    blocks = list()
+    for fname in fnames:
+        with np.load(fname, allow_pickle=False) as npz:
+            blocks.append((str(npz["start"]), str(npz["block"]), npz["events"]))
+    blocks.sort(key=lambda block: block[0])
+    width = max((len(block[1]) for block in blocks), default=1)
+    dtype = np.dtype(
+        _EVENT_DTYPE.descr + [("block", f"U{width}"), ("block_idx", np.int32)]
+    )
+    events = np.zeros(sum(block[2].size for block in blocks), dtype=dtype)
+    start = 0
+    for k, (_, block, block_events) in enumerate(blocks):
+        stop = start + block_events.size
+        for field in _EVENT_DTYPE.names:
+            if field in block_events.dtype.names:
+                events[field][start:stop] = block_events[field]
+            else:  # log saved before the field was added
+                kind = _EVENT_DTYPE[field].kind
+                events[field][start:stop] = np.nan if kind == "f" else -1
+        events["block"][start:stop] = block
+        events["block_idx"][start:stop] = k
+        start = stop
+    return events
@@ -0,0 +1,507 @@
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from collections import deque
+from threading import Event, Lock, Thread
+from typing import TYPE_CHECKING
+
+import numpy as np
+from mne_lsl.lsl import local_clock
+from mne_lsl.stream import StreamLSL
+
+from ._config import ONSET_CHANNEL, TRG_CHANNEL
+from .utils._checks import check_type, check_value, ensure_int
+from .utils.logs import logger, warn
+from .utils.realtime import release_thread
+
+if TYPE_CHECKING:
+    from numpy.typing import NDArray
+    from stimuli.trigger._base import BaseTrigger
+
+
+class _BaseMonitor(ABC):
+    """Monitor processing the new samples of a channel in its own thread.
+
+    Parameters
+    ----------
+    stream : StreamLSL
+        Stream from which the samples are processed. The stream should be dedicated to
+        the monitor.
+    ch_name : str
+        Name of the monitored channel.
+    """
+
+    def __init__(self, stream: StreamLSL, ch_name: str) -> None:
+        check_type(stream, (StreamLSL,), "stream")
+        check_type(ch_name, (str,), "ch_name")
+        check_value(ch_name, stream.ch_names, "ch_name")
+        self._stream = stream
+        self._ch_name = ch_name
+        self._last_ts = None
+        self._lock = Lock()
+        self._stop_event = Event()
+        self._thread = None
+
+    def start(self, acquisition_delay: float = 0.05) -> None:
+        """Start the monitoring thread.
+
+        Parameters
+        ----------
+        acquisition_delay : float
+            Delay in seconds between 2 acquisitions.
+        """
+        check_type(acquisition_delay, ("numeric",), "acquisition_delay")
+        if acquisition_delay <= 0:
+            raise ValueError("The argument 'acquisition_delay' must be positive.")
+        if self._thread is not None:
+            raise RuntimeError("The monitor is already running.")
+        self._stop_event.clear()
+        self._thread = Thread(
+            target=self._acquire, args=(acquisition_delay,), daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the monitoring thread."""
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+
+    def _acquire(self, acquisition_delay: float) -> None:
+        """Acquisition loop run in the monitor thread."""
+        release_thread()
+        n_samples_max = self._stream._timestamps.size
+        while not self._stop_event.wait(acquisition_delay):
+            try:
+                self._stream.acquire()
+                n_new_samples = self._stream._n_new_samples
+                if n_new_samples == 0:
+                    continue
+                data, ts = self._stream.get_data(
+                    winsize=min(n_new_samples, n_samples_max)
+                    / self._stream._info["sfreq"],
+                    picks=self._ch_name,
+                )
+                self._push(data[0], ts)
+            except Exception as error:
+                logger.error("The %s failed: %s", type(self).__name__, error)
+                return
+
+    def _push(self, data: NDArray, ts: NDArray[np.float64]) -> None:
+        """Push a chunk of samples, discarding the samples already processed.
+
+        Parameters
+        ----------
+        data : array of shape (n_samples,)
+            The chunk of samples.
+        ts : array of shape (n_samples,)
+            The timestamps of the samples.
+        """
+        if self._last_ts is not None:
+            idx = np.searchsorted(ts, self._last_ts, side="right")
+            data, ts = data[idx:], ts[idx:]
+        if ts.size == 0:
+            return
+        self._last_ts = ts[-1]
+        self._process(data, ts)
+
+    @abstractmethod
+    def _process(self, data: NDArray, ts: NDArray[np.float64]) -> None:
+        """Process a chunk of new samples."""
+
+    @property
+    def running(self) -> bool:
+        """Whether the monitoring thread is running."""
+        return self._thread is not None
+
+
+class TriggerMonitor(_BaseMonitor):
+    """Monitor of the trigger transport latency.
+
+    Each trigger sent through a trigger wrapped with :meth:`~TriggerMonitor.wrap` is
+    matched against the next edge with the same value in the trigger channel of the
+    stream. The latency between the emission and the edge timestamp is tracked, and an
+    alert is emitted when the latency drifts away from its initial value.
+
+    Parameters
+    ----------
+    stream : StreamLSL
+        Stream from which the trigger channel is monitored. The stream should be
+        dedicated to the monitor.
+    ch_name : str
+        Name of the trigger channel.
+    timeout : float
+        Delay in seconds after which a trigger without matching edge is considered
+        missed.
+    window : int
+        Number of latencies used to estimate the initial latency and the recent latency
+        and jitter.
+    tolerance : float
+        Tolerance in seconds on the drift of the recent latency away from the initial
+        latency, and on the recent jitter.
+    """
+
+    def __init__(
+        self,
+        stream: StreamLSL,
+        ch_name: str = TRG_CHANNEL,
+        *,
+        timeout: float = 1.0,
+        window: int = 20,
+        tolerance: float = 0.002,
+    ) -> None:
+        super().__init__(stream, ch_name)
+        check_type(timeout, ("numeric",), "timeout")
+        if timeout <= 0:
+            raise ValueError("The argument 'timeout' must be strictly positive.")
+        window = ensure_int(window, "window")
+        if window <= 1:
+            raise ValueError("The argument 'window' must be greater than 1.")
+        check_type(tolerance, ("numeric",), "tolerance")
+        if tolerance <= 0:
+            raise ValueError("The argument 'tolerance' must be strictly positive.")
+        self._timeout = timeout
+        self._tolerance = tolerance
+        self._pending = deque()
+        self._last_value = 0
+        self._latencies = list()
+        self._recent = deque(maxlen=window)
+        self._reference = None
+        self._n_missed = 0
+        self._n_unexpected = 0
+
+    def expect(self, value: int, timestamp: float) -> None:
+        """Register a trigger sent.
+
+        Parameters
+        ----------
+        value : int
+            The trigger value.
+        timestamp : float
+            The LSL timestamp at which the trigger was sent.
+        """
+        with self._lock:
+            self._pending.append((value, timestamp))
+
+    def wrap(self, trigger: BaseTrigger) -> _MonitoredTrigger:
+        """Wrap a trigger to register every trigger sent with the monitor.
+
+        Parameters
+        ----------
+        trigger : Trigger
+            The trigger object.
+
+        Returns
+        -------
+        trigger : Trigger
+            The wrapped trigger object.
+        """
+        return _MonitoredTrigger(trigger, self)
+
+    def _process(self, data: NDArray, ts: NDArray[np.float64]) -> None:
+        """Detect the rising edges and match them with the triggers sent."""
+        values = np.rint(data).astype(np.int64)
+        previous = np.empty_like(values)
+        previous[0] = self._last_value
+        previous[1:] = values[:-1]
+        self._last_value = values[-1]
+        idx = np.flatnonzero((values != previous) & (values != 0))
+        with self._lock:
+            for value, timestamp in zip(
+                values[idx].tolist(), ts[idx].tolist(), strict=True
+            ):
+                self._match(value, timestamp)
+            while (
+                len(self._pending) != 0 and self._pending[0][1] < ts[-1] - self._timeout
+            ):
+                value, _ = self._pending.popleft()
+                self._n_missed += 1
+                warn(f"Trigger {value} was not received.", interval=10)
+
+    def _match(self, value: int, timestamp: float) -> None:
+        """Match an edge with the oldest pending trigger of the same value."""
+        for k, (pending_value, _) in enumerate(self._pending):
+            if pending_value == value:
+                sent = self._pending[k][1]
+                del self._pending[k]
+                break
+        else:
+            self._n_unexpected += 1
+            logger.debug("Unexpected trigger %i received.", value)
+            return
+        latency = timestamp - sent
+        self._latencies.append(latency)
+        self._recent.append(latency)
+        if len(self._recent) != self._recent.maxlen:
+            return
+        recent = np.array(self._recent)
+        if self._reference is None:
+            self._reference = np.mean(recent)
+            logger.info(
+                "Trigger latency: %.2f ms ± %.2f ms.",
+                self._reference * 1000,
+                np.std(recent) * 1000,
+            )
+            return
+        # the messages are constant to be rate-limited together
+        if self._tolerance < abs(np.mean(recent) - self._reference):
+            warn(
+                "The trigger latency drifted by more than "
+                f"{self._tolerance * 1000:.1f} ms.",
+                interval=10,
+            )
+        if self._tolerance < np.std(recent):
+            warn(
+                f"The trigger jitter exceeds {self._tolerance * 1000:.1f} ms.",
+                interval=10,
+            )
+
+    def summary(self) -> None:
+        """Log a summary of the trigger latency."""
+        if len(self._latencies) == 0:
+            logger.info(
+                "Trigger monitor: no trigger matched, %i missed, %i unexpected.",
+                self._n_missed,
+                self._n_unexpected,
+            )
+            return
+        logger.info(
+            "Trigger monitor: %i matched, %i missed, %i unexpected, latency %.2f ms ± "
+            "%.2f ms.",
+            self.n_matched,
+            self._n_missed,
+            self._n_unexpected,
+            self.latency * 1000,
+            self.jitter * 1000,
+        )
+
+    @property
+    def latencies(self) -> NDArray[np.float64]:
+        """Latencies in seconds of the matched triggers."""
+        return np.array(self._latencies)
+
+    @property
+    def latency(self) -> float:
+        """Mean latency in seconds of the matched triggers."""
+        return float(np.mean(self._latencies)) if len(self._latencies) else np.nan
+
+    @property
+    def jitter(self) -> float:
+        """Standard deviation in seconds of the latency of the matched triggers."""
+        return float(np.std(self._latencies)) if len(self._latencies) else np.nan
+
+    @property
+    def n_matched(self) -> int:
+        """Number of triggers matched with an edge."""
+        return len(self._latencies)
+
+    @property
+    def n_missed(self) -> int:
+        """Number of triggers without matching edge."""
+        return self._n_missed
+
+    @property
+    def n_unexpected(self) -> int:
+        """Number of edges without matching trigger."""
+        return self._n_unexpected
+
+
+class OnsetMonitor(_BaseMonitor):
+    """Monitor of the acoustic onset of the sounds.
+
+    The sound is looped back into a channel of the amplifier. An onset is detected when
+    the rectified signal, minus its DC offset, crosses a threshold after a refractory
+    period. Each onset is paired with the closest stimulus scheduled with
+    :meth:`~OnsetMonitor.expect`, and the onset error, i.e. the delay between the
+    scheduled time and the detected onset, is accumulated in an histogram.
+
+    Parameters
+    ----------
+    stream : StreamLSL
+        Stream from which the sound channel is monitored. The stream should be
+        dedicated to the monitor and should not be filtered.
+    ch_name : str
+        Name of the sound channel.
+    threshold : float
+        Threshold on the rectified signal, in the unit of the sound channel.
+    refractory : float
+        Duration in seconds after an onset during which no other onset is detected,
+        e.g. the duration of the sounds.
+    max_error : float
+        Maximum onset error in seconds. An onset further away from every scheduled
+        stimulus is unexpected, and a stimulus without onset within this delay is
+        missed.
+    bin_width : float
+        Width in seconds of the bins of the onset error histogram.
+    tolerance : float
+        Tolerance in seconds on the onset error before an alert is emitted.
+    """
+
+    def __init__(
+        self,
+        stream: StreamLSL,
+        ch_name: str = ONSET_CHANNEL,
+        *,
+        threshold: float,
+        refractory: float = 0.2,
+        max_error: float = 0.05,
+        bin_width: float = 0.001,
+        tolerance: float = 0.005,
+    ) -> None:
+        super().__init__(stream, ch_name)
+        for name, value in (
+            ("threshold", threshold),
+            ("refractory", refractory),
+            ("max_error", max_error),
+            ("bin_width", bin_width),
+            ("tolerance", tolerance),
+        ):
+            check_type(value, ("numeric",), name)
+            if value <= 0:
+                raise ValueError(f"The argument '{name}' must be strictly positive.")
+        if max_error <= bin_width:
+            raise ValueError(
+                "The argument 'max_error' must be greater than the argument "
+                "'bin_width'."
+            )
+        self._threshold = threshold
+        self._refractory = refractory
+        self._max_error = max_error
+        self._tolerance = tolerance
+        n_bins = int(np.ceil(max_error / bin_width))
+        self._bins = np.arange(-n_bins, n_bins + 1) * bin_width
+        self._counts = np.zeros(self._bins.size - 1, dtype=np.int64)
+        self._pending = deque()
+        self._errors = list()
+        self._dc = None
+        self._last_onset = -np.inf
+        self._n_missed = 0
+        self._n_unexpected = 0
+
+    def expect(self, timestamp: float) -> None:
+        """Register a scheduled stimulus.
+
+        Parameters
+        ----------
+        timestamp : float
+            The LSL timestamp at which the sound onset is scheduled.
+        """
+        with self._lock:
+            self._pending.append(timestamp)
+
+    def _process(self, data: NDArray, ts: NDArray[np.float64]) -> None:
+        """Detect the acoustic onsets and pair them with the scheduled stimuli."""
+        if self._dc is None:
+            self._dc = np.median(data)
+        above = self._threshold < np.abs(data - self._dc)
+        # track the DC offset on the silent samples
+        if not np.all(above):
+            self._dc = 0.9 * self._dc + 0.1 * np.mean(data[~above])
+        candidates = ts[above]
+        onsets = list()
+        k = np.searchsorted(candidates, self._last_onset + self._refractory)
+        while k < candidates.size:
+            onsets.append(candidates[k])
+            k = np.searchsorted(candidates, candidates[k] + self._refractory, "left")
+        if len(onsets) != 0:
+            self._last_onset = onsets[-1]
+        with self._lock:
+            for onset in onsets:
+                self._pair(float(onset))
+            while (
+                len(self._pending) != 0 and self._pending[0] < ts[-1] - self._max_error
+            ):
+                self._pending.popleft()
+                self._n_missed += 1
+                warn("A scheduled sound was not detected.", interval=10)
+
+    def _pair(self, onset: float) -> None:
+        """Pair an onset with the closest pending stimulus."""
+        if len(self._pending) == 0:
+            self._n_unexpected += 1
+            logger.debug("Unexpected sound onset at %.3f.", onset)
+            return
+        scheduled = np.array(self._pending)
+        k = np.argmin(np.abs(onset - scheduled))
+        error = onset - scheduled[k]
+        if self._max_error < abs(error):
+            self._n_unexpected += 1
+            logger.debug("Unexpected sound onset at %.3f.", onset)
+            return
+        # stimuli scheduled before the paired one were not played
+        for _ in range(k):
+            self._pending.popleft()
+            self._n_missed += 1
+            warn("A scheduled sound was not detected.", interval=10)
+        self._pending.popleft()
+        self._errors.append(error)
+        idx = np.searchsorted(self._bins, error, side="right") - 1
+        self._counts[min(idx, self._counts.size - 1)] += 1  # 'max_error' included
+        if self._tolerance < abs(error):
+            warn(
+                f"The sound onset error exceeds {self._tolerance * 1000:.1f} ms.",
+                interval=10,
+            )
+
+    def summary(self) -> None:
+        """Log a summary of the onset errors."""
+        if len(self._errors) == 0:
+            logger.info(
+                "Onset monitor: no onset paired, %i missed, %i unexpected.",
+                self._n_missed,
+                self._n_unexpected,
+            )
+            return
+        errors = self.errors * 1000
+        logger.info(
+            "Onset monitor: %i paired, %i missed, %i unexpected, onset error (ms): "
+            "median %.2f, 5th percentile %.2f, 95th percentile %.2f.",
+            self.n_paired,
+            self._n_missed,
+            self._n_unexpected,
+            *np.percentile(errors, (50, 5, 95)),
+        )
+        for count, start, stop in zip(
+            self._counts, self._bins[:-1], self._bins[1:], strict=True
+        ):
+            if count != 0:
+                logger.info("  [%.1f, %.1f) ms: %i", start * 1000, stop * 1000, count)
+
+    @property
+    def errors(self) -> NDArray[np.float64]:
+        """Onset errors in seconds of the paired stimuli."""
+        return np.array(self._errors)
+
+    @property
+    def histogram(self) -> tuple[NDArray[np.int64], NDArray[np.float64]]:
+        """Histogram of the onset errors, as the counts and the bin edges in seconds."""
+        return self._counts.copy(), self._bins.copy()
+
+    @property
+    def n_paired(self) -> int:
+        """Number of stimuli paired with an onset."""
+        return len(self._errors)
+
+    @property
+    def n_missed(self) -> int:
+        """Number of stimuli without onset."""
+        return self._n_missed
+
+    @property
+    def n_unexpected(self) -> int:
+        """Number of onsets without stimulus."""
+        return self._n_unexpected
+
+
+class _MonitoredTrigger:
+    """Trigger registering every trigger sent with a monitor."""
+
+    def __init__(self, trigger: BaseTrigger, monitor: TriggerMonitor) -> None:
+        self._trigger = trigger
+        self._monitor = monitor
+
+    def signal(self, value: int) -> None:
+        self._monitor.expect(value, local_clock())
+        self._trigger.signal(value)
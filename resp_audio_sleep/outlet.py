@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import numpy as np
+from mne_lsl.lsl import StreamInfo, StreamOutlet, local_clock
+
+from .utils._checks import check_type, check_value
+from .utils.logs import logger
+
+# code of the channel type in the 'ch_type' channel of the outlet
+PEAK_CODES: dict[str, int] = {"ecg": 1, "resp": 2}
+
+
+class PeakOutlet:
+    """LSL outlet publishing the peaks confirmed by a detector.
+
+    The outlet has an irregular sampling rate and 3 float64 channels: ``"peak"``, the
+    timestamp of the peak in the source stream, ``"ch_type"``, the code of the channel
+    type in :data:`PEAK_CODES`, and ``"latency"``, the delay in seconds between the peak
+    and its confirmation by the detector. The timestamp of each sample is the timestamp
+    of the peak, thus the consumers receive the peaks on their own clock.
+
+    Parameters
+    ----------
+    stream_name : str
+        Name of the stream in which the peaks are detected. The outlet is named
+        ``{stream_name}-peaks``.
+    """
+
+    def __init__(self, stream_name: str) -> None:
+        check_type(stream_name, (str,), "stream_name")
+        info = StreamInfo(
+            name=f"{stream_name}-peaks",
+            stype="Markers",
+            n_channels=3,
+            sfreq=0,
+            dtype="float64",
+            source_id=f"ras-peaks-{stream_name}",
+        )
+        info.set_channel_names(["peak", "ch_type", "latency"])
+        info.set_channel_types("misc")
+        info.set_channel_units(["s", "", "s"])
+        self._outlet = StreamOutlet(info)
+        self._sample = np.zeros(3, dtype=np.float64)
+        self._n_peaks = 0
+        logger.info("Publishing the detected peaks on the LSL outlet '%s'.", info.name)
+
+    def push(self, peak: float, ch_type: str) -> None:
+        """Publish a confirmed peak.
+
+        Parameters
+        ----------
+        peak : float
+            Timestamp of the peak in the source stream.
+        ch_type : str
+            Channel type of the peak, ``"ecg"`` or ``"resp"``.
+        """
+        check_value(ch_type, PEAK_CODES, "ch_type")
+        self._sample[0] = peak
+        self._sample[1] = PEAK_CODES[ch_type]
+        self._sample[2] = local_clock() - peak
+        self._outlet.push_sample(self._sample, timestamp=peak)
+        self._n_peaks += 1
+
+    @property
+    def has_consumers(self) -> bool:
+        """Whether at least one consumer is connected to the outlet."""
+        return self._outlet.has_consumers
+
+    @property
+    def n_peaks(self) -> int:
+        """Number of published peaks."""
+        return self._n_peaks
@@ -1,24 +1,38 @@
 from __future__ import annotations
 
+import datetime
+import os
+import zipfile
 from math import ceil
+from tempfile import TemporaryFile
+from threading import Event, Lock, Thread
 from typing import TYPE_CHECKING
 
 import numpy as np
-from mne import Annotations, pick_info
+from mne import Annotations, create_info, pick_info
 from mne._fiff.pick import _picks_to_idx
 from mne.io import RawArray
 from mne_lsl.stream import StreamLSL
 
 from .utils._checks import check_type, check_value, ensure_path
-from .utils.logs import warn
+from .utils.logs import logger, warn
+from .utils.realtime import release_thread
+from .utils.writer import writer
 
 if TYPE_CHECKING:
     from pathlib import Path
 
+    from numpy.typing import NDArray
+
 
 class Recorder:
     """Recorder object attached to an LSL stream.
 
+    The recorder can either be fed manually with :meth:`~Recorder.get_data` or run in
+    its own acquisition thread with :meth:`~Recorder.start`. In the latter case, the
+    stream should be dedicated to the recorder, and it is disconnected by
+    :meth:`~Recorder.stop`.
+
     Parameters
     ----------
     stream : StreamLSL
@@ -27,10 +41,31 @@ class Recorder:
         List of channel names to record.
     bufsize : float
         Buffer size in seconds to record.
+    memmap : str | Path | None
+        If a path to a directory is provided, the buffer is memory-mapped to a
+        preallocated temporary file in this directory instead of being allocated in
+        RAM. This keeps the resident memory flat for long recordings, e.g. a whole
+        night.
+    compact : bool
+        If True, the buffer is stored in float32 instead of the stream dtype, and can
+        be saved in a compact quantized format with :meth:`~Recorder.save_compact`.
+    ring : str | Path | None
+        If a path to a directory is provided, the recorder runs as a flight recorder.
+        The buffer becomes a ring of ``bufsize`` seconds continuously overwriting the
+        oldest samples, which can be dumped in this directory with
+        :meth:`~Recorder.dump`. The name of the stream is included in the name of the
+        dumps, thus several flight recorders can share the same directory.
     """
 
     def __init__(
-        self, stream: StreamLSL, channels: list[str] | tuple[str], bufsize: float
+        self,
+        stream: StreamLSL,
+        channels: list[str] | tuple[str],
+        bufsize: float,
+        *,
+        memmap: str | Path | None = None,
+        compact: bool = False,
+        ring: str | Path | None = None,
     ) -> None:
         check_type(stream, (StreamLSL,), "stream")
         check_type(channels, (list, tuple), "channels")
@@ -40,15 +75,57 @@ class Recorder:
         check_type(bufsize, ("numeric",), "bufsize")
         if bufsize <= 0:
             raise ValueError("The argument 'bufsize' must be positive.")
+        check_type(compact, (bool,), "compact")
+        if ring is not None:
+            ring = ensure_path(ring, must_exist=False)
+            ring.mkdir(parents=True, exist_ok=True)
         self._stream = stream
+        self._stream_name = stream.name
         self._channels = channels
-        self._buffer = np.zeros(
-            (len(channels), ceil(bufsize * stream._info["sfreq"])),
-            dtype=self._stream.dtype,
-        )
+        # the measurement info is kept to save the buffer once the stream disconnected
+        self._info = pick_info(stream._info, _picks_to_idx(stream._info, channels))
+        self._info["device_info"] = None
+        shape = (len(channels), ceil(bufsize * stream._info["sfreq"]))
+        self._compact = compact
+        if compact:
+            dtype = np.float32
+        else:
+            dtype = self._stream.dtype if memmap is None else np.float64
+        if memmap is None:
+            self._buffer = np.zeros(shape, dtype=dtype)
+        else:
+            memmap = ensure_path(memmap, must_exist=True)
+            if not memmap.is_dir():
+                raise ValueError("The argument 'memmap' must be a path to a directory.")
+            # the mapped buffer is stored as float64, the dtype used by MNE, so that a
+            # view on the mapped data can be wrapped in a RawArray without a copy
+            # (unless the recorder is compact). The mapping holds its own reference to
+            # the temporary file, which is removed once the buffer is garbage-collected.
+            with TemporaryFile(
+                dir=memmap, prefix="ras-recorder-", suffix=".dat"
+            ) as fid:
+                if hasattr(os, "posix_fallocate"):  # reserve the disk space upfront
+                    nbytes = shape[0] * shape[1] * np.dtype(dtype).itemsize
+                    os.posix_fallocate(fid.fileno(), 0, nbytes)
+                self._buffer = np.memmap(fid, dtype=dtype, mode="w+", shape=shape)
         self._start = 0
         self._annotations_onset = []
         self._annotations_description = []
+        # flight recorder
+        self._ring = ring
+        self._full = False
+        self._dump_request = None
+        # protects the ring buffer and the dump request, accessed by the acquisition
+        # thread and by the threads requesting a dump
+        self._lock = Lock()
+        # acquisition thread and sample counters
+        self._last_ts = None
+        self._n_dropped = 0
+        self._n_duplicated = 0
+        self._thread = None
+        self._running = False
+        self._error = None
+        self._stop_event = Event()
 
     def get_data(self, n_samples: int) -> None:
         """Acquire new data from the stream buffer in the recorder buffer.
@@ -58,18 +135,210 @@ class Recorder:
         n_samples : int
             The number of samples to acquire.
         """
-        winsize = n_samples / self._stream._info["sfreq"]
-        data, _ = self._stream.get_data(winsize=winsize, picks=self._channels)
-        if self._start == self._buffer.shape[1]:
-            warn("The buffer is full. Skipping.")
+        winsize = n_samples / self._info["sfreq"]
+        data, ts = self._stream.get_data(winsize=winsize, picks=self._channels)
+        self._push(data, ts)
+
+    def start(self, acquisition_delay: float = 0.1) -> None:
+        """Start the acquisition thread.
+
+        The thread polls the stream every ``acquisition_delay`` seconds and copies the
+        new samples in batch into the recorder buffer.
+
+        Parameters
+        ----------
+        acquisition_delay : float
+            Delay in seconds between 2 acquisitions.
+        """
+        check_type(acquisition_delay, ("numeric",), "acquisition_delay")
+        if acquisition_delay <= 0:
+            raise ValueError("The argument 'acquisition_delay' must be positive.")
+        if self._thread is not None:
+            raise RuntimeError("The recorder is already running.")
+        if not self._stream.connected:
+            raise RuntimeError("The stream of the recorder is disconnected.")
+        self._stop_event.clear()
+        self._error = None
+        self._running = True
+        self._thread = Thread(
+            target=self._acquire, args=(acquisition_delay,), daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the acquisition thread and disconnect the stream.
+
+        If the acquisition failed, the error is available in :attr:`error` and a
+        warning is issued. The samples acquired before the failure can still be saved.
+        """
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+        self._stream.disconnect()
+        with self._lock:
+            if self._dump_request is not None:  # dump with the samples available
+                self._dump()
+        if self._error is not None:
+            warn(f"The recorder acquisition stopped on an error: {self._error}")
+
+    def _acquire(self, acquisition_delay: float) -> None:
+        """Acquisition loop run in the recorder thread."""
+        release_thread()
+        try:
+            n_samples_max = self._stream._timestamps.size
+            while not self._stop_event.wait(acquisition_delay):
+                self._stream.acquire()
+                n_new_samples = self._stream._n_new_samples
+                if n_new_samples == 0:
+                    continue
+                data, ts = self._stream.get_data(
+                    winsize=min(n_new_samples, n_samples_max) / self._info["sfreq"],
+                    picks=self._channels,
+                )
+                self._push(data, ts)
+        except Exception as error:
+            self._error = error
+            logger.error("The recorder acquisition failed: %s", error)
+        finally:
+            self._running = False
+
+    def _push(self, data: NDArray, ts: NDArray[np.float64]) -> None:
+        """Push a chunk of samples in the recorder buffer.
+
+        Samples already pushed are discarded based on their timestamps, and gaps
+        between the last pushed sample and the new chunk are counted as dropped
+        samples.
+
+        Parameters
+        ----------
+        data : array of shape (n_channels, n_samples)
+            The chunk of samples.
+        ts : array of shape (n_samples,)
+            The timestamps of the samples.
+        """
+        if self._last_ts is not None:
+            idx = np.searchsorted(ts, self._last_ts, side="right")
+            if idx != 0:
+                self._n_duplicated += idx
+                data, ts = data[:, idx:], ts[idx:]
+            if ts.size != 0:
+                sfreq = self._info["sfreq"]
+                n_missing = round((ts[0] - self._last_ts) * sfreq) - 1
+                self._n_dropped += max(n_missing, 0)
+        if ts.size == 0:
+            return
+        self._last_ts = ts[-1]
+        if self._ring is None:
+            if self._start == self._buffer.shape[1]:
+                warn("The buffer is full. Skipping.", interval=10)
+                return
+            stop = (
+                self._buffer.shape[1]
+                if self._buffer.shape[1] < self._start + data.shape[1]
+                else self._start + data.shape[1]
+            )
+            self._buffer[:, self._start : stop] = data[:, : stop - self._start]
+            self._start = stop
             return
-        stop = (
-            self._buffer.shape[1]
-            if self._buffer.shape[1] < self._start + data.shape[1]
-            else self._start + data.shape[1]
+        with self._lock:
+            self._push_ring(data)
+
+    def _push_ring(self, data: NDArray) -> None:
+        """Overwrite the oldest samples of the ring buffer, with the lock held."""
+        size = self._buffer.shape[1]
+        if size <= data.shape[1]:
+            self._buffer[:, :] = data[:, -size:]
+            self._start = 0
+            self._full = True
+        else:
+            stop = self._start + data.shape[1]
+            if stop <= size:
+                self._buffer[:, self._start : stop] = data
+            else:
+                self._buffer[:, self._start :] = data[:, : size - self._start]
+                self._buffer[:, : stop - size] = data[:, size - self._start :]
+            self._full = self._full or size <= stop
+            self._start = stop % size
+        if self._dump_request is not None:
+            fname, n_samples = self._dump_request
+            n_samples -= data.shape[1]
+            if 0 < n_samples:
+                self._dump_request = (fname, n_samples)
+            else:
+                self._dump()
+
+    def dump(self, description: str, *, post: float | None = None) -> None:
+        """Dump the ring buffer to a FIF file.
+
+        The dump is written in the background once ``post`` seconds have been acquired,
+        so that the window surrounds the event which triggered the dump. A request
+        received while a dump is pending is ignored. The requests can be issued from any
+        thread.
+
+        Parameters
+        ----------
+        description : str
+            Description of the event, added to the file name.
+        post : float | None
+            Duration in seconds to acquire after the request before dumping the ring
+            buffer. If None, half of the buffer size is used.
+        """
+        if self._ring is None:
+            raise RuntimeError("The recorder is not running as a flight recorder.")
+        check_type(description, (str,), "description")
+        check_type(post, ("numeric", None), "post")
+        sfreq = self._info["sfreq"]
+        n_samples = self._buffer.shape[1] // 2 if post is None else ceil(post * sfreq)
+        if not 0 <= n_samples <= self._buffer.shape[1]:
+            raise ValueError(
+                "The argument 'post' must be positive and shorter than the buffer."
+            )
+        with self._lock:
+            if self._dump_request is not None:
+                logger.info("A flight recorder dump is already pending. Skipping.")
+                return
+            now = datetime.datetime.now()
+            fname = self._ring / (
+                f"{now.strftime('%Y%m%d_%H%M%S_%f')}-{self._stream_name}-{description}"
+                "-raw.fif"
+            )
+            logger.info("Flight recorder dump requested: %s.", description)
+            self._dump_request = (fname, n_samples)
+            if n_samples == 0:
+                self._dump()
+
+    def _dump(self) -> None:
+        """Snapshot and save the ring buffer in the background, with the lock held."""
+        fname, _ = self._dump_request
+        raw = self._to_raw(self._window().copy())
+        writer.submit(raw.save, fname, description=f"dump {fname.name}")
+        self._dump_request = None
+
+    def _window(self) -> NDArray:
+        """Get the recorded samples in chronological order."""
+        if self._ring is None or not self._full:
+            return self._buffer[:, : self._start]
+        return np.concatenate(
+            (self._buffer[:, self._start :], self._buffer[:, : self._start]), axis=1
         )
-        self._buffer[:, self._start : stop] = data[:, : stop - self._start]
-        self._start = stop
+
+    def _to_raw(self, data: NDArray) -> RawArray:
+        """Create a RawArray from recorded samples."""
+        # for a memory-mapped buffer, the slice is a view on the mapped data which is
+        # written to disk chunk by chunk by MNE without loading it in memory.
+        raw = RawArray(data, self._info, verbose="WARNING")
+        if len(self._annotations_onset) != 0:
+            assert len(self._annotations_onset) == len(self._annotations_description)
+            raw.set_annotations(
+                Annotations(
+                    np.array(self._annotations_onset) / self._info["sfreq"],
+                    [0] * len(self._annotations_onset),
+                    self._annotations_description,
+                )
+            )
+        return raw
 
     def annotate(self, offset: int, description: str) -> None:
         """Add an annotation on the current buffer index.
@@ -81,6 +350,8 @@ class Recorder:
         description : str
             Description of the annotation.
         """
+        if self._ring is not None:
+            raise RuntimeError("A flight recorder does not support annotations.")
         offset = int(offset)
         if self._start + offset < 0 or self._buffer.shape[1] <= self._start + offset:
             raise ValueError("The offset yields an out-of-bound index.")
@@ -101,18 +372,190 @@ class Recorder:
         check_type(overwrite, (bool,), "overwrite")
         if fname.suffix != ".fif":
             raise ValueError("The file extension must be '.fif'.")
-        info = pick_info(
-            self._stream._info, _picks_to_idx(self._stream._info, self._channels)
-        )
-        info["device_info"] = None
-        raw = RawArray(self._buffer[:, : self._start], info, verbose="WARNING")
-        if len(self._annotations_onset) != 0:
-            assert len(self._annotations_onset) == len(self._annotations_description)
+        raw = self._to_raw(self._window())
+        raw.save(fname, overwrite=overwrite)
+
+    def save_compact(
+        self,
+        fname: str | Path,
+        *,
+        dtype: str = "int16",
+        chunk_size: float = 60,
+        overwrite: bool = False,
+    ) -> None:
+        """Save the buffer to a compact NPZ file.
+
+        The physiological channels are stored as float32 or quantized to int16/int32
+        with a per-channel calibration. The stim channels are stored as the smallest
+        unsigned integer type fitting the trigger values. The data is split in chunks
+        compressed with a lossless algorithm. The file can be loaded with
+        :func:`~resp_audio_sleep.record.read_compact`.
+
+        Parameters
+        ----------
+        fname : str | Path
+            Path to the NPZ file used to save the buffer.
+        dtype : ``"float32"`` | ``"int16"`` | ``"int32"``
+            Storage type of the physiological channels.
+        chunk_size : float
+            Duration of the compressed chunks in seconds.
+        overwrite : bool
+            If True, overwrite the file if it already exists.
+        """
+        fname = ensure_path(fname, must_exist=False)
+        check_value(dtype, ("float32", "int16", "int32"), "dtype")
+        check_type(chunk_size, ("numeric",), "chunk_size")
+        if chunk_size <= 0:
+            raise ValueError("The argument 'chunk_size' must be positive.")
+        check_type(overwrite, (bool,), "overwrite")
+        if fname.suffix != ".npz":
+            raise ValueError("The file extension must be '.npz'.")
+        if fname.exists() and not overwrite:
+            raise FileExistsError(
+                f"The file '{fname}' already exists. Use 'overwrite=True' to overwrite."
+            )
+        sfreq = self._info["sfreq"]
+        ch_types = np.array(self._info.get_channel_types())
+        stim = np.flatnonzero(ch_types == "stim")
+        phys = np.flatnonzero(ch_types != "stim")
+        data = self._window()
+        # per-channel calibration, the physical values are 'data * scale + offset'
+        scale = np.ones(len(self._channels))
+        offset = np.zeros(len(self._channels))
+        if dtype != "float32" and data.shape[1] != 0:
+            iinfo = np.iinfo(dtype)
+            for idx in phys:
+                min_, max_ = float(data[idx].min()), float(data[idx].max())
+                offset[idx] = (max_ + min_) / 2
+                if min_ != max_:
+                    scale[idx] = (max_ - min_) / (iinfo.max - iinfo.min - 1)
+        if stim.size == 0 or data.shape[1] == 0:
+            dtype_stim = np.uint8
+        else:
+            max_ = max(float(data[idx].max()) for idx in stim)
+            min_ = min(float(data[idx].min()) for idx in stim)
+            if 0 <= min_ and max_ <= np.iinfo(np.uint8).max:
+                dtype_stim = np.uint8
+            elif 0 <= min_ and max_ <= np.iinfo(np.uint16).max:
+                dtype_stim = np.uint16
+            else:
+                dtype_stim = np.int32
+        chunk_size = max(int(chunk_size * sfreq), 1)
+        arrays = {
+            "sfreq": np.array(sfreq),
+            "n_times": np.array(data.shape[1]),
+            "chunk_size": np.array(chunk_size),
+            "ch_names": np.array(self._channels),
+            "ch_types": ch_types,
+            "scale": scale,
+            "offset": offset,
+            "annotations_onset": np.array(self._annotations_onset, dtype=np.int64),
+            "annotations_description": np.array(
+                self._annotations_description, dtype=str
+            ),
+        }
+        with zipfile.ZipFile(fname, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
+            for key, array in arrays.items():
+                _write_array(zf, key, array)
+            for k, start in enumerate(range(0, data.shape[1], chunk_size)):
+                chunk = data[:, start : start + chunk_size]
+                if dtype == "float32":
+                    chunk_phys = chunk[phys].astype(np.float32)
+                else:
+                    chunk_phys = np.rint(
+                        (chunk[phys] - offset[phys, np.newaxis])
+                        / scale[phys, np.newaxis]
+                    ).astype(dtype)
+                _write_array(zf, f"phys_{k:05d}", chunk_phys)
+                _write_array(
+                    zf, f"stim_{k:05d}", np.rint(chunk[stim]).astype(dtype_stim)
+                )
+
+    @property
+    def compact(self) -> bool:
+        """Whether the buffer is stored in compact float32."""
+        return self._compact
+
+    @property
+    def ring(self) -> bool:
+        """Whether the recorder runs as a flight recorder."""
+        return self._ring is not None
+
+    @property
+    def n_dropped(self) -> int:
+        """Number of samples missed between 2 acquisitions."""
+        return self._n_dropped
+
+    @property
+    def n_duplicated(self) -> int:
+        """Number of samples acquired twice and discarded."""
+        return self._n_duplicated
+
+    @property
+    def fill(self) -> float:
+        """Fraction of the buffer filled, between 0 and 1."""
+        if self._ring is not None and self._full:
+            return 1.0
+        return self._start / self._buffer.shape[1]
+
+    @property
+    def running(self) -> bool:
+        """Whether the acquisition thread is running."""
+        return self._running
+
+    @property
+    def error(self) -> Exception | None:
+        """Error which stopped the acquisition thread, if any."""
+        return self._error
+
+
+def _write_array(zf: zipfile.ZipFile, name: str, array: NDArray) -> None:
+    """Write an array in a ZIP archive in the NPY format."""
+    with zf.open(f"{name}.npy", mode="w", force_zip64=True) as fid:
+        np.lib.format.write_array(fid, np.asanyarray(array), allow_pickle=False)
+
+
+def read_compact(fname: str | Path) -> RawArray:
+    """Read a compact recording saved with :meth:`Recorder.save_compact`.
+
+    Parameters
+    ----------
+    fname : str | Path
+        Path to the NPZ file.
+
+    Returns
+    -------
+    raw : RawArray
+        The recording, with the physiological channels restored in physical units.
+    """
+    fname = ensure_path(fname, must_exist=True)
+    if fname.suffix != ".npz":
+        raise ValueError("The file extension must be '.npz'.")
+    with np.load(fname, allow_pickle=False) as npz:
+        sfreq = float(npz["sfreq"])
+        n_times = int(npz["n_times"])
+        chunk_size = int(npz["chunk_size"])
+        ch_types = npz["ch_types"]
+        scale = npz["scale"]
+        offset = npz["offset"]
+        stim = np.flatnonzero(ch_types == "stim")
+        phys = np.flatnonzero(ch_types != "stim")
+        data = np.empty((ch_types.size, n_times), dtype=np.float64)
+        for k, start in enumerate(range(0, n_times, chunk_size)):
+            stop = min(start + chunk_size, n_times)
+            data[phys, start:stop] = (
+                npz[f"phys_{k:05d}"] * scale[phys, np.newaxis]
+                + offset[phys, np.newaxis]
+            )
+            data[stim, start:stop] = npz[f"stim_{k:05d}"]
+        info = create_info(npz["ch_names"].tolist(), sfreq, ch_types.tolist())
+        raw = RawArray(data, info, verbose="WARNING")
+        if npz["annotations_onset"].size != 0:
             raw.set_annotations(
                 Annotations(
-                    np.array(self._annotations_onset) / self._stream._info["sfreq"],
-                    [0] * len(self._annotations_onset),
-                    self._annotations_description,
+                    npz["annotations_onset"] / sfreq,
+                    [0] * npz["annotations_onset"].size,
+                    npz["annotations_description"].tolist(),
                 )
             )
-        raw.save(fname, overwrite=overwrite)
+    return raw
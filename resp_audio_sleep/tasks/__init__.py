@@ -1,4 +1,33 @@
-from .asynchronous import asynchronous
-from .baseline import baseline
-from .isochronous import isochronous
-from .synchronous import synchronous_cardiac, synchronous_respiration
+from importlib import import_module
+
+# the tasks are imported on first access to avoid loading the stimulation stack
+# (psychopy, psychtoolbox, stimuli, ...) when only the configuration is needed.
+# The modules defining the tasks are private, thus their names can not shadow the
+# functions they define once imported.
+_ATTRIBUTES: dict[str, str] = {
+    "asynchronous": "_asynchronous",
+    "baseline": "_baseline",
+    "isochronous": "_isochronous",
+    "paradigm": "_paradigm",
+    "synchronous_cardiac": "synchronous",
+    "synchronous_respiration": "synchronous",
+    # backends
+    "RealBackend": "_backend",
+    "SimulatedBackend": "_backend",
+    "use_backend": "_backend",
+    # orchestration of several beds
+    "Bed": "orchestrator",
+    "Orchestrator": "orchestrator",
+    "PeakPoller": "orchestrator",
+}
+
+
+def __getattr__(name: str):
+    if name not in _ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = import_module(f".{_ATTRIBUTES[name]}", __name__)
+    return getattr(module, name)
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(_ATTRIBUTES))
@@ -3,29 +3,26 @@ from __future__ import annotations
 from typing import TYPE_CHECKING
 
 import numpy as np
-from stimuli.time import Clock, sleep
 
 from ..detector import _BUFSIZE
 from ..utils._checks import check_type
 from ..utils._docs import fill_doc
 from ..utils.logs import logger
+from ._backend import get_backend, task_block
 from ._config import (
-    BACKEND,
     OUTLIER_PERC,
     SOUND_DURATION,
     TARGET_DELAY,
     TRIGGER_TASKS,
     TRIGGERS,
 )
-from ._utils import create_sounds, create_trigger, generate_sequence
-
-if BACKEND == "ptb":
-    import psychtoolbox as ptb
+from ._utils import generate_sequence
 
 if TYPE_CHECKING:
     from numpy.typing import NDArray
 
 
+@task_block
 @fill_doc
 def asynchronous(
     peaks: NDArray[np.float64],
@@ -45,11 +42,11 @@ def asynchronous(
     if peaks.ndim != 1:
         raise ValueError("The peaks array must be one-dimensional.")
     logger.info("Starting asynchronous block.")
-    # create sound stimuli, trigger, sequence and clock
-    sounds = create_sounds(backend=BACKEND)
-    trigger = create_trigger()
+    # create sound stimuli, trigger and sequence
+    backend = get_backend()
+    sounds = backend.create_sounds()
+    trigger = backend.create_trigger()
     sequence = generate_sequence(target, deviant)
-    clock = Clock()
     # the sequence, sound and trigger generation validates the trigger dictionary, thus
     # we can safely map the target and deviant frequencies to their corresponding
     # trigger values and sounds.
@@ -64,25 +61,27 @@ def asynchronous(
     delays = delays[np.where((edges[0] < delays) & (delays < edges[1]))]
     delays = rng.choice(delays, size=sequence.size, replace=True)
     # main loop
-    sleep(_BUFSIZE)  # fake a buffer filling
+    backend.sleep(_BUFSIZE)  # fake a buffer filling
     counter = 0
     trigger.signal(TRIGGER_TASKS["asynchronous"][0])
     while counter <= sequence.size - 1:
-        start = clock.get_time()
-        stimulus.get(sequence[counter]).play(
-            when=ptb.GetSecs() + TARGET_DELAY if BACKEND == "ptb" else TARGET_DELAY
-        )
+        start = backend.now()
+        backend.play(stimulus.get(sequence[counter]), TARGET_DELAY)
         logger.debug("Triggering %i in %.2f ms.", sequence[counter], TARGET_DELAY)
-        sleep(TARGET_DELAY)
+        backend.heartbeat(TARGET_DELAY)
+        backend.sleep(TARGET_DELAY)
         trigger.signal(sequence[counter])
         logger.info("Stimulus %i / %i complete.", counter + 1, sequence.size)
         # note that if the delays are too short, the value 'wait' could end up negative
         # which (1) makes no sense and (2) would raise in the sleep function.
-        wait = start + delays[counter] - clock.get_time()
-        sleep(wait)
+        wait = start + delays[counter] - backend.now()
+        backend.heartbeat(max(wait, 0))
+        backend.sleep(wait)
         counter += 1
+    backend.heartbeat(float("inf"))  # disarm the watchdog
     # wait for the last sound to finish
     if wait < 1.1 * SOUND_DURATION:
-        sleep(1.1 * SOUND_DURATION - wait)
+        backend.sleep(1.1 * SOUND_DURATION - wait)
     trigger.signal(TRIGGER_TASKS["asynchronous"][1])
+    backend.poll_onsets(summary=True)
     logger.info("Asynchronous block complete.")
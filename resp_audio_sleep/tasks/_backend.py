@@ -0,0 +1,684 @@
+"""Time, audio, trigger and detector backends used by the tasks.
+
+The tasks retrieve the backend of the current context with :func:`get_backend`. By
+default, the hardware backend is used. A :class:`SimulatedBackend` can be selected with
+:func:`use_backend` to execute the tasks faster than real-time on a virtual clock while
+recording the issued triggers and sounds.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from contextlib import ExitStack, contextmanager, nullcontext
+from contextvars import ContextVar
+from functools import wraps
+from typing import TYPE_CHECKING
+from weakref import WeakSet
+
+import numpy as np
+
+from ..utils._checks import check_type, check_value, ensure_path
+from ..utils.clocks import ClockMapper
+from ..utils.logs import logger
+from ..utils.metrics import Metrics
+from ..utils.metrics import metrics as _metrics
+from ..utils.profiler import Profiler
+from ..utils.realtime import realtime
+from ..utils.watchdog import Watchdog
+from ..utils.writer import writer
+from ._config import (
+    BACKEND,
+    DEVICE,
+    HEADROOM,
+    HEADROOM_ADAPTIVE,
+    REALTIME,
+    REALTIME_CORES,
+    REALTIME_MLOCK,
+    REALTIME_PRIORITY,
+    TRIGGER_ARGS,
+    TRIGGER_TYPE,
+    TRIGGERS,
+    WATCHDOG,
+    WATCHDOG_THRESHOLD,
+)
+from ._onsets import OnsetTracker
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Generator
+    from contextlib import AbstractContextManager
+    from pathlib import Path
+    from typing import Any
+
+    from ..events import EventLog
+    from .orchestrator import PeakPoller, _PolledDetector
+
+
+class RealBackend:
+    """Backend driving the hardware.
+
+    The triggers are sent with the configured trigger, and the peaks are detected on
+    the LSL stream. With the PsychToolbox audio backend, the mapping from the LSL clock
+    to the PsychToolbox clock is estimated continuously in a background thread, and the
+    sounds are scheduled directly at the PsychToolbox time of an LSL timestamp. The
+    actual onsets reported by PsychToolbox are collected by an
+    :class:`~resp_audio_sleep.tasks._onsets.OnsetTracker`, which adapts the scheduling
+    headroom.
+
+    Parameters
+    ----------
+    audio : ``"ptb"`` | ``"stimuli"``
+        The audio backend used to play the sounds, by default ``BACKEND`` from the task
+        configuration.
+    profile : str | Path | None
+        Directory in which the profile of each block is saved, see
+        :class:`~resp_audio_sleep.utils.profiler.Profiler`. If None, the blocks are not
+        profiled.
+    device : str | int | None
+        The audio output device, by default ``DEVICE`` from the task configuration.
+    trigger_type : ``"arduino"`` | ``"lpt"``
+        The type of trigger, by default ``TRIGGER_TYPE`` from the task configuration.
+    trigger_args : str | None
+        The address of the parallel port for the ``"lpt"`` trigger, by default
+        ``TRIGGER_ARGS`` from the task configuration.
+    directory : str | Path | None
+        Directory in which the event logs are saved. If None, the event logs are saved
+        next to the recordings of the blocks.
+    poller : PeakPoller | None
+        Poller shared between several backends, which detects the peaks of all the
+        detectors in a single thread. If None, the peaks are detected in the loop of
+        the task.
+    metrics : Metrics | None
+        Registry in which the metrics of the tasks are updated. If None, the registry
+        of the process :data:`resp_audio_sleep.utils.metrics.metrics` is used.
+    name : str | None
+        Name of the backend, e.g. the bed, prepended to the files saved by the tasks to
+        distinguish the files of several backends saved in the same directory.
+    """
+
+    def __init__(
+        self,
+        audio: str = BACKEND,
+        *,
+        profile: str | Path | None = None,
+        device: str | int | None = DEVICE,
+        trigger_type: str = TRIGGER_TYPE,
+        trigger_args: str | None = TRIGGER_ARGS,
+        directory: str | Path | None = None,
+        poller: PeakPoller | None = None,
+        metrics: Metrics | None = None,
+        name: str | None = None,
+    ) -> None:
+        check_value(audio, ("ptb", "stimuli"), "audio")
+        check_type(metrics, (Metrics, None), "metrics")
+        check_type(name, (str, None), "name")
+        self._profiler = None if profile is None else Profiler(profile)
+        self._device = device
+        self._trigger = (trigger_type, trigger_args)
+        self._directory = (
+            None if directory is None else ensure_path(directory, must_exist=False)
+        )
+        self.poller = poller
+        self.metrics = _metrics if metrics is None else metrics
+        self.name = name
+        from mne_lsl.lsl import local_clock
+        from stimuli.time import sleep
+
+        self.local_clock = local_clock
+        self.sleep = sleep
+        self._audio = audio
+        if audio == "ptb":
+            import psychtoolbox as ptb
+
+            self._audio_clock = ptb.GetSecs
+            self._clock_mapper = ClockMapper(local_clock, ptb.GetSecs)
+            self._clock_mapper.start()
+            self.onsets = OnsetTracker(adaptive=HEADROOM_ADAPTIVE)
+        else:
+            self._audio_clock = None
+            self._clock_mapper = None
+            self.onsets = None
+        self._watchdog = None
+
+    @staticmethod
+    def now() -> float:
+        """Monotonic time in seconds, used to time the task loops."""
+        return time.perf_counter()
+
+    def play(
+        self, sound, delay: float, callback: Callable[[float], None] | None = None
+    ) -> None:
+        """Schedule a sound.
+
+        Parameters
+        ----------
+        sound : SoundPTB | Tone
+            The sound to play.
+        delay : float
+            Delay in seconds after which the sound onset is scheduled.
+        callback : callable | None
+            Function called with the onset error in seconds once the actual onset is
+            reported, only with the PsychToolbox audio backend.
+        """
+        if self._audio_clock is None:
+            sound.play(when=delay)
+        else:
+            self._play_ptb(sound, self._audio_clock() + delay, callback)
+
+    def play_at(
+        self, sound, timestamp: float, callback: Callable[[float], None] | None = None
+    ) -> None:
+        """Schedule a sound at an LSL timestamp.
+
+        Parameters
+        ----------
+        sound : SoundPTB | Tone
+            The sound to play.
+        timestamp : float
+            LSL timestamp at which the sound onset is scheduled.
+        callback : callable | None
+            Function called with the onset error in seconds once the actual onset is
+            reported, only with the PsychToolbox audio backend.
+        """
+        if self._clock_mapper is None:
+            sound.play(when=timestamp - self.local_clock())
+        else:
+            self._play_ptb(sound, self._clock_mapper(timestamp), callback)
+
+    def _play_ptb(
+        self, sound, when: float, callback: Callable[[float], None] | None
+    ) -> None:
+        """Schedule a PsychToolbox sound and track its onset."""
+        # the status of a sound is overwritten when it is scheduled again
+        if self.onsets.n_pending != 0:
+            self.onsets.poll()
+        start = self._audio_clock()
+        sound.play(when=when)
+        self.onsets.track(sound, when, self._audio_clock() - start, callback)
+
+    def poll_onsets(self, *, summary: bool = False) -> None:
+        """Collect the actual onsets of the sounds which started.
+
+        Parameters
+        ----------
+        summary : bool
+            If True, log a summary of the onset errors collected since the last
+            summary, e.g. at the end of a block.
+        """
+        if self.onsets is None:
+            return
+        self.onsets.poll()
+        if summary:
+            self.onsets.summary()
+
+    @property
+    def headroom(self) -> float:
+        """Headroom in seconds to schedule a sound."""
+        return HEADROOM if self.onsets is None else self.onsets.headroom
+
+    def sleep_until(self, timestamp: float) -> None:
+        """Sleep until an LSL timestamp."""
+        self.sleep(timestamp - self.local_clock())
+
+    @contextmanager
+    def block(self, name: str) -> Generator[None, None, None]:
+        """Context in which a block runs.
+
+        The block runs in real-time mode if ``REALTIME`` is set, its loop is monitored
+        by a :class:`~resp_audio_sleep.utils.watchdog.Watchdog` if ``WATCHDOG`` is set,
+        and it is profiled if the backend has a profiler.
+
+        Parameters
+        ----------
+        name : str
+            Name of the block, e.g. ``"synchronous-respiration"``.
+        """
+        with ExitStack() as stack:
+            # the watchdog starts before the real-time mode to not inherit the affinity
+            # and the real-time policy of the task thread
+            if WATCHDOG:
+                self._watchdog = Watchdog(WATCHDOG_THRESHOLD)
+                self._watchdog.start()
+                stack.callback(self._stop_watchdog)
+            if REALTIME:
+                stack.enter_context(
+                    realtime(
+                        REALTIME_CORES, priority=REALTIME_PRIORITY, mlock=REALTIME_MLOCK
+                    )
+                )
+            if self._profiler is not None:
+                stack.enter_context(self._profiler.block(name))
+            yield
+
+    def _stop_watchdog(self) -> None:
+        """Stop the watchdog of a block and log its summary."""
+        self._watchdog.stop()
+        self._watchdog.summary()
+        self._watchdog = None
+
+    @property
+    def profiler(self) -> Profiler | None:
+        """The profiler of the blocks."""
+        return self._profiler
+
+    def heartbeat(self, allowance: float = 0.0) -> None:
+        """Signal the watchdog that the loop of the block is alive.
+
+        Parameters
+        ----------
+        allowance : float
+            Additional delay in seconds before the next heartbeat, e.g. the duration of
+            an intended sleep. An infinite allowance disarms the watchdog.
+        """
+        if self._watchdog is not None:
+            self._watchdog.heartbeat(allowance)
+
+    @staticmethod
+    def idle() -> None:
+        """Yield the processor while the loop of the block waits for a new peak.
+
+        In real-time mode, the threads started within the block, e.g. the acquisition
+        threads of the detector streams, share the cores and the ``SCHED_FIFO``
+        priority of the task thread and run only when the task thread yields.
+        """
+        if hasattr(os, "sched_yield"):
+            os.sched_yield()
+
+    def create_sounds(self) -> dict:
+        """Create the sounds with the audio backend."""
+        from ._utils import create_sounds
+
+        return create_sounds(backend=self._audio, device=self._device)
+
+    def create_trigger(self):
+        """Create the configured trigger."""
+        from ._utils import create_trigger
+
+        return create_trigger(*self._trigger)
+
+    def create_detector(self, **kwargs):
+        """Create a :class:`~resp_audio_sleep.detector.Detector`.
+
+        If the backend has a poller, the detector is registered in the poller and the
+        peaks are retrieved from the poller.
+        """
+        from ..detector import Detector
+
+        detector = Detector(**kwargs)
+        return detector if self.poller is None else self.poller.register(detector)
+
+    @staticmethod
+    def create_keyboard() -> _Keyboard:
+        """Create a keyboard to monitor key presses."""
+        return _Keyboard()
+
+    def save_events(self, events: EventLog, directory: Path) -> None:
+        """Save the event log of a block in the background."""
+        directory = directory if self._directory is None else self._directory
+        fname = directory / _fname(
+            self.name, f"{events.block}-{events.start:%Y%m%d_%H%M%S}-events.npz"
+        )
+        logger.info(
+            "Saving %i events (%i delivered) to %s",
+            events.events.size,
+            events.delivered.size,
+            fname,
+        )
+        writer.submit(events.save, fname, description=f"save {fname.name}")
+
+
+class _Keyboard:
+    """PsychoPy keyboard silencing the logs emitted when it stops."""
+
+    def __init__(self) -> None:
+        from psychopy.hardware.keyboard import Keyboard
+
+        self._keyboard = Keyboard()
+        self.stop()
+
+    def start(self) -> None:
+        self._keyboard.start()
+
+    def stop(self) -> None:
+        from psychopy import logging
+
+        logging.console.setLevel(logging.CRITICAL)
+        self._keyboard.stop()
+        logging.console.setLevel(logging.WARNING)
+
+    def getKeys(self, *args, **kwargs) -> list:  # noqa: N802
+        return self._keyboard.getKeys(*args, **kwargs)
+
+
+class VirtualClock:
+    """Clock jumping ahead instead of sleeping.
+
+    Parameters
+    ----------
+    start : float
+        Initial time in seconds.
+    """
+
+    def __init__(self, start: float = 0.0) -> None:
+        check_type(start, ("numeric",), "start")
+        self._time = float(start)
+
+    def __call__(self) -> float:
+        """Get the current time in seconds."""
+        return self._time
+
+    def sleep(self, duration: float) -> None:
+        """Advance the clock by ``duration`` seconds, ignored if negative."""
+        if duration <= 0:
+            return
+        self._time += duration
+
+    def advance_to(self, t: float) -> None:
+        """Advance the clock to the time ``t`` if it is in the future."""
+        self._time = max(self._time, t)
+
+
+class SimulatedBackend:
+    """Backend simulating the hardware on a virtual clock.
+
+    The sounds and the triggers are recorded in memory with their virtual timings, and
+    the peaks are generated around a fixed period. The task loops then execute without
+    waiting, e.g. a whole paradigm runs in a fraction of a second.
+
+    Parameters
+    ----------
+    periods : dict
+        Mean period in seconds between 2 peaks, for the keys ``"resp"`` and ``"ecg"``.
+    jitter : float
+        Relative jitter between 0 and 1 applied uniformly to the period between 2
+        peaks.
+    detection_delay : float
+        Delay in seconds between a peak and its detection.
+    seed : int | None
+        Seed of the random generator used to generate the peaks.
+    poller : PeakPoller | None
+        Poller shared between several backends, which detects the peaks of all the
+        detectors in a single thread. If None, each call to ``new_peak`` waits on the
+        virtual clock until the next peak is detected. Else, the detectors are polled
+        without waiting, and the virtual clock advances to the next detection when the
+        task loop idles.
+    name : str | None
+        Name of the backend, e.g. the bed, prepended to the files saved by the tasks.
+    """
+
+    def __init__(
+        self,
+        periods: dict[str, float] | None = None,
+        jitter: float = 0.1,
+        detection_delay: float = 0.05,
+        seed: int | None = None,
+        *,
+        poller: PeakPoller | None = None,
+        name: str | None = None,
+    ) -> None:
+        check_type(name, (str, None), "name")
+        periods = {"resp": 4.0, "ecg": 1.0} if periods is None else periods
+        check_type(periods, (dict,), "periods")
+        for key, period in periods.items():
+            check_value(key, ("resp", "ecg"), "periods")
+            check_type(period, ("numeric",), "period")
+            if period <= 0:
+                raise ValueError("The peak periods must be strictly positive.")
+        check_type(jitter, ("numeric",), "jitter")
+        if not 0 <= jitter < 1:
+            raise ValueError("The argument 'jitter' must be in [0, 1).")
+        check_type(detection_delay, ("numeric",), "detection_delay")
+        if detection_delay < 0:
+            raise ValueError("The argument 'detection_delay' must be positive.")
+        self._periods = periods
+        self._jitter = jitter
+        self._detection_delay = detection_delay
+        self._rng = np.random.default_rng(seed)
+        self.clock = VirtualClock()
+        self.triggers: list[tuple[float, int]] = list()
+        self.sounds: list[tuple[float, float, str]] = list()
+        self.event_logs: list[EventLog] = list()
+        self.metrics = Metrics()
+        self.poller = poller
+        self.name = name
+        self._polled_detectors: WeakSet[_SimulatedDetector] = WeakSet()
+
+    def now(self) -> float:
+        """Virtual time in seconds."""
+        return self.clock()
+
+    def local_clock(self) -> float:
+        """Virtual time in seconds, standing in for the LSL clock."""
+        return self.clock()
+
+    def sleep(self, duration: float) -> None:
+        """Advance the virtual clock."""
+        self.clock.sleep(duration)
+
+    def play(
+        self,
+        sound: _SimulatedSound,
+        delay: float,
+        callback: Callable[[float], None] | None = None,
+    ) -> None:
+        """Record the scheduling of a sound."""
+        self.play_at(sound, self.clock() + delay, callback)
+
+    def play_at(
+        self,
+        sound: _SimulatedSound,
+        timestamp: float,
+        callback: Callable[[float], None] | None = None,
+    ) -> None:
+        """Record the scheduling of a sound at a virtual timestamp."""
+        sound.play(when=timestamp)
+        if callback is not None:
+            callback(0.0)  # the simulated sounds start on time
+
+    def poll_onsets(self, *, summary: bool = False) -> None:
+        """Collect the actual onsets, the simulated sounds start on time."""
+
+    @property
+    def headroom(self) -> float:
+        """Headroom in seconds to schedule a sound."""
+        return HEADROOM
+
+    def sleep_until(self, timestamp: float) -> None:
+        """Advance the virtual clock to a timestamp."""
+        self.clock.advance_to(timestamp)
+
+    @staticmethod
+    def block(name: str) -> AbstractContextManager:
+        """Context in which a block runs, the real-time mode is not simulated."""
+        return nullcontext()
+
+    def heartbeat(self, allowance: float = 0.0) -> None:
+        """Signal that the loop of the block is alive, the stalls are not simulated."""
+
+    def idle(self) -> None:
+        """Advance the virtual clock to the next detection of the polled detectors."""
+        detections = [
+            detection
+            for detector in list(self._polled_detectors)
+            if (detection := detector._next_detection()) is not None
+        ]
+        if len(detections) != 0:
+            self.clock.advance_to(min(detections))
+
+    def create_sounds(self) -> dict[str, _SimulatedSound]:
+        """Create in-memory sounds for every frequency in the trigger configuration."""
+        frequencies = set(elt.split("/")[1] for elt in TRIGGERS)
+        return {
+            frequency: _SimulatedSound(frequency, self) for frequency in frequencies
+        }
+
+    def create_trigger(self) -> _SimulatedTrigger:
+        """Create an in-memory trigger."""
+        return _SimulatedTrigger(self)
+
+    def create_detector(self, **kwargs) -> _SimulatedDetector | _PolledDetector:
+        """Create a detector generating peaks on the virtual clock.
+
+        The arguments of the detector are ignored. If the backend has a poller, the
+        detector is registered in the poller and the peaks are retrieved from the
+        poller.
+        """
+        if self.poller is None:
+            return _SimulatedDetector(self)
+        detector = _SimulatedDetector(self, polled=True)
+        self._polled_detectors.add(detector)
+        return self.poller.register(detector)
+
+    @staticmethod
+    def create_keyboard() -> _SimulatedKeyboard:
+        """Create a keyboard on which no key is ever pressed."""
+        return _SimulatedKeyboard()
+
+    def save_events(self, events: EventLog, directory: Path) -> None:
+        """Keep the event log of a block in memory."""
+        self.event_logs.append(events)
+
+    def _next_period(self, ch_type: str) -> float:
+        """Draw the delay until the next peak."""
+        period = self._periods[ch_type]
+        return period * (1 + self._rng.uniform(-self._jitter, self._jitter))
+
+
+class _SimulatedSound:
+    """Sound recording its scheduled onsets."""
+
+    def __init__(self, frequency: str, backend: SimulatedBackend) -> None:
+        self._frequency = frequency
+        self._backend = backend
+
+    def play(self, when: float) -> None:
+        self._backend.sounds.append((self._backend.now(), when, self._frequency))
+
+
+class _SimulatedTrigger:
+    """Trigger recording the values sent with their virtual timing."""
+
+    def __init__(self, backend: SimulatedBackend) -> None:
+        self._backend = backend
+
+    def signal(self, value: int) -> None:
+        self._backend.triggers.append((self._backend.now(), value))
+
+
+class _SimulatedDetector:
+    """Detector returning peaks generated on the virtual clock.
+
+    Each call to :meth:`new_peak` waits on the virtual clock until the next peak is
+    detected. A peak which occurred while the task was busy is returned late, as a real
+    detector would. A polled detector does not wait, and returns None until the virtual
+    clock reaches the detection of the next peak.
+    """
+
+    recorder = None
+    trigger_monitor = None
+    onset_monitor = None
+    peak_outlet = None
+
+    def __init__(self, backend: SimulatedBackend, *, polled: bool = False) -> None:
+        self._backend = backend
+        self._polled = polled
+        self._ch_type = None
+        self._next_peak = {
+            ch_type: backend.now() + backend._next_period(ch_type)
+            for ch_type in backend._periods
+        }
+
+    def _check_ch_type(self, ch_type: str) -> None:
+        if ch_type not in self._next_peak:
+            raise ValueError(f"No period was set for the channel type '{ch_type}'.")
+
+    def new_peak(self, ch_type: str) -> float | None:
+        peak = self._next_peak[ch_type]
+        detection = peak + self._backend._detection_delay
+        if self._polled:
+            self._ch_type = ch_type
+            if self._backend.now() < detection:
+                return None
+        else:
+            self._backend.clock.advance_to(detection)
+        self._next_peak[ch_type] = peak + self._backend._next_period(ch_type)
+        return peak
+
+    def _next_detection(self) -> float | None:
+        """Virtual time of the next detection of the polled channel type."""
+        if self._ch_type is None:
+            return None
+        return self._next_peak[self._ch_type] + self._backend._detection_delay
+
+
+class _SimulatedKeyboard:
+    """Keyboard on which no key is ever pressed."""
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+    def getKeys(self, *args, **kwargs) -> list:  # noqa: N802
+        return []
+
+
+_backend: ContextVar[RealBackend | SimulatedBackend | None] = ContextVar(
+    "backend", default=None
+)
+_real_backend: RealBackend | None = None
+
+
+def get_backend() -> RealBackend | SimulatedBackend:
+    """Get the backend of the current context.
+
+    Returns
+    -------
+    backend : RealBackend | SimulatedBackend
+        The backend selected with :func:`use_backend`, or the hardware backend.
+    """
+    global _real_backend
+
+    backend = _backend.get()
+    if backend is not None:
+        return backend
+    if _real_backend is None:
+        _real_backend = RealBackend()
+    return _real_backend
+
+
+def task_block(func: Callable) -> Callable:
+    """Decorate a task to run it in the block context of the current backend."""
+    name = func.__name__.replace("_", "-")
+
+    @wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        with get_backend().block(name):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+@contextmanager
+def use_backend(
+    backend: RealBackend | SimulatedBackend,
+) -> Generator[RealBackend | SimulatedBackend, None, None]:
+    """Select the backend used by the tasks executed in this context.
+
+    Parameters
+    ----------
+    backend : RealBackend | SimulatedBackend
+        The backend to use.
+    """
+    check_type(backend, (RealBackend, SimulatedBackend), "backend")
+    token = _backend.set(backend)
+    try:
+        yield backend
+    finally:
+        _backend.reset(token)
+
+
+def _fname(name: str | None, fname: str) -> str:
+    """Prepend the name of a backend to a file name."""
+    return fname if name is None else f"{name}-{fname}"
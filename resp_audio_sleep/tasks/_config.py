@@ -38,6 +38,20 @@ EDGE_PERC: float = 10  # percentage between 0 and 100 in which deviant are absen
 OUTLIER_PERC: float = 10  # percentage between 0 and 100 to remove outliers PTP delays
 # target timing
 TARGET_DELAY: float = 0.25
+# headroom to schedule, buffer and play a sound, adapted from the audio latencies
+# reported by PTB to the percentile of the observed latencies plus a margin
+HEADROOM: float = 0.015  # in seconds, initial or fixed headroom
+HEADROOM_ADAPTIVE: bool = True
+HEADROOM_PERCENTILE: float = 99
+HEADROOM_MARGIN: float = 0.002  # in seconds
+# real-time mode entered for each block, see resp_audio_sleep.utils.realtime.realtime
+REALTIME: bool = False
+REALTIME_CORES: tuple[int, ...] | None = None  # None to keep the CPU affinity
+REALTIME_PRIORITY: int | None = 10  # SCHED_FIFO priority, None to keep the priority
+REALTIME_MLOCK: bool = False
+# watchdog capturing the stack of the task loop when it stalls
+WATCHDOG: bool = False
+WATCHDOG_THRESHOLD: float = 0.05  # in seconds, delay without heartbeat
 # other
 INTER_BLOCK_DELAY: float = 5  # delay in seconds between blocks
 
@@ -5,5 +5,5 @@ from __future__ import annotations
 ECG_HEIGHT: float = 0.985
 ECG_DISTANCE: float = 0.3
 ECG_PROMINENCE: float | None = None
-RESP_PROMINENCE: float = 5
+RESP_PROMINENCE: float = 5  # in standard deviations if several channels are fused
 RESP_DISTANCE: float = 0.8
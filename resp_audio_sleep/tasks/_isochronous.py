@@ -1,18 +1,15 @@
 from __future__ import annotations
 
-from stimuli.time import Clock, sleep
-
 from ..detector import _BUFSIZE
 from ..utils._checks import check_type
 from ..utils._docs import fill_doc
 from ..utils.logs import logger
-from ._config import BACKEND, SOUND_DURATION, TARGET_DELAY, TRIGGER_TASKS, TRIGGERS
-from ._utils import create_sounds, create_trigger, generate_sequence
-
-if BACKEND == "ptb":
-    import psychtoolbox as ptb
+from ._backend import get_backend, task_block
+from ._config import SOUND_DURATION, TARGET_DELAY, TRIGGER_TASKS, TRIGGERS
+from ._utils import generate_sequence
 
 
+@task_block
 @fill_doc
 def isochronous(delay: float, *, target: float, deviant: float) -> None:
     """Isochronous auditory stimulus.
@@ -28,11 +25,11 @@ def isochronous(delay: float, *, target: float, deviant: float) -> None:
     if delay <= 0:
         raise ValueError("The delay must be strictly positive.")
     logger.info("Starting isochronous block.")
-    # create sound stimuli, trigger, sequence and clock
-    sounds = create_sounds(backend=BACKEND)
-    trigger = create_trigger()
+    # create sound stimuli, trigger and sequence
+    backend = get_backend()
+    sounds = backend.create_sounds()
+    trigger = backend.create_trigger()
     sequence = generate_sequence(target, deviant)
-    clock = Clock()
     # the sequence, sound and trigger generation validates the trigger dictionary, thus
     # we can safely map the target and deviant frequencies to their corresponding
     # trigger values and sounds.
@@ -41,25 +38,27 @@ def isochronous(delay: float, *, target: float, deviant: float) -> None:
         TRIGGERS[f"deviant/{deviant}"]: sounds[str(deviant)],
     }
     # main loop
-    sleep(_BUFSIZE)  # fake a buffer filling
+    backend.sleep(_BUFSIZE)  # fake a buffer filling
     counter = 0
     trigger.signal(TRIGGER_TASKS["isochronous"][0])
     while counter <= sequence.size - 1:
-        start = clock.get_time()
-        stimulus.get(sequence[counter]).play(
-            when=ptb.GetSecs() + TARGET_DELAY if BACKEND == "ptb" else TARGET_DELAY
-        )
+        start = backend.now()
+        backend.play(stimulus.get(sequence[counter]), TARGET_DELAY)
         logger.debug("Triggering %i in %.2f ms.", sequence[counter], TARGET_DELAY)
-        sleep(TARGET_DELAY)
+        backend.heartbeat(TARGET_DELAY)
+        backend.sleep(TARGET_DELAY)
         trigger.signal(sequence[counter])
         logger.info("Stimulus %i / %i complete.", counter + 1, sequence.size)
         # note that if 'delay' is too short, the value 'wait' could end up negative
         # which (1) makes no sense and (2) would raise in the sleep function.
-        wait = start + delay - clock.get_time()
-        sleep(wait)
+        wait = start + delay - backend.now()
+        backend.heartbeat(max(wait, 0))
+        backend.sleep(wait)
         counter += 1
+    backend.heartbeat(float("inf"))  # disarm the watchdog
     # wait for the last sound to finish
     if wait < 1.1 * SOUND_DURATION:
-        sleep(1.1 * SOUND_DURATION - wait)
+        backend.sleep(1.1 * SOUND_DURATION - wait)
     trigger.signal(TRIGGER_TASKS["isochronous"][1])
+    backend.poll_onsets(summary=True)
     logger.info("Isochronous block complete.")
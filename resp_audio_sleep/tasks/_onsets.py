@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+from collections import deque
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from ..utils._checks import check_type, ensure_int
+from ..utils.logs import logger
+from ._config import HEADROOM, HEADROOM_MARGIN, HEADROOM_PERCENTILE
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from numpy.typing import NDArray
+    from psychopy.sound.backend_ptb import SoundPTB
+
+
+# delay in seconds after the requested onset after which a sound without reported onset
+# is discarded, e.g. a sound stopped before it started.
+_TIMEOUT: float = 5.0
+
+
+class OnsetTracker:
+    """Collect the actual onsets of the sounds reported by PsychToolbox.
+
+    The status of the PTB audio stream reports the actual start time of a sound once it
+    started. The sounds are tracked with their requested onset when they are scheduled
+    and their status is polled later, outside of the time-critical path. A sound
+    scheduled again overwrites its status, thus its previous playback is no longer
+    tracked.
+
+    The scheduling headroom, i.e. the minimum delay between the scheduling of a sound
+    and its onset, is adapted from the observed latencies. The latency of a sound is the
+    output latency predicted by PTB, plus the duration of the call scheduling the sound,
+    plus the delay of the actual onset after the requested onset.
+
+    Parameters
+    ----------
+    headroom : float
+        Initial headroom in seconds, used until ``n_min`` latencies are observed.
+    adaptive : bool
+        If True, the headroom is adapted from the observed latencies.
+    percentile : float
+        Percentile of the observed latencies used as headroom, between 0 and 100.
+    margin : float
+        Margin in seconds added to the percentile of the observed latencies.
+    n_min : int
+        Minimum number of observed latencies before the headroom is adapted.
+    n_latencies : int
+        Number of recent latencies used to adapt the headroom.
+    """
+
+    def __init__(
+        self,
+        headroom: float = HEADROOM,
+        *,
+        adaptive: bool = True,
+        percentile: float = HEADROOM_PERCENTILE,
+        margin: float = HEADROOM_MARGIN,
+        n_min: int = 20,
+        n_latencies: int = 500,
+    ) -> None:
+        check_type(headroom, ("numeric",), "headroom")
+        if headroom <= 0:
+            raise ValueError("The argument 'headroom' must be strictly positive.")
+        check_type(adaptive, (bool,), "adaptive")
+        check_type(percentile, ("numeric",), "percentile")
+        if not 0 <= percentile <= 100:
+            raise ValueError("The argument 'percentile' must be between 0 and 100.")
+        check_type(margin, ("numeric",), "margin")
+        if margin < 0:
+            raise ValueError("The argument 'margin' must be positive.")
+        n_min = ensure_int(n_min, "n_min")
+        n_latencies = ensure_int(n_latencies, "n_latencies")
+        if n_latencies < n_min:
+            raise ValueError(
+                "The argument 'n_latencies' must be greater than or equal to 'n_min'."
+            )
+        self._headroom = headroom
+        self._adaptive = adaptive
+        self._percentile = percentile
+        self._margin = margin
+        self._n_min = n_min
+        self._pending = list()
+        self._latencies = deque(maxlen=n_latencies)
+        self._errors = list()
+
+    def track(
+        self,
+        sound: SoundPTB,
+        when: float,
+        call_duration: float,
+        callback: Callable[[float], None] | None = None,
+    ) -> None:
+        """Track a scheduled sound.
+
+        Parameters
+        ----------
+        sound : SoundPTB
+            The scheduled sound.
+        when : float
+            Requested onset of the sound on the PTB clock.
+        call_duration : float
+            Duration in seconds of the call scheduling the sound.
+        callback : callable | None
+            Function called with the onset error in seconds, i.e. the delay between the
+            requested and the actual onset, once the sound started.
+        """
+        n_pending = len(self._pending)
+        self._pending = [entry for entry in self._pending if entry[0] is not sound]
+        if len(self._pending) != n_pending:
+            logger.debug("Discarding a sound scheduled again before its onset.")
+        self._pending.append((sound, when, call_duration, callback))
+
+    def poll(self) -> int:
+        """Collect the onsets of the tracked sounds which started, without blocking.
+
+        Returns
+        -------
+        n_onsets : int
+            Number of onsets collected.
+        """
+        pending = list()
+        n_onsets = 0
+        for sound, when, call_duration, callback in self._pending:
+            status = sound.track.status
+            if status["StartTime"] <= 0 or status["StartTime"] < when - 1e-3:
+                # not started yet, or status of a previous playback
+                if status["CurrentStreamTime"] - when < _TIMEOUT:
+                    pending.append((sound, when, call_duration, callback))
+                else:
+                    logger.debug("Discarding a sound without reported onset.")
+                continue
+            error = status["StartTime"] - when
+            self._errors.append(error)
+            self._latencies.append(
+                status["PredictedLatency"] + call_duration + max(error, 0)
+            )
+            if callback is not None:
+                callback(error)
+            n_onsets += 1
+        self._pending = pending
+        if n_onsets != 0 and self._adaptive and self._n_min <= len(self._latencies):
+            self._headroom = (
+                float(np.percentile(self._latencies, self._percentile)) + self._margin
+            )
+        return n_onsets
+
+    def summary(self) -> None:
+        """Log a summary of the onset errors collected since the last summary."""
+        if len(self._errors) != 0:
+            errors = np.array(self._errors) * 1000
+            logger.info(
+                "Audio onset error (ms) on %i sounds: median %.3f, max %.3f. Headroom: "
+                "%.1f ms.",
+                errors.size,
+                np.median(errors),
+                np.max(errors),
+                self._headroom * 1000,
+            )
+        self._errors.clear()
+
+    @property
+    def headroom(self) -> float:
+        """Headroom in seconds to schedule a sound."""
+        return self._headroom
+
+    @property
+    def latencies(self) -> NDArray[np.float64]:
+        """Recent latencies in seconds used to adapt the headroom."""
+        return np.array(self._latencies)
+
+    @property
+    def n_pending(self) -> int:
+        """Number of tracked sounds without reported onset."""
+        return len(self._pending)
@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import datetime
+import time
+from itertools import cycle
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from .._config import TELEMETRY, TELEMETRY_INTERVAL, TELEMETRY_PATH
+from ..detector import _BUFSIZE
+from ..utils._checks import check_type
+from ..utils._docs import fill_doc
+from ..utils.blocks import _BLOCKS, generate_blocks_sequence
+from ..utils.logs import logger, warn
+from ..utils.telemetry import TelemetrySampler
+from ..utils.writer import writer
+from ._asynchronous import asynchronous as asynchronous_task
+from ._backend import _fname, get_backend
+from ._baseline import baseline as baseline_task
+from ._config import BASELINE_DURATION, INTER_BLOCK_DELAY
+from ._isochronous import isochronous as isochronous_task
+from .synchronous import synchronous_cardiac as synchronous_cardiac_task
+from .synchronous import synchronous_respiration as synchronous_respiration_task
+
+if TYPE_CHECKING:
+    from psychopy.hardware.keyboard import Keyboard
+
+    from ._backend import RealBackend, SimulatedBackend
+
+
+@fill_doc
+def paradigm(
+    n_blocks: int,
+    stream_name: str,
+    resp_ch_name: str | list[str],
+    ecg_ch_name: str,
+    *,
+    target: float,
+    deviant: float,
+    pause_key: str | None = "space",
+) -> None:
+    """Run the paradigm, alternating between blocks.
+
+    Parameters
+    ----------
+    n_blocks : int
+        Number of blocks to run.
+    %(stream_name)s
+    %(resp_ch_name)s
+    %(ecg_ch_name)s
+    %(fq_target)s
+    %(fq_deviant)s
+    pause_key : str | None
+        Key pausing the paradigm during the inter-block delay. If None, the paradigm
+        can not be paused, e.g. for a bed run by an orchestrator.
+    """
+    if n_blocks <= 0:
+        raise ValueError(f"Number of blocks must be positive. '{n_blocks}' is invalid.")
+    check_type(pause_key, (str, None), "pause_key")
+    # prepare mapping between function and block name
+    mapping_func = {
+        "baseline": baseline_task,
+        "isochronous": isochronous_task,
+        "asynchronous": asynchronous_task,
+        "synchronous-respiration": synchronous_respiration_task,
+        "synchronous-cardiac": synchronous_cardiac_task,
+    }
+    assert len(set(mapping_func) - set(_BLOCKS)) == 0  # sanity-check
+    # prepare mapping between argument and block name
+    mapping_args = {
+        "baseline": [BASELINE_DURATION],
+        "isochronous": [None],
+        "asynchronous": [None],
+        "synchronous-respiration": [stream_name, resp_ch_name],
+        "synchronous-cardiac": [stream_name, ecg_ch_name, None],
+    }
+    assert len(set(mapping_args) - set(_BLOCKS)) == 0
+    # prepare mapping between keyword argument and block name, including target and
+    # deviant cycling frequencis
+    targets = cycle([target, deviant])
+    deviants = cycle([deviant, target])
+    # overwrite the same variables
+    target = next(targets)
+    deviant = next(deviants)
+    mapping_kwargs = {
+        "baseline": {},
+        "isochronous": {"target": target, "deviant": deviant},
+        "asynchronous": {"target": target, "deviant": deviant},
+        "synchronous-respiration": {"target": target, "deviant": deviant},
+        "synchronous-cardiac": {"target": target, "deviant": deviant},
+    }
+    assert len(set(mapping_kwargs) - set(_BLOCKS)) == 0  # sanity-check
+    # create a keyboard object to monitor for breaks
+    backend = get_backend()
+    keyboard = None if pause_key is None else backend.create_keyboard()
+    if TELEMETRY:
+        telemetry = TelemetrySampler(TELEMETRY_INTERVAL)
+        telemetry.start()
+    else:
+        telemetry = None
+    # execute paradigm loop
+    blocks = list()
+    while len(blocks) < n_blocks:
+        blocks.append(generate_blocks_sequence(blocks))
+        logger.info("Running block %i / %i: %s.", len(blocks), n_blocks, blocks[-1])
+        start = backend.now()
+        start_wall = time.time()
+        result = mapping_func[blocks[-1]](
+            *mapping_args[blocks[-1]], **mapping_kwargs[blocks[-1]]
+        )
+        duration = backend.now() - start
+        logger.info("Block '%s' took %.3f seconds.", blocks[-1], duration - _BUFSIZE)
+        if telemetry is not None:
+            telemetry.summary(start_wall)
+        # prepare arguments for future blocks if we just ran a respiration synchronous
+        # block
+        if result is not None:
+            # sanity-check
+            assert blocks[-1] == "synchronous-respiration"
+            assert isinstance(result, np.ndarray)
+            assert result.ndim == 1
+            assert result.size != 0
+            mapping_args["baseline"][0] = duration - _BUFSIZE
+            mapping_args["asynchronous"][0] = result
+            mapping_args["synchronous-cardiac"][2] = result
+            delay = np.median(np.diff(result))
+            mapping_args["isochronous"][0] = delay
+            logger.info(
+                "Median delay between respiration peaks set to %.3f seconds.", delay
+            )
+        # prepare keyword argument for future blocks if we just ran 5 blocks
+        if len(blocks) % 5 == 0:
+            logger.info("Cycling target and deviant frequencies.")
+            target = next(targets)
+            deviant = next(deviants)
+            for key, elt in mapping_kwargs.items():
+                if key == "baseline":
+                    continue
+                elt["target"] = target
+                elt["deviant"] = deviant
+        # wait in the inter block delay or a pause key press
+        _wait_inter_block(INTER_BLOCK_DELAY, keyboard, backend, pause_key)
+    if telemetry is not None:
+        telemetry.stop()
+        fname = TELEMETRY_PATH / _fname(
+            backend.name,
+            f"paradigm-{datetime.datetime.now():%Y%m%d_%H%M%S}-telemetry.npz",
+        )
+        writer.submit(telemetry.save, fname, description=f"save {fname.name}")
+    if writer.n_pending != 0:
+        logger.info("Waiting for %i background save(s) to complete.", writer.n_pending)
+    writer.flush()
+    logger.info("Paradigm complete. Exiting.")
+
+
+def _wait_inter_block(
+    delay: float,
+    keyboard: Keyboard | None,
+    backend: RealBackend | SimulatedBackend,
+    key: str = "space",
+) -> None:
+    """Wait the inter-block delay.
+
+    Parameters
+    ----------
+    delay : float
+        The delay to wait in seconds.
+    keyboard : Keyboard | None
+        The keyboard object used to monitor the pause key press. If None, the delay
+        can not be paused.
+    backend : RealBackend | SimulatedBackend
+        The backend used to measure time and sleep.
+    key : str
+        The key pausing and resuming the execution.
+    """
+    assert 0 < delay  # sanity-check
+    start = backend.now()
+    if keyboard is None:
+        logger.info("Inter-block for %.1f seconds.", delay)
+        backend.sleep(delay)
+        logger.info("Inter-block complete.")
+        return
+    keyboard.start()
+    logger.info("Inter-block for %.1f seconds (press %s to pause).", delay, key)
+    while True:
+        keys = keyboard.getKeys(keyList=[key], waitRelease=True)
+        if len(keys) > 1:
+            warn(f"Multiple {key} key pressed simultaneously. Skipping.")
+            continue
+        elif len(keys) == 1:
+            logger.info("%s key pressed, pausing execution.", key.capitalize())
+            start_hold = backend.now()
+            while True:
+                keys = keyboard.getKeys(keyList=[key], waitRelease=True)
+                if len(keys) > 1:
+                    warn(f"Multiple {key} key pressed simultaneously. Skipping.")
+                    continue
+                elif len(keys) == 1:
+                    break
+                backend.sleep(0.05)
+            stop_hold = backend.now()
+            delay += stop_hold - start_hold
+            logger.info(
+                "%s key pressed, resuming execution. Inter-block delay "
+                "remaining duration: %.1f seconds.",
+                key.capitalize(),
+                delay - (backend.now() - start),
+            )
+        if backend.now() - start > delay:
+            break
+        backend.sleep(0.05)
+    keyboard.stop()
+    logger.info("Inter-block complete.")
@@ -5,7 +5,6 @@ from itertools import groupby
 from typing import TYPE_CHECKING
 
 import numpy as np
-from stimuli.trigger import ParallelPortTrigger
 
 from ..utils._checks import check_type, check_value, ensure_int
 from ..utils._docs import fill_doc
@@ -85,7 +84,10 @@ def _ensure_valid_frequencies(
 
 @fill_doc
 def create_sounds(
-    *, triggers: dict[str, int] = TRIGGERS, backend: str
+    *,
+    triggers: dict[str, int] = TRIGGERS,
+    backend: str,
+    device: str | int | None = DEVICE,
 ) -> dict[str, SoundPTB | Tone]:
     """Create auditory simuli.
 
@@ -94,6 +96,9 @@ def create_sounds(
     %(triggers_dict)s
     backend : ``"ptb"`` | ``"stimuli"``
         The backend to use for the sound generation.
+    device : str | int | None
+        The output device, or None to use the default device. With the PsychToolbox
+        backend, the device is selected for the whole process.
 
     Returns
     -------
@@ -105,10 +110,10 @@ def create_sounds(
     frequencies = set(elt.split("/")[1] for elt in triggers)
     check_value(backend, ("ptb", "stimuli"), "backend")
     if backend == "ptb":
-        if DEVICE is not None:
+        if device is not None:
             from psychopy.sound import setDevice
 
-            setDevice(DEVICE, kind="output")
+            setDevice(device, kind="output")
 
         from psychopy.sound.backend_ptb import SoundPTB
 
@@ -131,7 +136,7 @@ def create_sounds(
                 volume=100,
                 duration=SOUND_DURATION,
                 block_size=BLOCKSIZE,
-                device=DEVICE,
+                device=device,
             )
             for frequency in frequencies
         }
@@ -143,21 +148,32 @@ def create_sounds(
     return sounds
 
 
-def create_trigger() -> BaseTrigger:
+def create_trigger(
+    trigger_type: str = TRIGGER_TYPE, trigger_args: str | None = TRIGGER_ARGS
+) -> BaseTrigger:
     """Create a trigger object.
 
+    Parameters
+    ----------
+    trigger_type : ``"arduino"`` | ``"lpt"``
+        The type of trigger.
+    trigger_args : str | None
+        The address of the parallel port for the ``"lpt"`` trigger.
+
     Returns
     -------
     trigger : Trigger
         The corresponding trigger object.
     """
-    check_type(TRIGGER_TYPE, (str,), "trigger_type")
-    check_value(TRIGGER_TYPE, ("arduino", "lpt"), "TRIGGER_TYPE")
-    check_type(TRIGGER_ARGS, (str, None), "TRIGGER_ARGS")
-    if TRIGGER_TYPE == "arduino":
+    check_type(trigger_type, (str,), "trigger_type")
+    check_value(trigger_type, ("arduino", "lpt"), "trigger_type")
+    check_type(trigger_args, (str, None), "trigger_args")
+    from stimuli.trigger import ParallelPortTrigger
+
+    if trigger_type == "arduino":
         trigger = ParallelPortTrigger("arduino", delay=10)
-    elif TRIGGER_TYPE == "lpt":
-        trigger = ParallelPortTrigger(TRIGGER_ARGS, delay=10)
+    elif trigger_type == "lpt":
+        trigger = ParallelPortTrigger(trigger_args, delay=10)
     return trigger
 
 
@@ -0,0 +1,484 @@
+"""Orchestration of several paradigms, one per bed, in a single process.
+
+Each bed runs its paradigm in its own thread with its own backend, thus with its own
+sound device, trigger, watchdog and metrics. The timing-critical scheduling of the
+stimuli remains in the thread of each bed, while the peaks of all the beds are detected
+by a single :class:`PeakPoller` thread instead of one busy loop per bed.
+"""
+
+from __future__ import annotations
+
+import time
+import traceback
+from queue import Empty, SimpleQueue
+from threading import Event, Lock, Thread
+from typing import TYPE_CHECKING
+from weakref import WeakSet
+
+from .._config import RECORDER
+from ..utils._checks import check_type, ensure_int
+from ..utils.logs import logger
+from ..utils.metrics import Metrics, MetricsServer
+from ._backend import RealBackend, SimulatedBackend, use_backend
+from ._config import BACKEND, DEVICE, TRIGGER_ARGS, TRIGGER_TYPE
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+    from pathlib import Path
+
+    from ..detector import Detector
+
+
+class PeakPoller:
+    """Poller detecting the peaks of several detectors in a single thread.
+
+    The registered detectors are swept in turn, and each peak is handed over to the
+    thread of the task waiting on the detector. A detector is polled once its task
+    requested a peak, and until the task releases the detector.
+
+    Parameters
+    ----------
+    interval : float
+        Delay in seconds between 2 sweeps of the detectors.
+    """
+
+    def __init__(self, interval: float = 0.002) -> None:
+        check_type(interval, ("numeric",), "interval")
+        if interval <= 0:
+            raise ValueError("The argument 'interval' must be strictly positive.")
+        self._interval = interval
+        self._detectors: WeakSet[_PolledDetector] = WeakSet()
+        self._lock = Lock()
+        self._stop_event = Event()
+        self._thread = None
+        self._n_sweeps = 0
+        self._sweep_duration = [0.0, 0.0]  # total and max
+
+    def register(self, detector: Detector) -> _PolledDetector:
+        """Register a detector.
+
+        Parameters
+        ----------
+        detector : Detector
+            The detector to poll. Once registered, the detector must only be polled
+            through the returned proxy.
+
+        Returns
+        -------
+        detector : _PolledDetector
+            Proxy of the detector, whose ``new_peak`` method waits for a peak detected
+            by the poller. The detector is released when the proxy is deleted.
+        """
+        proxy = _PolledDetector(detector)
+        with self._lock:
+            self._detectors.add(proxy)
+        return proxy
+
+    def start(self) -> None:
+        """Start polling the detectors."""
+        if self._thread is not None:
+            raise RuntimeError("The poller is already running.")
+        self._stop_event.clear()
+        self._thread = Thread(target=self._run, name="peak-poller", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop polling the detectors."""
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self) -> None:
+        """Run the polling loop in the background thread."""
+        while not self._stop_event.wait(self._interval):
+            self.poll()
+
+    def poll(self) -> int:
+        """Sweep the registered detectors once.
+
+        Returns
+        -------
+        n_peaks : int
+            Number of new peaks detected during the sweep.
+        """
+        start = time.perf_counter()
+        with self._lock:
+            detectors = list(self._detectors)
+        n_peaks = sum(detector._poll() for detector in detectors)
+        del detectors  # release the detectors deleted by their task during the sweep
+        duration = time.perf_counter() - start
+        self._n_sweeps += 1
+        self._sweep_duration[0] += duration
+        self._sweep_duration[1] = max(self._sweep_duration[1], duration)
+        return n_peaks
+
+    def summary(self) -> None:
+        """Log a summary of the sweeps."""
+        if self._n_sweeps == 0:
+            logger.info("Peak poller: no sweep.")
+            return
+        logger.info(
+            "Peak poller: %i sweep(s), mean %.3f ms, max %.3f ms.",
+            self._n_sweeps,
+            self._sweep_duration[0] / self._n_sweeps * 1000,
+            self._sweep_duration[1] * 1000,
+        )
+
+    @property
+    def n_detectors(self) -> int:
+        """Number of registered detectors."""
+        with self._lock:
+            return len(self._detectors)
+
+    @property
+    def running(self) -> bool:
+        """Whether the poller is running."""
+        return self._thread is not None
+
+
+class _PolledDetector:
+    """Proxy of a detector polled by a :class:`PeakPoller`.
+
+    The attributes of the detector, e.g. its recorder or its monitors, are available on
+    the proxy.
+    """
+
+    def __init__(self, detector: Detector) -> None:
+        self._detector = detector
+        self._ch_type = None
+        self._peaks = SimpleQueue()
+        self._error = None
+
+    def new_peak(self, ch_type: str, timeout: float = 0.01) -> float | None:
+        """Wait for a new peak detected by the poller.
+
+        Parameters
+        ----------
+        ch_type : str
+            The channel type, ``"ecg"`` or ``"resp"``.
+        timeout : float
+            Maximum delay in seconds to wait for a peak.
+
+        Returns
+        -------
+        peak : float | None
+            The timestamp of the most recent peak detected since the last call. None if
+            no new peak is detected within the timeout.
+        """
+        if ch_type != self._ch_type:
+            self._detector._check_ch_type(ch_type)
+            self._ch_type = ch_type
+        try:
+            peak = self._peaks.get(timeout=timeout)
+        except Empty:
+            if self._error is not None:
+                raise self._error
+            return None
+        # a task busy delivering a stimulus retrieves only the most recent peak, as the
+        # detector would have returned.
+        while not self._peaks.empty():
+            peak = self._peaks.get_nowait()
+        return peak
+
+    def _poll(self) -> bool:
+        """Poll the detector from the thread of the poller."""
+        ch_type = self._ch_type
+        if ch_type is None or self._error is not None:
+            return False
+        try:
+            peak = self._detector.new_peak(ch_type)
+        except Exception as error:
+            # the traceback references the frames of the poller, and thus the other
+            # detectors, thus only its formatted version is kept.
+            logger.error(
+                "The detection failed:\n%s",
+                "".join(traceback.format_exception(error)).strip("\n"),
+            )
+            self._error = error.with_traceback(None)
+            return False
+        if peak is None:
+            return False
+        self._peaks.put(peak)
+        return True
+
+    def __getattr__(self, name: str):
+        return getattr(self._detector, name)
+
+
+class Bed:
+    """Configuration of a bed run by the :class:`Orchestrator`.
+
+    Parameters
+    ----------
+    name : str
+        Name of the bed, used to label its threads, logs and metrics.
+    stream_name : str
+        Name of the LSL stream of the bed.
+    resp_ch_name : str | list of str
+        Name of the respiration channel, or names of the respiration channels fused by
+        the detector.
+    ecg_ch_name : str
+        Name of the ECG channel.
+    n_blocks : int
+        Number of blocks to run.
+    target : float
+        Frequency of the target sound in Hz.
+    deviant : float
+        Frequency of the deviant sound in Hz.
+    device : str | int | None
+        The audio output device of the bed, by default ``DEVICE`` from the task
+        configuration.
+    trigger_type : ``"arduino"`` | ``"lpt"``
+        The type of trigger of the bed.
+    trigger_args : str | None
+        The address of the parallel port for the ``"lpt"`` trigger.
+    directory : str | Path | None
+        Directory in which the event logs of the bed are saved.
+    pause_key : str | None
+        Key pausing the bed during its inter-block delays, distinct from the pause keys
+        of the other beds since the keyboard is shared. If None, the bed can not be
+        paused.
+    backend : RealBackend | SimulatedBackend | None
+        The backend of the bed. If None, a :class:`RealBackend` is created from the
+        configuration of the bed. A backend without poller is attached to the poller of
+        the orchestrator, and a backend without name is named after the bed.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        stream_name: str,
+        resp_ch_name: str | list[str],
+        ecg_ch_name: str,
+        *,
+        n_blocks: int,
+        target: float,
+        deviant: float,
+        device: str | int | None = DEVICE,
+        trigger_type: str = TRIGGER_TYPE,
+        trigger_args: str | None = TRIGGER_ARGS,
+        directory: str | Path | None = None,
+        pause_key: str | None = None,
+        backend: RealBackend | SimulatedBackend | None = None,
+    ) -> None:
+        for var, var_name in (
+            (name, "name"),
+            (stream_name, "stream_name"),
+            (ecg_ch_name, "ecg_ch_name"),
+        ):
+            check_type(var, (str,), var_name)
+        check_type(resp_ch_name, (str, list), "resp_ch_name")
+        n_blocks = ensure_int(n_blocks, "n_blocks")
+        if n_blocks <= 0:
+            raise ValueError("The argument 'n_blocks' must be strictly positive.")
+        check_type(target, ("numeric",), "target")
+        check_type(deviant, ("numeric",), "deviant")
+        check_type(pause_key, (str, None), "pause_key")
+        check_type(backend, (RealBackend, SimulatedBackend, None), "backend")
+        self.name = name
+        self.stream_name = stream_name
+        self.resp_ch_name = resp_ch_name
+        self.ecg_ch_name = ecg_ch_name
+        self.n_blocks = n_blocks
+        self.target = target
+        self.deviant = deviant
+        self.device = device
+        self.trigger_type = trigger_type
+        self.trigger_args = trigger_args
+        self.directory = directory
+        self.pause_key = pause_key
+        self.backend = backend
+
+
+class Orchestrator:
+    """Run the paradigms of several beds from a single process.
+
+    Each bed runs its paradigm in its own thread with its own backend, thus the
+    scheduling of the stimuli of a bed is not delayed by the other beds. The peaks of
+    all the beds are detected by a shared :class:`PeakPoller`, and each bed updates its
+    own :class:`~resp_audio_sleep.utils.metrics.Metrics` labelled with its name.
+
+    Parameters
+    ----------
+    beds : sequence of Bed
+        The beds to run.
+    poll_interval : float
+        Delay in seconds between 2 sweeps of the detectors of the beds.
+    metrics_port : int | None
+        Port of the localhost on which the metrics of all the beds are served. If None,
+        the metrics are not served.
+
+    Notes
+    -----
+    The beds share the resources of the process:
+
+    * the PsychToolbox audio backend selects the output device for the whole process,
+      thus the beds can use distinct devices only with the ``"stimuli"`` audio backend.
+    * the keyboard is shared, thus each bed is paused with its own key, see
+      :class:`Bed`.
+    * the garbage collection and the memory locking of the real-time mode are
+      process-wide, thus they are restored once no bed runs a block.
+    * the recordings of the blocks (``RECORDER``) are saved to the same files, thus
+      they are not supported. The flight recorders (``RECORDER_RING``) of the beds dump
+      in the same directory, with the name of the stream of the bed in the file name,
+      and the dump key dumps the flight recorders of all the beds.
+    * the event logs and the telemetry of the beds are saved in the same directories
+      by default, thus the name of the bed is prepended to their file names.
+    """
+
+    def __init__(
+        self,
+        beds: Sequence[Bed],
+        *,
+        poll_interval: float = 0.002,
+        metrics_port: int | None = None,
+    ) -> None:
+        beds = list(beds)
+        if len(beds) == 0:
+            raise ValueError("The argument 'beds' must contain at least one bed.")
+        for bed in beds:
+            check_type(bed, (Bed,), "bed")
+        names = [bed.name for bed in beds]
+        if len(set(names)) != len(names):
+            raise ValueError("The names of the beds must be unique.")
+        devices = {bed.device for bed in beds if bed.backend is None}
+        if BACKEND == "ptb" and 1 < len(devices):
+            raise ValueError(
+                "The PsychToolbox audio backend selects the output device for the "
+                "whole process. Use the 'stimuli' audio backend to run the beds on "
+                "distinct devices."
+            )
+        pause_keys = [bed.pause_key for bed in beds if bed.pause_key is not None]
+        if len(set(pause_keys)) != len(pause_keys):
+            raise ValueError(
+                "The pause keys of the beds must be unique since the keyboard is "
+                "shared between the beds."
+            )
+        if RECORDER and 1 < len(beds):
+            raise ValueError(
+                "The recordings of the blocks are saved to the same files for all the "
+                "beds. Use the flight recorder instead."
+            )
+        if metrics_port is not None:
+            metrics_port = ensure_int(metrics_port, "metrics_port")
+        self._beds = beds
+        self._poller = PeakPoller(poll_interval)
+        self._metrics_port = metrics_port
+        self._backends = dict()
+        for bed in beds:
+            if bed.backend is None:
+                self._backends[bed.name] = self._create_backend(bed)
+                continue
+            if bed.backend.name is None:
+                bed.backend.name = bed.name
+            if bed.backend.poller is None:
+                bed.backend.poller = self._poller
+            elif bed.backend.poller is not self._poller:
+                raise ValueError(
+                    f"The backend of the bed '{bed.name}' is attached to another "
+                    "poller."
+                )
+            self._backends[bed.name] = bed.backend
+        self._errors: dict[str, BaseException] = dict()
+
+    def _create_backend(self, bed: Bed) -> RealBackend:
+        """Create the hardware backend of a bed."""
+        return RealBackend(
+            BACKEND,
+            device=bed.device,
+            trigger_type=bed.trigger_type,
+            trigger_args=bed.trigger_args,
+            directory=bed.directory,
+            poller=self._poller,
+            metrics=Metrics(labels={"bed": bed.name}),
+            name=bed.name,
+        )
+
+    def run(self) -> None:
+        """Run the paradigms of all the beds and wait for their completion.
+
+        A bed which fails does not interrupt the other beds. Once all the beds
+        complete, an error is raised if at least one bed failed.
+        """
+        from ._paradigm import paradigm
+
+        def _run_bed(bed: Bed, backend: RealBackend | SimulatedBackend) -> None:
+            # the context of a thread is empty, thus the backend is selected in the
+            # thread of the bed.
+            try:
+                with use_backend(backend):
+                    paradigm(
+                        bed.n_blocks,
+                        bed.stream_name,
+                        bed.resp_ch_name,
+                        bed.ecg_ch_name,
+                        target=bed.target,
+                        deviant=bed.deviant,
+                        pause_key=bed.pause_key,
+                    )
+            except Exception as error:
+                logger.exception("Bed '%s' failed.", bed.name)
+                self._errors[bed.name] = error
+
+        self._errors.clear()
+        server = None
+        if self._metrics_port is not None:
+            server = MetricsServer(self.metrics.values(), self._metrics_port)
+            server.start()
+        self._poller.start()
+        threads = [
+            Thread(
+                target=_run_bed,
+                args=(bed, self._backends[bed.name]),
+                name=f"bed-{bed.name}",
+            )
+            for bed in self._beds
+        ]
+        logger.info("Starting %i bed(s).", len(threads))
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            self._poller.stop()
+            if server is not None:
+                server.stop()
+        self._poller.summary()
+        for name, metrics in self.metrics.items():
+            counters = metrics.counters
+            logger.info(
+                "Bed '%s': %i peak(s) detected, %i stimuli delivered, %i late and %i "
+                "skipped.",
+                name,
+                counters.get("peaks_detected", 0),
+                counters.get("stimuli_delivered", 0),
+                counters.get("stimuli_late", 0),
+                counters.get("stimuli_skipped", 0),
+            )
+        if len(self._errors) != 0:
+            raise RuntimeError(
+                f"The bed(s) {', '.join(map(repr, self._errors))} failed."
+            )
+
+    @property
+    def beds(self) -> list[Bed]:
+        """The beds run by the orchestrator."""
+        return list(self._beds)
+
+    @property
+    def errors(self) -> dict[str, BaseException]:
+        """The errors of the beds which failed during the last run."""
+        return dict(self._errors)
+
+    @property
+    def metrics(self) -> dict[str, Metrics]:
+        """The metrics of each bed."""
+        return {name: backend.metrics for name, backend in self._backends.items()}
+
+    @property
+    def poller(self) -> PeakPoller:
+        """The poller shared by the beds."""
+        return self._poller
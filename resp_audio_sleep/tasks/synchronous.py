@@ -1,19 +1,29 @@
 from __future__ import annotations
 
-import datetime
+from functools import partial
+from threading import Event, Thread
 from typing import TYPE_CHECKING
 
 import numpy as np
-from mne_lsl.lsl import local_clock
-from stimuli.time import sleep
 
-from .._config import RECORDER, RECORDER_PATH_CARDIAC, RECORDER_PATH_RESPIRATION
-from ..detector import Detector
+from .._config import (
+    ONSET_MONITOR,
+    PEAK_OUTLET,
+    RECORDER,
+    RECORDER_DUMP_KEY,
+    RECORDER_PATH_CARDIAC,
+    RECORDER_PATH_RESPIRATION,
+    RECORDER_RING,
+    TRIGGER_MONITOR,
+)
+from ..events import EVENT_STATUS, EventLog
 from ..utils._checks import check_type, ensure_int
 from ..utils._docs import fill_doc
 from ..utils.logs import logger
+from ..utils.realtime import release_thread
+from ..utils.writer import writer
+from ._backend import get_backend, task_block
 from ._config import (
-    BACKEND,
     ECG_DISTANCE,
     ECG_HEIGHT,
     ECG_PROMINENCE,
@@ -25,22 +35,27 @@ from ._config import (
     TRIGGER_TASKS,
     TRIGGERS,
 )
-from ._utils import create_sounds, create_trigger, generate_sequence
-
-if BACKEND == "ptb":
-    import psychtoolbox as ptb
+from ._utils import generate_sequence
 
 if TYPE_CHECKING:
+    from pathlib import Path
+
     from numpy.typing import NDArray
     from psychopy.sound.backend_ptb import SoundPTB
     from stimuli.audio import Tone
     from stimuli.trigger._base import BaseTrigger
 
+    from ..monitors import OnsetMonitor
+    from ..record import Recorder
+    from ..utils.metrics import Metrics
+    from ._backend import RealBackend, SimulatedBackend
 
+
+@task_block
 @fill_doc
 def synchronous_respiration(
     stream_name: str,
-    resp_ch_name: str,
+    resp_ch_name: str | list[str],
     *,
     target: float,
     deviant: float,
@@ -61,8 +76,9 @@ def synchronous_respiration(
     """  # noqa: D401
     logger.info("Starting respiration synchronous block.")
     # create sound stimuli, trigger, sequence
-    sounds = create_sounds(backend=BACKEND)
-    trigger = create_trigger()
+    backend = get_backend()
+    sounds = backend.create_sounds()
+    trigger = backend.create_trigger()
     sequence = generate_sequence(target, deviant)
     # the sequence, sound and trigger generation validates the trigger dictionary, thus
     # we can safely map the target and deviant frequencies to their corresponding
@@ -72,7 +88,7 @@ def synchronous_respiration(
         TRIGGERS[f"deviant/{deviant}"]: sounds[str(deviant)],
     }
     # create detector
-    detector = Detector(
+    detector = backend.create_detector(
         stream_name=stream_name,
         ecg_ch_name=None,
         resp_ch_name=resp_ch_name,
@@ -83,41 +99,65 @@ def synchronous_respiration(
         resp_distance=RESP_DISTANCE,
         detrend=False,  # DC would be OK, but not linear with slow waves.
         viewer=False,
-        recorder=RECORDER,
+        recorder=RECORDER or RECORDER_RING,
+        trigger_monitor=TRIGGER_MONITOR,
+        onset_monitor=ONSET_MONITOR,
+        peak_outlet=PEAK_OUTLET,
     )
+    if detector.trigger_monitor is not None:
+        trigger = detector.trigger_monitor.wrap(trigger)
+    listener = _create_dump_key_listener(detector.recorder)
+    _register_recorder_fill(detector.recorder, backend.metrics)
+    events = EventLog("synchronous-respiration", 2 * sequence.size)
     # main loop
     counter = 0
-    peaks = []
+    last_pos = None
     trigger.signal(TRIGGER_TASKS["synchronous-respiration"][0])
     while counter <= sequence.size - 1:
+        backend.heartbeat()
+        backend.metrics.inc("loop_iterations")
         pos = detector.new_peak("resp")
         if pos is None:
+            backend.idle()
             continue
-        success = _deliver_stimuli(pos, sequence[counter], stimulus, trigger)
+        backend.metrics.inc("peaks_detected")
+        if last_pos is not None:
+            backend.metrics.set("breathing_rate_bpm", 60 / (pos - last_pos))
+        last_pos = pos
+        success = _deliver_stimuli(
+            pos,
+            sequence[counter],
+            stimulus,
+            trigger,
+            backend=backend,
+            recorder=detector.recorder,
+            events=events,
+            onset_monitor=detector.onset_monitor,
+        )
         if not success:
             continue
         counter += 1
         logger.info("Stimulus %i / %i complete.", counter, sequence.size)
-        peaks.append(pos)
     # wait for the last sound to finish
-    sleep(1.1 * SOUND_DURATION)
+    backend.heartbeat(float("inf"))  # disarm the watchdog
+    backend.sleep(1.1 * SOUND_DURATION)
+    backend.poll_onsets(summary=True)
     trigger.signal(TRIGGER_TASKS["synchronous-respiration"][1])
     logger.info("Respiration synchronous block complete.")
+    if listener is not None:
+        listener.stop()
+    backend.metrics.unregister("recorder_fill")
+    for monitor in (detector.trigger_monitor, detector.onset_monitor):
+        if monitor is not None:
+            monitor.stop()
+            monitor.summary()
     if detector.recorder is not None:
-        detector.recorder.save(RECORDER_PATH_RESPIRATION)
-
-    # Save
-    now = datetime.datetime.now()
-    peaks_filename = (
-        f"synchronous_respiration_peaks_{now.strftime('%Y%m%d_%H%M%S')}.txt"
-    )
-    peaks_filepath = RECORDER_PATH_RESPIRATION.parent / peaks_filename
-    peaks_filepath.parent.mkdir(parents=True, exist_ok=True)
-    logger.info("Saving peaks to %s", peaks_filepath)
-    np.savetxt(peaks_filepath, peaks)
-    return np.array(peaks)
+        _save_recorder(detector.recorder, RECORDER_PATH_RESPIRATION)
+    backend.save_events(events, RECORDER_PATH_RESPIRATION.parent)
+    return events.delivered["peak"].copy()
 
 
+@task_block
 @fill_doc
 def synchronous_cardiac(
     stream_name: str,
@@ -142,8 +182,9 @@ def synchronous_cardiac(
         raise ValueError("The peaks array must be one-dimensional.")
     logger.info("Starting cardiac synchronous block.")
     # create sound stimuli, trigger, sequence
-    sounds = create_sounds(backend=BACKEND)
-    trigger = create_trigger()
+    backend = get_backend()
+    sounds = backend.create_sounds()
+    trigger = backend.create_trigger()
     sequence = generate_sequence(target, deviant)
     # the sequence, sound and trigger generation validates the trigger dictionary, thus
     # we can safely map the target and deviant frequencies to their corresponding
@@ -159,7 +200,7 @@ def synchronous_cardiac(
     delays = delays[np.where((edges[0] < delays) & (delays < edges[1]))]
     delays = rng.choice(delays, size=sequence.size, replace=True)
     # create detector
-    detector = Detector(
+    detector = backend.create_detector(
         stream_name=stream_name,
         ecg_ch_name=ecg_ch_name,
         resp_ch_name=None,
@@ -170,29 +211,50 @@ def synchronous_cardiac(
         resp_distance=None,
         detrend=True,
         viewer=False,
-        recorder=RECORDER,
+        recorder=RECORDER or RECORDER_RING,
+        trigger_monitor=TRIGGER_MONITOR,
+        onset_monitor=ONSET_MONITOR,
+        peak_outlet=PEAK_OUTLET,
     )
+    if detector.trigger_monitor is not None:
+        trigger = detector.trigger_monitor.wrap(trigger)
+    listener = _create_dump_key_listener(detector.recorder)
+    _register_recorder_fill(detector.recorder, backend.metrics)
     # create heart-rate monitor
     heartrate = _HeartRateMonitor()
     # main loop
     counter = 0
     target_time = None
     last_pos = None
+    events = EventLog("synchronous-cardiac", 2 * sequence.size)
     trigger.signal(TRIGGER_TASKS["synchronous-cardiac"][0])
-    detected_peaks = []
     while counter <= sequence.size - 1:
+        backend.heartbeat()
+        backend.metrics.inc("loop_iterations")
         pos = detector.new_peak("ecg")
         if pos is None:
+            backend.idle()
             continue
+        backend.metrics.inc("peaks_detected")
         heartrate.add_heartbeat(pos)
         if not heartrate.initialized:
             continue
+        backend.metrics.set("heart_rate_bpm", heartrate.bpm())
         if target_time is not None:
             distance_r_peak = abs(pos - target_time)
             distance_next_r_peak = abs(target_time - (pos + heartrate.mean_delay()))
             if distance_next_r_peak < distance_r_peak:
                 continue  # next r-peak will be closer from the target
-        success = _deliver_stimuli(pos, sequence[counter], stimulus, trigger)
+        success = _deliver_stimuli(
+            pos,
+            sequence[counter],
+            stimulus,
+            trigger,
+            backend=backend,
+            recorder=detector.recorder,
+            events=events,
+            onset_monitor=detector.onset_monitor,
+        )
         if not success:
             continue
         counter += 1
@@ -213,20 +275,21 @@ def synchronous_cardiac(
             delays = delays[~mask]
         target_time = pos + rng.choice(delays)
         last_pos = pos
-        detected_peaks.append(pos)
-    sleep(1.1 * SOUND_DURATION)
+    backend.heartbeat(float("inf"))  # disarm the watchdog
+    backend.sleep(1.1 * SOUND_DURATION)
+    backend.poll_onsets(summary=True)
     trigger.signal(TRIGGER_TASKS["synchronous-cardiac"][1])
     logger.info("Cardiac synchronous block complete.")
+    if listener is not None:
+        listener.stop()
+    backend.metrics.unregister("recorder_fill")
+    for monitor in (detector.trigger_monitor, detector.onset_monitor):
+        if monitor is not None:
+            monitor.stop()
+            monitor.summary()
     if detector.recorder is not None:
-        detector.recorder.save(RECORDER_PATH_CARDIAC)
-
-    # Save
-    now = datetime.datetime.now()
-    peaks_filename = f"synchronous_cardiac_peaks_{now.strftime('%Y%m%d_%H%M%S')}.txt"
-    peaks_filepath = RECORDER_PATH_CARDIAC.parent / peaks_filename
-    peaks_filepath.parent.mkdir(parents=True, exist_ok=True)
-    logger.info("Saving peaks to %s", peaks_filepath)
-    np.savetxt(peaks_filepath, detected_peaks)
+        _save_recorder(detector.recorder, RECORDER_PATH_CARDIAC)
+    backend.save_events(events, RECORDER_PATH_CARDIAC.parent)
 
 
 class _HeartRateMonitor:
@@ -268,16 +331,97 @@ class _HeartRateMonitor:
         return self._initialized
 
 
+def _save_recorder(recorder: Recorder, fname: Path) -> None:
+    """Stop the recorder and save its buffer in the background."""
+    recorder.stop()
+    logger.info(
+        "Recorder stopped, %i dropped and %i duplicated samples.",
+        recorder.n_dropped,
+        recorder.n_duplicated,
+    )
+    if recorder.ring:
+        return  # a flight recorder is dumped on demand
+    if recorder.compact:
+        fname = fname.with_suffix(".npz")
+        writer.submit(recorder.save_compact, fname, description=f"save {fname.name}")
+    else:
+        writer.submit(recorder.save, fname, description=f"save {fname.name}")
+
+
+def _register_recorder_fill(recorder: Recorder | None, metrics: Metrics) -> None:
+    """Expose the fill level of the recorder buffer in the metrics."""
+    if recorder is not None:
+        metrics.register("recorder_fill", lambda: recorder.fill)
+
+
+def _create_dump_key_listener(recorder: Recorder | None) -> _DumpKeyListener | None:
+    """Create and start a key listener if the recorder is a flight recorder."""
+    if recorder is None or not recorder.ring or RECORDER_DUMP_KEY is None:
+        return None
+    listener = _DumpKeyListener(recorder, RECORDER_DUMP_KEY)
+    listener.start()
+    return listener
+
+
+class _DumpKeyListener:
+    """Listen to a key press in a background thread to dump a flight recorder."""
+
+    def __init__(self, recorder: Recorder, key: str) -> None:
+        from psychopy.hardware.keyboard import Keyboard
+
+        self._recorder = recorder
+        self._key = key
+        self._keyboard = Keyboard()
+        self._stop_event = Event()
+        self._thread = Thread(target=self._listen, daemon=True)
+
+    def start(self) -> None:
+        """Start listening to the key press."""
+        logger.info("Press '%s' to dump the flight recorder.", self._key)
+        self._keyboard.start()
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop listening to the key press."""
+        self._stop_event.set()
+        self._thread.join()
+        self._keyboard.stop()
+
+    def _listen(self) -> None:
+        """Poll the keyboard and dump the flight recorder on key press."""
+        release_thread()
+        while not self._stop_event.wait(0.1):
+            keys = self._keyboard.getKeys(keyList=[self._key], waitRelease=False)
+            if len(keys) != 0:
+                self._recorder.dump("keypress")
+
+
 def _deliver_stimuli(
-    pos: float, elt: int, stimulus: dict[int, SoundPTB | Tone], trigger: BaseTrigger
+    pos: float,
+    elt: int,
+    stimulus: dict[int, SoundPTB | Tone],
+    trigger: BaseTrigger,
+    *,
+    backend: RealBackend | SimulatedBackend,
+    recorder: Recorder | None = None,
+    events: EventLog | None = None,
+    onset_monitor: OnsetMonitor | None = None,
 ) -> bool:
     """Deliver precisely a sound and its trigger."""
-    wait = pos + TARGET_DELAY - local_clock()
-    if wait <= 0.015:  # headroom to schedule, buffer and play the sound.
+    now = backend.local_clock()
+    wait = pos + TARGET_DELAY - now
+    backend.metrics.observe("detection_latency_seconds", now - pos)
+    if wait <= backend.headroom:  # time to schedule, buffer and play the sound.
+        backend.metrics.inc("stimuli_late" if wait <= 0 else "stimuli_skipped")
+        if events is not None:
+            status = EVENT_STATUS["late" if wait <= 0 else "headroom"]
+            events.add(pos, now, pos + TARGET_DELAY, elt, status)
         if wait <= 0:
             logger.info(
                 "Skipping bad detection/triggering, too late by %.3f ms.", -wait * 1000
             )
+            if recorder is not None and recorder.ring:
+                recorder.dump("too-late")
         else:
             logger.info(
                 "Skipping sound delivery, %.3f ms remaining to buffer and play is too "
@@ -285,8 +429,21 @@ def _deliver_stimuli(
                 wait * 1000,
             )
         return False
-    stimulus.get(elt).play(when=ptb.GetSecs() + wait if BACKEND == "ptb" else wait)
+    # the event is logged before the delivery to attach the onset error reported once
+    # the sound started.
+    if events is None:
+        callback = None
+    else:
+        idx = events.add(pos, now, pos + TARGET_DELAY, elt, EVENT_STATUS["delivered"])
+        callback = partial(events.set_onset_error, idx)
+    # the sound is scheduled at an absolute time to avoid converting the wait between
+    # clocks, and the wait for the trigger is measured again after scheduling.
+    backend.play_at(stimulus.get(elt), pos + TARGET_DELAY, callback)
+    if onset_monitor is not None:
+        onset_monitor.expect(pos + TARGET_DELAY)
     logger.debug("Triggering %i in %.3f ms.", elt, wait * 1000)
-    sleep(wait)
+    backend.heartbeat(wait)
+    backend.sleep_until(pos + TARGET_DELAY)
     trigger.signal(elt)
+    backend.metrics.inc("stimuli_delivered")
     return True
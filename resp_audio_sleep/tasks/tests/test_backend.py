@@ -0,0 +1,106 @@
+import time
+
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose
+
+from resp_audio_sleep.tasks import (
+    SimulatedBackend,
+    isochronous,
+    paradigm,
+    synchronous_respiration,
+    use_backend,
+)
+from resp_audio_sleep.tasks._backend import VirtualClock, _fname, get_backend
+from resp_audio_sleep.tasks._config import (
+    N_DEVIANT,
+    N_TARGET,
+    TARGET_DELAY,
+    TRIGGER_TASKS,
+    TRIGGERS,
+)
+
+
+def test_virtual_clock():
+    """Test the virtual clock."""
+    clock = VirtualClock()
+    assert clock() == 0
+    clock.sleep(1.5)
+    assert clock() == 1.5
+    clock.sleep(-1)  # ignored, as the hardware sleep function
+    assert clock() == 1.5
+    clock.advance_to(1)
+    assert clock() == 1.5
+    clock.advance_to(3)
+    assert clock() == 3
+
+
+def test_use_backend():
+    """Test selection of the backend in a context."""
+    backend = SimulatedBackend()
+    with use_backend(backend) as selected:
+        assert selected is backend
+        assert get_backend() is backend
+    with pytest.raises(TypeError, match="must be an instance of"):
+        with use_backend(101):
+            pass
+    with pytest.raises(ValueError, match="must be in"):
+        SimulatedBackend(jitter=1)
+    with pytest.raises(ValueError, match="strictly positive"):
+        SimulatedBackend(periods={"resp": 0})
+    with pytest.raises(TypeError, match="must be an instance of"):
+        SimulatedBackend(name=101)
+
+
+def test_fname():
+    """Test the file names of the backends saved in the same directory."""
+    assert _fname(None, "baseline-events.npz") == "baseline-events.npz"
+    assert _fname("bed-1", "baseline-events.npz") == "bed-1-baseline-events.npz"
+
+
+def test_isochronous():
+    """Test an isochronous block on the simulated backend."""
+    with use_backend(SimulatedBackend()) as backend:
+        isochronous(0.8, target=1000.0, deviant=2000.0)
+    values = [value for _, value in backend.triggers]
+    assert values[0] == TRIGGER_TASKS["isochronous"][0]
+    assert values[-1] == TRIGGER_TASKS["isochronous"][1]
+    assert values[1:-1].count(TRIGGERS["target/1000.0"]) == N_TARGET
+    assert values[1:-1].count(TRIGGERS["deviant/2000.0"]) == N_DEVIANT
+    # the triggers are sent at the sound onsets, every 800 ms
+    onsets = np.array([when for _, when, _ in backend.sounds])
+    times = np.array([t for t, _ in backend.triggers[1:-1]])
+    assert_allclose(times, onsets)
+    assert_allclose(np.diff(onsets), 0.8)
+
+
+def test_synchronous_respiration():
+    """Test a synchronous respiration block on the simulated backend."""
+    with use_backend(SimulatedBackend(seed=101)) as backend:
+        peaks = synchronous_respiration("stream", "resp", target=1000.0, deviant=2000.0)
+    assert peaks.size == N_TARGET + N_DEVIANT
+    onsets = np.array([when for _, when, _ in backend.sounds])
+    assert_allclose(onsets, peaks + TARGET_DELAY)
+    assert len(backend.event_logs) == 1
+    events = backend.event_logs[0]
+    assert events.block == "synchronous-respiration"
+    assert_allclose(events.delivered["peak"], peaks)
+    assert_allclose(events.delivered["detection"] - peaks, 0.05)
+    assert_allclose(events.delivered["onset_error"], 0)
+
+
+def test_paradigm():
+    """Test a whole paradigm run faster than real-time."""
+    start = time.perf_counter()
+    with use_backend(SimulatedBackend(seed=101)) as backend:
+        paradigm(7, "stream", "resp", "ecg", target=1000.0, deviant=2000.0)
+    assert time.perf_counter() - start < 10
+    assert 20 * 60 < backend.now()  # more than 20 minutes of simulated time
+    starts = [
+        value for _, value in backend.triggers if value in (200, 210, 220, 230, 240)
+    ]
+    assert len(starts) == 7
+    assert starts[:2] == [
+        TRIGGER_TASKS["baseline"][0],
+        TRIGGER_TASKS["synchronous-respiration"][0],
+    ]
@@ -0,0 +1,26 @@
+from importlib import import_module
+from types import FunctionType
+
+import pytest
+
+import resp_audio_sleep.tasks as tasks
+
+
+@pytest.mark.parametrize(
+    "name", ["asynchronous", "baseline", "isochronous", "paradigm"]
+)
+def test_tasks_not_shadowed(name):
+    """Test that importing a task module does not shadow the task function."""
+    import_module(f"resp_audio_sleep.tasks._{name}")
+    assert isinstance(getattr(tasks, name), FunctionType)
+    paradigm = import_module("resp_audio_sleep.tasks._paradigm")
+    for task in ("asynchronous", "baseline", "isochronous"):
+        assert isinstance(getattr(paradigm, f"{task}_task"), FunctionType)
+    # resolved without being cached on the package
+    assert name not in vars(tasks)
+
+
+def test_tasks_invalid_attribute():
+    """Test access to an invalid attribute of the tasks package."""
+    with pytest.raises(AttributeError, match="has no attribute"):
+        tasks.invalid  # noqa: B018
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose
+
+from resp_audio_sleep.tasks._onsets import OnsetTracker
+
+
+class _Track:
+    """PTB audio stream exposing its status."""
+
+    def __init__(self) -> None:
+        self.status = {
+            "StartTime": 0.0,
+            "RequestedStartTime": 0.0,
+            "CurrentStreamTime": 0.0,
+            "PredictedLatency": 0.004,
+        }
+
+
+class _Sound:
+    """PTB sound updating the status of its stream when it starts."""
+
+    def __init__(self) -> None:
+        self.track = _Track()
+
+    def play(self, when: float) -> None:
+        self.track.status["RequestedStartTime"] = when
+
+    def start(self, now: float, error: float) -> None:
+        self.track.status["StartTime"] = self.track.status["RequestedStartTime"] + error
+        self.track.status["CurrentStreamTime"] = now
+
+
+def test_onset_tracker():
+    """Test the collection of the onsets and the adaptation of the headroom."""
+    tracker = OnsetTracker(0.015, percentile=100, margin=0.002, n_min=5)
+    sound = _Sound()
+    errors = list()
+    for k in range(10):
+        sound.play(when=k + 0.5)
+        tracker.track(sound, k + 0.5, 0.001, errors.append)
+        assert tracker.poll() == 0  # not started yet
+        assert tracker.n_pending == 1
+        sound.start(k + 0.6, error=0.001 * (k % 3))
+        assert tracker.poll() == 1
+        assert tracker.n_pending == 0
+        if k < 4:
+            assert tracker.headroom == 0.015
+    assert_allclose(errors, 0.001 * (np.arange(10) % 3), atol=1e-12)
+    # predicted latency + call duration + error, plus the margin
+    assert_allclose(tracker.headroom, 0.004 + 0.001 + 0.002 + 0.002)
+    assert_allclose(np.max(tracker.latencies), 0.007)
+    tracker.summary()
+
+
+def test_onset_tracker_rescheduled():
+    """Test a sound scheduled again before its previous onset is reported."""
+    tracker = OnsetTracker(adaptive=False, n_min=1)
+    sound = _Sound()
+    errors = list()
+    sound.play(when=1.0)
+    tracker.track(sound, 1.0, 0.001, lambda error: errors.append(("first", error)))
+    sound.play(when=2.0)
+    tracker.track(sound, 2.0, 0.001, lambda error: errors.append(("second", error)))
+    assert tracker.n_pending == 1
+    sound.start(2.1, error=0.002)
+    assert tracker.poll() == 1
+    assert tracker.n_pending == 0
+    assert len(errors) == 1
+    assert errors[0][0] == "second"
+    assert_allclose(errors[0][1], 0.002)
+    assert tracker.latencies.size == 1
+
+
+def test_onset_tracker_timeout():
+    """Test the sounds without reported onset."""
+    tracker = OnsetTracker(adaptive=False, n_min=1)
+    sound = _Sound()
+    sound.start(1.0, 0)  # previous playback
+    sound.play(when=2.0)
+    tracker.track(sound, 2.0, 0.001)
+    assert tracker.poll() == 0
+    assert tracker.n_pending == 1
+    sound.track.status["CurrentStreamTime"] = 10.0
+    assert tracker.poll() == 0
+    assert tracker.n_pending == 0
+    with pytest.raises(ValueError, match="between 0 and 100"):
+        OnsetTracker(percentile=101)
+    with pytest.raises(ValueError, match="greater than or equal to 'n_min'"):
+        OnsetTracker(n_min=10, n_latencies=5)
@@ -0,0 +1,142 @@
+import gc
+import time
+
+import pytest
+
+from resp_audio_sleep.tasks import Bed, Orchestrator, PeakPoller, SimulatedBackend
+from resp_audio_sleep.tasks._config import TRIGGER_TASKS
+
+
+class _Detector:
+    """Detector returning the peaks of a list, one per call."""
+
+    recorder = None
+
+    def __init__(self, peaks: list[float | None]) -> None:
+        self._peaks = list(peaks)
+
+    def _check_ch_type(self, ch_type: str) -> None:
+        if ch_type != "resp":
+            raise ValueError("No ECG channel was set.")
+
+    def new_peak(self, ch_type: str) -> float | None:
+        if len(self._peaks) == 0:
+            return None
+        peak = self._peaks.pop(0)
+        if peak == -1:
+            raise RuntimeError("Stream lost.")
+        return peak
+
+
+def _wait_peak(detector, timeout: float = 2) -> float | None:
+    """Wait for a peak of a polled detector."""
+    start = time.monotonic()
+    while time.monotonic() - start < timeout:
+        peak = detector.new_peak("resp")
+        if peak is not None:
+            return peak
+    return None
+
+
+def test_peak_poller():
+    """Test the detection of the peaks of several detectors in a single thread."""
+    poller = PeakPoller(interval=0.001)
+    detector1 = poller.register(_Detector([None, 1.0, None, 2.0]))
+    detector2 = poller.register(_Detector([10.0, -1]))
+    assert poller.n_detectors == 2
+    assert detector1.recorder is None  # attributes of the detector
+    assert poller.poll() == 0  # not polled before a peak is requested
+    with pytest.raises(ValueError, match="No ECG channel"):
+        detector1.new_peak("ecg", timeout=0)
+    assert detector1.new_peak("resp", timeout=0) is None
+    assert detector2.new_peak("resp", timeout=0) is None
+    poller.start()
+    with pytest.raises(RuntimeError, match="already running"):
+        poller.start()
+    assert _wait_peak(detector2) == 10.0
+    with pytest.raises(RuntimeError, match="Stream lost"):
+        _wait_peak(detector2)
+    # the peaks detected while the task is busy are dropped but the most recent one
+    time.sleep(0.1)
+    assert detector1.new_peak("resp") == 2.0
+    poller.stop()
+    assert not poller.running
+    del detector2
+    gc.collect()  # the raised error references the proxy in a cycle
+    assert poller.n_detectors == 1
+    poller.summary()
+    with pytest.raises(ValueError, match="strictly positive"):
+        PeakPoller(interval=0)
+
+
+def test_simulated_polled_detector():
+    """Test the simulated detector polled by a poller."""
+    poller = PeakPoller()
+    backend = SimulatedBackend(periods={"resp": 4.0}, jitter=0, poller=poller)
+    detector = backend.create_detector(stream_name="stream")
+    with pytest.raises(ValueError, match="No period was set"):
+        detector.new_peak("ecg", timeout=0)
+    assert detector.new_peak("resp", timeout=0) is None
+    assert poller.poll() == 0  # the next peak is not detected yet
+    backend.idle()  # advance to the next detection
+    assert backend.now() == 4.05
+    assert poller.poll() == 1
+    assert detector.new_peak("resp", timeout=0) == 4.0
+
+
+def test_orchestrator():
+    """Test the orchestration of several beds on the simulated backend."""
+    beds = [
+        Bed(
+            name,
+            "stream",
+            "resp",
+            "ecg",
+            n_blocks=3,
+            target=1000.0,
+            deviant=2000.0,
+            pause_key=key,
+            backend=SimulatedBackend(seed=seed),
+        )
+        for seed, (name, key) in enumerate((("bed-1", "1"), ("bed-2", None)))
+    ]
+    orchestrator = Orchestrator(beds, poll_interval=0.0005)
+    # the simulated backends are attached to the poller of the orchestrator, and are
+    # named after their bed to distinguish their files
+    for bed in beds:
+        assert bed.backend.poller is orchestrator.poller
+        assert bed.backend.name == bed.name
+    orchestrator.run()
+    assert orchestrator.errors == {}
+    assert not orchestrator.poller.running
+    assert 0 < orchestrator.poller._n_sweeps
+    for bed in beds:
+        starts = [
+            value
+            for _, value in bed.backend.triggers
+            if value in (elt[0] for elt in TRIGGER_TASKS.values())
+        ]
+        assert len(starts) == 3
+        counters = orchestrator.metrics[bed.name].counters
+        assert 0 < counters["stimuli_delivered"]
+        assert counters["stimuli_delivered"] == sum(
+            events.delivered.size for events in bed.backend.event_logs
+        )
+    with pytest.raises(ValueError, match="must be unique"):
+        Orchestrator([beds[0], beds[0]])
+    bed = Bed(
+        "bed-3",
+        "stream",
+        "resp",
+        "ecg",
+        n_blocks=1,
+        target=1000.0,
+        deviant=2000.0,
+        pause_key="1",
+    )
+    with pytest.raises(ValueError, match="pause keys of the beds must be unique"):
+        Orchestrator([beds[0], bed])
+    with pytest.raises(ValueError, match="attached to another poller"):
+        Orchestrator([beds[0]])
+    with pytest.raises(ValueError, match="at least one bed"):
+        Orchestrator([])
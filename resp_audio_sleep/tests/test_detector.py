@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import multiprocessing as mp
+import time
+import uuid
+
+import numpy as np
+import pytest
+from mne import create_info
+from mne.io import RawArray
+from numpy.testing import assert_allclose
+from scipy.signal import find_peaks
+
+from resp_audio_sleep.detector import Detector, _fuse_channels
+
+_SFREQ: float = 500.0
+_PERIOD: float = 1.0  # respiration period in seconds
+
+
+def _respiration(n_samples: int, seed: int = 101) -> np.ndarray:
+    """Generate thoracic, abdominal, nasal flow, noisy and flat channels."""
+    rng = np.random.default_rng(seed)
+    phase = 2 * np.pi * np.arange(n_samples) / _SFREQ / _PERIOD
+    return np.vstack(
+        (
+            np.sin(phase) + 0.05 * rng.standard_normal(n_samples),  # thoracic
+            -3 * np.sin(phase) + 10 + 0.1 * rng.standard_normal(n_samples),  # inverted
+            np.cos(phase) + 0.05 * rng.standard_normal(n_samples),  # flow, out of phase
+            rng.standard_normal(n_samples),  # disconnected belt
+            np.zeros(n_samples),  # flat
+        )
+    )
+
+
+def test_fuse_channels():
+    """Test the fusion of the respiration channels weighted by their quality."""
+    data = _respiration(int(4 * _SFREQ))
+    fused, weights = _fuse_channels(data)
+    assert fused.shape == (data.shape[1],)
+    assert_allclose(weights.sum(), 1)
+    assert weights[4] == 0
+    assert weights[3] < 0.01
+    assert weights[2] < 0.1
+    assert weights[2] < weights[1]
+    assert 0.4 < weights[0] + weights[1]
+    # the fused signal has the polarity of the first channel and is standardized
+    assert 0.99 < np.corrcoef(fused, data[0])[0, 1]
+    assert_allclose(fused.mean(), 0, atol=1e-12)
+    assert_allclose(fused.std(), 1)
+    # the unit does not depend on the channel of best quality, e.g. if the abdominal
+    # belt becomes noisy in the next window
+    noisy = data.copy()
+    noisy[1] += np.random.default_rng(0).standard_normal(noisy.shape[1])
+    fused_noisy, weights_noisy = _fuse_channels(noisy)
+    assert np.argmax(weights_noisy) != np.argmax(weights)
+    assert_allclose(fused_noisy.std(), 1)
+    assert_allclose(np.ptp(fused_noisy), np.ptp(fused), rtol=0.1)
+    peaks, _ = find_peaks(fused, distance=0.5 * _SFREQ, prominence=0.5)
+    expected, _ = find_peaks(np.sin(2 * np.pi * np.arange(fused.size) / _SFREQ))
+    assert_allclose(peaks, expected, atol=0.05 * _SFREQ)
+    # all channels flat
+    fused, weights = _fuse_channels(np.zeros((2, 10)))
+    assert_allclose(weights, 0)
+    assert_allclose(fused, 0)
+
+
+def test_fuse_channels_degenerate():
+    """Test the fusion of degenerate respiration channels."""
+    # a flat channel and a channel without noise, thus without quality
+    data = np.vstack((np.zeros(100), np.arange(100.0)))
+    fused, weights = _fuse_channels(data)
+    assert_allclose(weights, [0, 1])
+    assert np.isfinite(fused).all()
+    assert_allclose(fused.std(), 1)
+    assert 0.99 < np.corrcoef(fused, data[1])[0, 1]
+    # anti-correlated channels are aligned in polarity with the first channel
+    data = _respiration(int(4 * _SFREQ))[:2]
+    data = np.vstack((data, -data[0]))
+    fused, weights = _fuse_channels(data)
+    assert_allclose(weights.sum(), 1)
+    assert_allclose(weights[0], weights[2])
+    assert_allclose(fused.std(), 1)
+    assert 0.99 < np.corrcoef(fused, data[0])[0, 1]
+    # the first channel is orthogonal to the channel of best quality
+    data = np.vstack(
+        (np.tile([1.0, 1.0, -1.0, -1.0], 50), np.tile([1.0] * 4 + [-1.0] * 4, 25))
+    )
+    fused, weights = _fuse_channels(data)
+    assert_allclose(weights, [0, 1])
+    assert_allclose(fused, data[1])
+
+
+def _player_mock_lsl_stream(
+    raw: RawArray, name: str, source_id: str, status: mp.managers.ValueProxy
+) -> None:
+    """Player for the 'stream_name' fixture."""
+    from mne_lsl.player import PlayerLSL  # noqa: E402
+
+    player = PlayerLSL(raw, chunk_size=10, name=name, source_id=source_id)
+    player.start()
+    status.value = 1
+    while status.value:
+        time.sleep(0.1)
+    player.stop()
+
+
+@pytest.fixture
+def stream_name(request):
+    """Create a mock LSL stream with several respiration channels."""
+    data = _respiration(int(60 * _SFREQ))
+    ch_names = ["THORAX", "ABDOMEN", "FLOW", "BELT", "FLAT"]
+    raw = RawArray(data, create_info(ch_names, _SFREQ, "misc"))
+    manager = mp.Manager()
+    status = manager.Value("i", 0)
+    name = f"P_{request.node.name}"
+    process = mp.Process(
+        target=_player_mock_lsl_stream,
+        args=(raw, name, uuid.uuid4().hex, status),
+    )
+    process.start()
+    while status.value != 1:
+        pass
+    yield name
+    status.value = 0
+    process.join(timeout=2)
+    process.kill()
+
+
+def test_detector_fusion(stream_name: str):
+    """Test the detection of the peaks on several respiration channels."""
+    with pytest.raises(ValueError, match="must be unique"):
+        Detector(stream_name, None, ["THORAX", "THORAX"], resp_distance=0.5)
+    detector = Detector(
+        stream_name,
+        None,
+        ["THORAX", "ABDOMEN", "FLOW", "BELT", "FLAT"],
+        resp_prominence=0.5,
+        resp_distance=0.5,
+        detrend=False,
+    )
+    assert detector.resp_weights is None
+    peaks = list()
+    start = time.monotonic()
+    while len(peaks) < 3 and time.monotonic() - start < 15:
+        peak = detector.new_peak("resp")
+        if peak is not None:
+            peaks.append(peak)
+    assert len(peaks) == 3
+    assert_allclose(np.diff(peaks), _PERIOD, atol=0.05)
+    weights = detector.resp_weights
+    assert list(weights) == ["THORAX", "ABDOMEN", "FLOW", "BELT", "FLAT"]
+    assert weights["FLAT"] == 0
+    assert weights["BELT"] < weights["THORAX"]
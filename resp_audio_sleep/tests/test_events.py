@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose
+
+from resp_audio_sleep.events import EVENT_STATUS, EventLog, read_events
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+def test_event_log(tmp_path: Path):
+    """Test the columnar event log."""
+    events = EventLog("synchronous-respiration", n_events=2)
+    assert events.events.size == 0
+    for k in range(5):  # grows beyond the preallocated size
+        status = EVENT_STATUS["late"] if k == 2 else EVENT_STATUS["delivered"]
+        events.add(k, k + 0.1, k + 0.25, 10 + k, status)
+    assert events.events.size == 5
+    assert_allclose(events.events["wait"], 0.15)
+    assert_allclose(events.delivered["peak"], [0, 1, 3, 4])
+    assert events.delivered["trigger"].tolist() == [10, 11, 13, 14]
+    assert np.all(np.isnan(events.events["onset_error"]))
+    idx = events.add(5, 5.1, 5.25, 15, EVENT_STATUS["delivered"])
+    assert idx == 5
+    events.set_onset_error(idx, 0.001)
+    assert_allclose(events.events["onset_error"][-1], 0.001)
+    fname = tmp_path / "block-events.npz"
+    events.save(fname)
+    with pytest.raises(FileExistsError, match="already exists"):
+        events.save(fname)
+    with pytest.raises(ValueError, match="must be '.npz'"):
+        events.save(tmp_path / "block-events.txt")
+    with pytest.raises(ValueError, match="must be strictly positive"):
+        EventLog("baseline", 0)
+
+
+def test_read_events(tmp_path: Path):
+    """Test reading the event logs of a session."""
+    blocks = ("synchronous-respiration", "synchronous-cardiac")
+    for k, block in enumerate(blocks):
+        events = EventLog(block, n_events=10)
+        for j in range(3 + k):
+            events.add(j, j + 0.1, j + 0.25, 1, EVENT_STATUS["delivered"])
+        events.save(tmp_path / f"{k}-events.npz")
+    (tmp_path / "unrelated.npz").touch()
+    events = read_events(tmp_path)
+    assert events.size == 7
+    assert events["block"].tolist() == [blocks[0]] * 3 + [blocks[1]] * 4
+    assert events["block_idx"].tolist() == [0] * 3 + [1] * 4
+    assert_allclose(events["peak"], [0, 1, 2, 0, 1, 2, 3])
+    events2 = read_events([tmp_path / "1-events.npz", tmp_path / "0-events.npz"])
+    # sorted by block creation time, compared as bytes since the onset errors are NaN
+    assert events.tobytes() == events2.tobytes()
+    (tmp_path / "empty").mkdir()
+    assert read_events(tmp_path / "empty").size == 0
+
+
+def test_read_events_missing_fields(tmp_path: Path):
+    """Test reading an event log saved before some fields were added."""
+    dtype = np.dtype([("peak", np.float64), ("detection", np.float64)])
+    old = np.zeros(2, dtype=dtype)
+    old["peak"] = [1, 2]
+    np.savez(
+        tmp_path / "old-events.npz",
+        events=old,
+        block=np.array("synchronous-respiration"),
+        start=np.array("2024-01-01T00:00:00"),
+    )
+    events = read_events(tmp_path)
+    assert_allclose(events["peak"], [1, 2])
+    assert np.all(np.isnan(events["onset_error"]))
+    assert events["trigger"].tolist() == [-1, -1]
+    assert events["status"].tolist() == [-1, -1]
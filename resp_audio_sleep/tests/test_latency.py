@@ -0,0 +1,172 @@
+"""Closed-loop latency benchmark replaying recorded sessions over LSL."""
+
+from __future__ import annotations
+
+import multiprocessing as mp
+import time
+import uuid
+from pathlib import Path
+
+import numpy as np
+import pytest
+from mne_lsl.lsl import local_clock
+
+from resp_audio_sleep.detector import Detector
+from resp_audio_sleep.events import EVENT_STATUS, EventLog
+from resp_audio_sleep.tasks import RealBackend
+from resp_audio_sleep.tasks._config import (
+    ECG_DISTANCE,
+    ECG_HEIGHT,
+    ECG_PROMINENCE,
+    RESP_DISTANCE,
+    RESP_PROMINENCE,
+    TARGET_DELAY,
+)
+from resp_audio_sleep.tasks.synchronous import _deliver_stimuli
+from resp_audio_sleep.utils.logs import logger
+
+_DATA: Path = Path(__file__).parents[2] / "data"
+# regression thresholds in seconds, as (median, maximum) of the distribution. The
+# maximum detection delay leaves the headroom required to schedule the sound, and the
+# maximum onset and trigger errors tolerate the scheduling jitter of shared CI runners.
+_THRESHOLDS: dict[str, dict[str, tuple[float, float]]] = {
+    "resp": {
+        "detection": (0.2, TARGET_DELAY - 0.015),
+        "onset": (0.002, 0.01),
+        "trigger": (0.002, 0.01),
+    },
+    "ecg": {
+        "detection": (0.1, TARGET_DELAY - 0.015),
+        "onset": (0.002, 0.01),
+        "trigger": (0.002, 0.01),
+    },
+}
+
+
+class _NullSound:
+    """Audio sink recording the requested onsets on the LSL clock."""
+
+    def __init__(self) -> None:
+        self.onsets = list()
+
+    def play(self, when: float) -> None:
+        # the stimuli audio backend receives the delay to wait before the onset
+        self.onsets.append(local_clock() + when)
+
+
+class _NullTrigger:
+    """Trigger sink recording the time at which each trigger is sent."""
+
+    def __init__(self) -> None:
+        self.times = list()
+
+    def signal(self, value: int) -> None:
+        self.times.append(local_clock())
+
+
+def _player_replay(fname: Path, name: str, status: mp.managers.ValueProxy) -> None:
+    """Replay a recording over LSL until requested to stop."""
+    from mne_lsl.player import PlayerLSL  # noqa: E402
+
+    # 32 samples at 1024 Hz, close to the chunks sent by the amplifier
+    player = PlayerLSL(fname, chunk_size=32, name=name, source_id=uuid.uuid4().hex)
+    player.start()
+    status.value = 1
+    while status.value:
+        time.sleep(0.1)
+    player.stop()
+
+
+@pytest.fixture
+def backend():
+    """Create the real backend, skipped without the audio stack, e.g. PortAudio."""
+    try:
+        import stimuli.time  # noqa: F401
+    except (ImportError, OSError) as error:
+        pytest.skip(f"The audio stack is not available ({error}).")
+    return RealBackend(audio="stimuli")
+
+
+@pytest.fixture
+def replay(request):
+    """Replay a recording from the data folder over LSL."""
+    manager = mp.Manager()
+    status = manager.Value("i", 0)
+    name = f"P_{uuid.uuid4().hex[:8]}"
+    process = mp.Process(
+        target=_player_replay,
+        args=(_DATA / f"synchronous-{request.param}-raw.fif", name, status),
+    )
+    process.start()
+    while status.value != 1:
+        time.sleep(0.01)
+    yield name
+    status.value = 0
+    process.join(timeout=2)
+    process.kill()
+
+
+@pytest.mark.parametrize(
+    ("replay", "ch_type", "n_peaks"),
+    [("respiration", "resp", 5), ("cardiac", "ecg", 15)],
+    indirect=["replay"],
+)
+def test_closed_loop_latency(
+    backend: RealBackend, replay: str, ch_type: str, n_peaks: int
+):
+    """Benchmark the detection and scheduling delays on a replayed session."""
+    if ch_type == "resp":
+        detector = Detector(
+            replay,
+            ecg_ch_name=None,
+            resp_ch_name="AUX8",
+            resp_prominence=RESP_PROMINENCE,
+            resp_distance=RESP_DISTANCE,
+            detrend=False,
+        )
+    else:
+        detector = Detector(
+            replay,
+            ecg_ch_name="AUX7",
+            resp_ch_name=None,
+            ecg_height=ECG_HEIGHT,
+            ecg_distance=ECG_DISTANCE,
+            ecg_prominence=ECG_PROMINENCE,
+        )
+    sound = _NullSound()
+    trigger = _NullTrigger()
+    events = EventLog(f"benchmark-{ch_type}", n_peaks)
+    start = time.monotonic()
+    while events.events.size < n_peaks and time.monotonic() - start < 60:
+        pos = detector.new_peak(ch_type)
+        if pos is None:
+            continue
+        _deliver_stimuli(pos, 1, {1: sound}, trigger, backend=backend, events=events)
+    events = events.events
+    assert events.size == n_peaks
+    detection = events["detection"] - events["peak"]
+    delivered = events["status"] == EVENT_STATUS["delivered"]
+    assert np.all(delivered)
+    assert len(sound.onsets) == len(trigger.times) == n_peaks
+    onset = np.abs(np.array(sound.onsets) - events["scheduled"])
+    triggers = np.array(trigger.times) - events["scheduled"]
+    logger.info(
+        "Detection delay (ms): median %.1f, max %.1f. Onset error (ms): median %.2f, "
+        "max %.2f. Trigger error (ms): median %.2f, max %.2f.",
+        np.median(detection) * 1000,
+        np.max(detection) * 1000,
+        np.median(onset) * 1000,
+        np.max(onset) * 1000,
+        np.median(triggers) * 1000,
+        np.max(triggers) * 1000,
+    )
+    assert np.all(0 < detection)
+    assert np.all(0 <= triggers)
+    for key, delays in (
+        ("detection", detection),
+        ("onset", onset),
+        ("trigger", triggers),
+    ):
+        median, maximum = _THRESHOLDS[ch_type][key]
+        assert np.median(delays) < median, key
+        assert np.max(delays) < maximum, key
@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import multiprocessing as mp
+import time
+import uuid
+from pathlib import Path
+
+import numpy as np
+import pytest
+from mne import create_info, find_events
+from mne.io import RawArray, read_raw_fif
+from mne_lsl.stream import StreamLSL
+from numpy.testing import assert_allclose
+
+from resp_audio_sleep.monitors import OnsetMonitor, TriggerMonitor, _BaseMonitor
+
+_SFREQ: float = 1000.0
+
+
+def _player_mock_lsl_stream(
+    raw: RawArray, name: str, source_id: str, status: mp.managers.ValueProxy
+) -> None:
+    """Player for the 'stream' fixture."""
+    from mne_lsl.player import PlayerLSL  # noqa: E402
+
+    player = PlayerLSL(raw, chunk_size=50, name=name, source_id=source_id)
+    player.start()
+    status.value = 1
+    while status.value:
+        time.sleep(0.1)
+    player.stop()
+
+
+@pytest.fixture
+def stream(request):
+    """Create a mock LSL stream with a trigger and a sound channel."""
+    info = create_info(["TRIGGER", "AUX9"], _SFREQ, ["stim", "misc"])
+    data = np.zeros((2, 5000))
+    data[0, 1000:1010] = 1
+    raw = RawArray(data, info)
+    manager = mp.Manager()
+    status = manager.Value("i", 0)
+    name = f"P_{request.node.name}"
+    process = mp.Process(
+        target=_player_mock_lsl_stream,
+        args=(raw, name, uuid.uuid4().hex, status),
+    )
+    process.start()
+    while status.value != 1:
+        pass
+    stream = StreamLSL(bufsize=2, name=name).connect(acquisition_delay=None)
+    yield stream
+    stream.disconnect()
+    status.value = 0
+    process.join(timeout=2)
+    process.kill()
+
+
+def test_trigger_monitor(stream: StreamLSL):
+    """Test matching of the triggers sent with the trigger channel."""
+    monitor = TriggerMonitor(stream, "TRIGGER", timeout=0.5, window=5)
+    assert np.isnan(monitor.latency)
+    ts = np.arange(1000) / _SFREQ
+    data = np.zeros(ts.size)
+    latency = 0.012
+    sent = np.arange(0.1, 0.9, 0.1)
+    for k, t in enumerate(sent):
+        monitor.expect(1 + k % 2, t)
+        idx = np.searchsorted(ts, t + latency)
+        data[idx : idx + 10] = 1 + k % 2
+    data[950:960] = 5  # unexpected trigger
+    monitor.expect(3, 0.95)  # missed trigger, expired by a later chunk
+    # push in 2 chunks, overlapping by 100 samples
+    monitor._push(data[:600], ts[:600])
+    assert monitor.n_matched == 5
+    monitor._push(data[500:], ts[500:])
+    assert monitor.n_matched == sent.size
+    assert monitor.n_unexpected == 1
+    assert monitor.n_missed == 0
+    assert_allclose(monitor.latencies, latency, atol=1 / _SFREQ)
+    assert monitor.jitter < 1 / _SFREQ
+    with pytest.warns(RuntimeWarning, match="Trigger 3 was not received"):
+        monitor._push(np.zeros(600), np.arange(1000, 1600) / _SFREQ)
+    assert monitor.n_missed == 1
+    monitor.summary()
+
+
+def test_trigger_monitor_drift(stream: StreamLSL):
+    """Test the drift alert of the trigger monitor."""
+    monitor = TriggerMonitor(stream, "TRIGGER", window=5, tolerance=0.002)
+    ts = np.arange(10000) / _SFREQ
+    data = np.zeros(ts.size)
+    for k in range(20):
+        sent = 0.4 * (k + 1)
+        latency = 0.010 if k < 10 else 0.020
+        monitor.expect(1, sent)
+        idx = np.searchsorted(ts, sent + latency)
+        data[idx : idx + 10] = 1
+    # the window straddling the step also exceeds the jitter tolerance
+    with pytest.warns(RuntimeWarning) as record:
+        monitor._push(data, ts)
+    messages = [str(elt.message) for elt in record]
+    assert "The trigger latency drifted by more than 2.0 ms." in messages
+    assert monitor.n_matched == 20
+
+
+def test_trigger_monitor_thread(stream: StreamLSL):
+    """Test the acquisition thread of the trigger monitor."""
+    monitor = TriggerMonitor(stream, "TRIGGER")
+    monitor.start(acquisition_delay=0.02)
+    with pytest.raises(RuntimeError, match="already running"):
+        monitor.start()
+    assert monitor.running
+    time.sleep(1)
+    monitor.stop()
+    assert not monitor.running
+    assert monitor._last_ts is not None
+    with pytest.raises(ValueError, match="must be strictly positive"):
+        TriggerMonitor(stream, "TRIGGER", timeout=0)
+    with pytest.raises(ValueError, match="Invalid value"):
+        TriggerMonitor(stream, "AUX1")
+
+
+def test_onset_monitor(stream: StreamLSL):
+    """Test the pairing of the sound onsets with the scheduled stimuli."""
+    fname = Path(__file__).parents[2] / "data" / "isochronous-raw.fif"
+    raw = read_raw_fif(fname, preload=True)
+    events = find_events(raw)
+    events = events[events[:, 2] == 3]
+    data, ts = raw.get_data(picks="AUX9", return_times=True)
+    data = data[0]
+    scheduled = ts[events[:, 0] - raw.first_samp]
+    monitor = OnsetMonitor(stream, "AUX9", threshold=5000)
+    for t in scheduled[:-1]:  # the last stimulus is missed
+        monitor.expect(t)
+    monitor.expect(ts[-1] + 1)  # still pending at the end
+    # 32 samples chunks, overlapping by 8 samples
+    for start in range(0, ts.size, 24):
+        monitor._push(data[start : start + 32], ts[start : start + 32])
+    assert monitor.n_paired == scheduled.size - 1
+    assert monitor.n_missed == 0
+    assert monitor.n_unexpected == 1
+    # the loopback onset is ~1 sample after the trigger
+    assert np.all(0 <= monitor.errors)
+    assert np.all(monitor.errors < 0.005)
+    counts, bins = monitor.histogram
+    assert counts.sum() == monitor.n_paired
+    assert_allclose(np.diff(bins), 0.001)
+    monitor.summary()
+
+
+def test_onset_monitor_errors(stream: StreamLSL):
+    """Test the missed, late and invalid onsets of the onset monitor."""
+    monitor = OnsetMonitor(stream, "AUX9", threshold=10, tolerance=0.005)
+    ts = np.arange(3000) / _SFREQ
+    data = np.zeros(ts.size)
+    data[1020:1200] = 100  # 20 ms late
+    for t in (0.5, 1.0, 2.0):
+        monitor.expect(t)
+    with pytest.warns(RuntimeWarning) as record:
+        monitor._push(data, ts)
+    messages = [str(elt.message) for elt in record]
+    assert "A scheduled sound was not detected." in messages
+    assert "The sound onset error exceeds 5.0 ms." in messages
+    assert monitor.n_paired == 1
+    assert monitor.n_missed == 2
+    assert_allclose(monitor.errors, 0.02)
+    with pytest.raises(ValueError, match="'threshold' must be strictly positive"):
+        OnsetMonitor(stream, "AUX9", threshold=0)
+    with pytest.raises(ValueError, match="must be greater than"):
+        OnsetMonitor(stream, "AUX9", threshold=1, max_error=0.001)
+
+
+def test_base_monitor_abstract():
+    """Test that a monitor must implement the processing of the samples."""
+
+    class _Monitor(_BaseMonitor):
+        pass
+
+    with pytest.raises(TypeError, match="abstract"):
+        _Monitor(None, "TRIGGER")
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import time
+import uuid
+
+import numpy as np
+import pytest
+from mne_lsl.lsl import StreamInlet, local_clock, resolve_streams
+
+from resp_audio_sleep.outlet import PEAK_CODES, PeakOutlet
+
+
+def test_peak_outlet():
+    """Test the publication of the peaks on an LSL outlet."""
+    stream_name = f"test-{uuid.uuid4().hex}"
+    outlet = PeakOutlet(stream_name)
+    streams = resolve_streams(timeout=5, name=f"{stream_name}-peaks")
+    assert len(streams) == 1
+    assert streams[0].sfreq == 0
+    assert streams[0].stype == "Markers"
+    inlet = StreamInlet(streams[0])
+    inlet.open_stream(timeout=5)
+    assert inlet.get_sinfo().get_channel_names() == ["peak", "ch_type", "latency"]
+    start = time.monotonic()
+    while not outlet.has_consumers and time.monotonic() - start < 5:
+        time.sleep(0.01)
+    now = local_clock()
+    peaks = [(now - 0.2, "resp"), (now - 0.1, "ecg")]
+    for peak, ch_type in peaks:
+        outlet.push(peak, ch_type)
+    assert outlet.n_peaks == 2
+    data = list()
+    timestamps = list()
+    start = time.monotonic()
+    while len(data) < 2 and time.monotonic() - start < 5:
+        chunk, ts = inlet.pull_chunk(timeout=0.1)
+        data.extend(chunk)
+        timestamps.extend(ts)
+    data = np.array(data)
+    assert data.shape == (2, 3)
+    assert np.allclose(data[:, 0], [peak for peak, _ in peaks])
+    assert np.allclose(timestamps, data[:, 0])  # local machine, no clock offset
+    assert data[:, 1].tolist() == [PEAK_CODES["resp"], PEAK_CODES["ecg"]]
+    assert np.all(0.1 <= data[:, 2])
+    assert data[0, 2] > data[1, 2]
+    with pytest.raises(ValueError, match="Invalid value"):
+        outlet.push(now, "eeg")
+    inlet.close_stream()
@@ -3,6 +3,7 @@ from __future__ import annotations
 import multiprocessing as mp
 import time
 import uuid
+from threading import Thread
 from typing import TYPE_CHECKING
 
 import numpy as np
@@ -13,7 +14,8 @@ from mne.io.base import BaseRaw
 from mne_lsl.stream import StreamLSL
 from numpy.testing import assert_allclose
 
-from resp_audio_sleep.record import Recorder
+from resp_audio_sleep.record import Recorder, read_compact
+from resp_audio_sleep.utils.writer import writer
 
 if TYPE_CHECKING:
     from pathlib import Path
@@ -67,13 +69,17 @@ def _mock_lsl_stream(raw_samples, request):
     process.kill()
 
 
+@pytest.mark.parametrize("memmap", [False, True])
 @pytest.mark.usefixtures("_mock_lsl_stream")
-def test_recorder(raw_samples: BaseRaw, tmp_path: Path):
+def test_recorder(raw_samples: BaseRaw, tmp_path: Path, memmap: bool):
     """Test the recorder class."""
     stream = StreamLSL(bufsize=4).connect(acquisition_delay=None)
     assert stream.ch_names == raw_samples.ch_names
     channels = [stream.ch_names[0], stream.ch_names[-1]]
-    recorder = Recorder(stream, channels, bufsize=10)
+    recorder = Recorder(
+        stream, channels, bufsize=10, memmap=tmp_path if memmap else None
+    )
+    assert isinstance(recorder._buffer, np.memmap) is memmap
     assert recorder._start == 0
     while stream._n_new_samples == 0:
         stream.acquire()
@@ -105,3 +111,159 @@ def test_recorder(raw_samples: BaseRaw, tmp_path: Path):
     assert list(raw.annotations.description) == ["test", "test2"]
     assert_allclose(raw.annotations.duration, np.zeros(2))
     assert_allclose(raw.annotations.onset, [raw.times[0], raw.times[-1]])
+
+
+@pytest.mark.usefixtures("_mock_lsl_stream")
+def test_recorder_thread(raw_samples: BaseRaw, tmp_path: Path):
+    """Test the recorder acquisition thread."""
+    stream = StreamLSL(bufsize=4).connect(acquisition_delay=None)
+    channels = [stream.ch_names[0], stream.ch_names[-1]]
+    recorder = Recorder(stream, channels, bufsize=10)
+    assert not recorder.running
+    recorder.start(acquisition_delay=0.05)
+    assert recorder.running
+    with pytest.raises(RuntimeError, match="already running"):
+        recorder.start()
+    time.sleep(1.5)
+    recorder.stop()
+    assert not recorder.running
+    assert recorder.error is None
+    assert not stream.connected
+    with pytest.raises(RuntimeError, match="stream of the recorder is disconnected"):
+        recorder.start()
+    assert 0 < recorder._start
+    assert recorder.n_dropped == 0
+    assert recorder.n_duplicated == 0
+    recorder.save(tmp_path / "test-raw.fif")
+    raw = read_raw_fif(tmp_path / "test-raw.fif")
+    data = raw.get_data()
+    # the mock stream data is a ramp, thus consecutive samples differ by 1 (modulo
+    # the loop of the player)
+    diff = np.diff(data[0, :])
+    assert np.all((diff == 1) | (diff == -(raw_samples.times.size - 1)))
+
+
+@pytest.mark.usefixtures("_mock_lsl_stream")
+def test_recorder_thread_error(monkeypatch):
+    """Test the failure of the recorder acquisition thread."""
+    stream = StreamLSL(bufsize=4).connect(acquisition_delay=None)
+    recorder = Recorder(stream, stream.ch_names, bufsize=10)
+
+    def _acquire():
+        raise ValueError("Lost connection.")
+
+    monkeypatch.setattr(stream, "acquire", _acquire)
+    recorder.start(acquisition_delay=0.01)
+    start = time.monotonic()
+    while recorder.running and time.monotonic() - start < 5:
+        time.sleep(0.01)
+    assert not recorder.running
+    assert isinstance(recorder.error, ValueError)
+    with pytest.warns(RuntimeWarning, match="stopped on an error: Lost connection"):
+        recorder.stop()
+    assert not stream.connected
+
+
+@pytest.mark.usefixtures("_mock_lsl_stream")
+def test_recorder_counters(raw_samples: BaseRaw):
+    """Test the dropped and duplicated sample counters."""
+    stream = StreamLSL(bufsize=4).connect(acquisition_delay=None)
+    recorder = Recorder(stream, stream.ch_names, bufsize=10)
+    sfreq = stream._info["sfreq"]
+    data = np.zeros((len(stream.ch_names), 10))
+    ts = np.arange(10) / sfreq
+    recorder._push(data, ts)
+    assert recorder._start == 10
+    recorder._push(data[:, 5:], ts[5:])  # fully duplicated
+    assert recorder._start == 10
+    assert recorder.n_duplicated == 5
+    recorder._push(data, ts + 12 / sfreq)  # 2 samples missing
+    assert recorder._start == 20
+    assert recorder.n_dropped == 2
+    assert recorder.n_duplicated == 5
+
+
+@pytest.mark.parametrize("dtype", ["float32", "int16", "int32"])
+@pytest.mark.usefixtures("_mock_lsl_stream")
+def test_recorder_compact(tmp_path: Path, dtype: str):
+    """Test the compact storage of the recorder."""
+    stream = StreamLSL(bufsize=4).connect(acquisition_delay=None)
+    stream.set_channel_types({stream.ch_names[-1]: "stim"}, on_unit_change="ignore")
+    recorder = Recorder(stream, stream.ch_names, bufsize=10, compact=True)
+    assert recorder.compact
+    assert recorder._buffer.dtype == np.float32
+    sfreq = stream._info["sfreq"]
+    rng = np.random.default_rng(101)
+    data = rng.normal(scale=1e-3, size=(len(stream.ch_names), 250))
+    data[-1, :] = 0
+    data[-1, ::50] = 210  # trigger values
+    recorder._push(data, np.arange(250) / sfreq)
+    recorder.annotate(0, "test")
+    recorder.save_compact(tmp_path / "test-raw.npz", dtype=dtype, chunk_size=1)
+    with pytest.raises(FileExistsError, match="already exists"):
+        recorder.save_compact(tmp_path / "test-raw.npz")
+    with pytest.raises(ValueError, match="extension must be '.npz'"):
+        recorder.save_compact(tmp_path / "test-raw.fif")
+    raw = read_compact(tmp_path / "test-raw.npz")
+    assert raw.ch_names == stream.ch_names
+    assert raw.get_channel_types()[-1] == "stim"
+    assert raw.info["sfreq"] == sfreq
+    assert_allclose(raw.get_data(picks="stim"), data[-1:])
+    atol = 1e-6 if dtype == "int16" else 1e-9  # quantization error
+    assert_allclose(raw.get_data(picks="eeg"), data[:-1], rtol=1e-5, atol=atol)
+    assert list(raw.annotations.description) == ["test"]
+    assert_allclose(raw.annotations.onset, [raw.times[-1]])
+
+
+@pytest.mark.usefixtures("_mock_lsl_stream")
+def test_recorder_ring(tmp_path: Path):
+    """Test the flight recorder mode."""
+    stream = StreamLSL(bufsize=4).connect(acquisition_delay=None)
+    sfreq = stream._info["sfreq"]
+    recorder = Recorder(stream, stream.ch_names, bufsize=1, ring=tmp_path / "dumps")
+    assert recorder.ring
+    assert (tmp_path / "dumps").exists()
+    with pytest.raises(RuntimeError, match="does not support annotations"):
+        recorder.annotate(0, "test")
+    # fill the ring above its capacity with a ramp
+    n_samples = recorder._buffer.shape[1]
+    data = np.tile(np.arange(250, dtype=float), (len(stream.ch_names), 1))
+    recorder._push(data[:, :60], np.arange(60) / sfreq)
+    assert_allclose(recorder._window(), data[:, :60])
+    recorder._push(data[:, 60:], np.arange(60, 250) / sfreq)
+    assert recorder._full
+    assert_allclose(recorder._window(), data[:, -n_samples:])
+    # request a dump, written once 'post' seconds are acquired
+    recorder.dump("test", post=0.5)
+    recorder.dump("ignored")  # a dump is already pending
+    assert recorder._dump_request is not None
+    data = np.tile(np.arange(250, 300, dtype=float), (len(stream.ch_names), 1))
+    recorder._push(data, np.arange(250, 300) / sfreq)
+    assert recorder._dump_request is None
+    writer.flush()
+    fnames = list((tmp_path / "dumps").glob("*-raw.fif"))
+    assert len(fnames) == 1
+    assert "test" in fnames[0].name
+    assert stream.name in fnames[0].name
+    raw = read_raw_fif(fnames[0])
+    assert raw.times.size == n_samples
+    assert_allclose(raw.get_data()[0, :], np.arange(300 - n_samples, 300))
+    # concurrent requests, a single dump is pending
+    threads = [
+        Thread(target=recorder.dump, args=(f"concurrent{k}",), kwargs={"post": 0.5})
+        for k in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    recorder._push(data, np.arange(300, 350) / sfreq)
+    assert recorder._dump_request is None
+    writer.flush()
+    assert len(list((tmp_path / "dumps").glob("*-concurrent*-raw.fif"))) == 1
+    # invalid requests
+    with pytest.raises(ValueError, match="must be positive and shorter"):
+        recorder.dump("test", post=2)
+    recorder = Recorder(stream, stream.ch_names, bufsize=1)
+    with pytest.raises(RuntimeError, match="not running as a flight recorder"):
+        recorder.dump("test")
@@ -0,0 +1,60 @@
+import numpy as np
+from numpy.testing import assert_allclose
+
+from resp_audio_sleep.viz import _decimate, _SharedBuffer
+
+
+def test_shared_buffer():
+    """Test the shared-memory buffer feeding the viewer process."""
+    writer = _SharedBuffer(100, n_peaks=4)
+    reader = _SharedBuffer(100, n_peaks=4, name=writer.name)
+    assert reader.read(0) is None  # nothing written yet
+    ts = np.arange(100, dtype=np.float64)
+    data = np.random.default_rng().normal(size=100)
+    writer.write(ts, data)
+    counter, ts_read, data_read = reader.read(0)
+    assert counter == 2
+    assert_allclose(ts_read, ts)
+    assert_allclose(data_read, data)
+    assert reader.read(counter) is None  # no new frame
+    writer._header[0] += 1  # simulate a write in progress
+    assert reader.read(counter) is None
+    writer._header[0] += 1
+    assert reader.read(counter) is not None
+    # peaks
+    n_read, peaks = reader.get_peaks(0)
+    assert n_read == 0
+    assert peaks.size == 0
+    for peak in range(1, 4):
+        writer.add_peak(float(peak))
+    n_read, peaks = reader.get_peaks(n_read)
+    assert n_read == 3
+    assert_allclose(peaks, [1, 2, 3])
+    for peak in range(4, 10):
+        writer.add_peak(float(peak))
+    n_read, peaks = reader.get_peaks(n_read)
+    assert n_read == 9
+    assert_allclose(peaks, [6, 7, 8, 9])  # older peaks were overwritten
+    reader.close()
+    writer.close(unlink=True)
+
+
+def test_decimate():
+    """Test the min/max decimation of the viewer."""
+    times = np.arange(1000, dtype=np.float64)
+    data = np.sin(times / 10)
+    times_dec, data_dec = _decimate(times, data, 100)
+    assert times_dec.size == data_dec.size == 200
+    assert_allclose(data_dec[::2], data.reshape(100, 10).min(axis=1))
+    assert_allclose(data_dec[1::2], data.reshape(100, 10).max(axis=1))
+    assert_allclose(times_dec[::2], times[::10])
+    assert_allclose(times_dec[1::2], times[9::10])
+    # not enough samples to decimate
+    times_dec, data_dec = _decimate(times, data, 800)
+    assert_allclose(times_dec, times)
+    assert_allclose(data_dec, data)
+    # the oldest samples are trimmed to fit an integer number of bins
+    times_dec, data_dec = _decimate(times, data, 300)
+    assert times_dec.size == 600
+    assert times_dec[0] == 100
+    assert times_dec[-1] == 999
@@ -1 +1 @@
-from . import blocks, config, logs
+from . import blocks, clocks, config, logs, writer
@@ -57,9 +57,11 @@ peaks : array of shape (n_peaks,)
 # -- Q ---------------------------------------------------------------------------------
 # -- R ---------------------------------------------------------------------------------
 docdict["resp_ch_name"] = """
-resp_ch_name : str
+resp_ch_name : str | list of str
     Name of the respiration channel in the LSL stream. This channel should contain the
-    respiration signal, typically recorded with a respiration belt or a thermistor."""
+    respiration signal, typically recorded with a respiration belt or a thermistor. If a
+    list of channels is provided, e.g. thoracic and abdominal belts, the channels are
+    fused in a single respiration signal weighted by their signal quality."""
 
 # -- S ---------------------------------------------------------------------------------
 docdict["stream_name"] = """
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+from collections import deque
+from threading import Event, Lock, Thread
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from ._checks import check_type, ensure_int
+from .logs import logger
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+
+class ClockMapper:
+    """Linear mapping from a source clock to a target clock.
+
+    The 2 clocks are sampled in an interleaved fashion, ``source``, ``target``,
+    ``source``, and the target reading is attributed to the midpoint of the 2 source
+    readings. Out of a burst of interleaved readings, the one with the narrowest
+    bracket is kept, which rejects the readings interrupted by the scheduler. The offset
+    and the drift between the clocks are estimated by linear regression on the last
+    samples.
+
+    Parameters
+    ----------
+    source : callable
+        Source clock, returning a time in seconds, e.g. the LSL ``local_clock``.
+    target : callable
+        Target clock, returning a time in seconds, e.g. PsychToolbox ``GetSecs``.
+    n_samples : int
+        Number of samples used in the regression.
+    burst : int
+        Number of interleaved readings per sample.
+    """
+
+    def __init__(
+        self,
+        source: Callable[[], float],
+        target: Callable[[], float],
+        *,
+        n_samples: int = 60,
+        burst: int = 5,
+    ) -> None:
+        check_type(source, ("callable",), "source")
+        check_type(target, ("callable",), "target")
+        n_samples = ensure_int(n_samples, "n_samples")
+        if n_samples < 2:
+            raise ValueError("The argument 'n_samples' must be at least 2.")
+        burst = ensure_int(burst, "burst")
+        if burst <= 0:
+            raise ValueError("The argument 'burst' must be strictly positive.")
+        self._source = source
+        self._target = target
+        self._burst = burst
+        self._samples = deque(maxlen=n_samples)
+        self._lock = Lock()
+        self._stop_event = Event()
+        self._thread = None
+        # the mapping is stored as target = slope * (source - origin) + intercept
+        self._origin = 0.0
+        self._slope = 1.0
+        self._intercept = 0.0
+        self.update()
+
+    def __call__(self, timestamp: float) -> float:
+        """Convert a timestamp from the source clock to the target clock.
+
+        Parameters
+        ----------
+        timestamp : float
+            Time in seconds in the source clock.
+
+        Returns
+        -------
+        timestamp : float
+            Time in seconds in the target clock.
+        """
+        with self._lock:
+            return self._slope * (timestamp - self._origin) + self._intercept
+
+    def sample(self) -> tuple[float, float, float]:
+        """Sample the 2 clocks.
+
+        Returns
+        -------
+        source : float
+            Time in the source clock, midpoint of the narrowest bracket.
+        target : float
+            Time in the target clock.
+        uncertainty : float
+            Half-width of the bracket in seconds.
+        """
+        best = None
+        for _ in range(self._burst):
+            t1 = self._source()
+            target = self._target()
+            t2 = self._source()
+            if best is None or t2 - t1 < best[2]:
+                best = ((t1 + t2) / 2, target, t2 - t1)
+        return best[0], best[1], best[2] / 2
+
+    def update(self) -> None:
+        """Add a sample and update the mapping."""
+        source, target, _ = self.sample()
+        self._samples.append((source, target))
+        samples = np.array(self._samples)
+        origin = samples[-1, 0]
+        if samples.shape[0] == 1:
+            slope, intercept = 1.0, target
+        else:
+            slope, intercept = np.polyfit(samples[:, 0] - origin, samples[:, 1], 1)
+        with self._lock:
+            self._origin = origin
+            self._slope = float(slope)
+            self._intercept = float(intercept)
+
+    def start(self, interval: float = 1.0) -> None:
+        """Update the mapping periodically in a background thread.
+
+        Parameters
+        ----------
+        interval : float
+            Delay in seconds between 2 updates.
+        """
+        check_type(interval, ("numeric",), "interval")
+        if interval <= 0:
+            raise ValueError("The argument 'interval' must be strictly positive.")
+        if self._thread is not None:
+            raise RuntimeError("The clock mapper is already running.")
+        self._stop_event.clear()
+        self._thread = Thread(target=self._run, args=(interval,), daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background updates."""
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self, interval: float) -> None:
+        """Update loop run in the background thread."""
+        while not self._stop_event.wait(interval):
+            try:
+                self.update()
+            except Exception as error:
+                logger.error("The clock mapper failed: %s", error)
+                return
+
+    @property
+    def offset(self) -> float:
+        """Offset in seconds of the target clock at the last sample."""
+        with self._lock:
+            return self._intercept - self._origin
+
+    @property
+    def drift(self) -> float:
+        """Drift of the target clock relative to the source clock, in s/s."""
+        with self._lock:
+            return self._slope - 1
+
+    @property
+    def n_samples(self) -> int:
+        """Number of samples used in the regression."""
+        return len(self._samples)
+
+    @property
+    def running(self) -> bool:
+        """Whether the background updates are running."""
+        return self._thread is not None
@@ -1,10 +1,16 @@
 from __future__ import annotations
 
-import inspect
+import atexit
 import logging
-from functools import wraps
+import sys
+import time
+from functools import lru_cache, wraps
 from importlib import import_module
+from logging.handlers import QueueHandler, QueueListener
+from os.path import basename, dirname
 from pathlib import Path
+from queue import SimpleQueue
+from threading import Lock
 from typing import TYPE_CHECKING
 from warnings import warn_explicit
 
@@ -42,10 +48,16 @@ def _init_logger(*, verbose: bool | str | int | None = None) -> logging.Logger:
     # add the main handler
     handler = logging.StreamHandler(WrapStdOut())
     handler.setFormatter(_LoggerFormatter())
+    handler.addFilter(_filter_warn)
     logger.addHandler(handler)
     return logger
 
 
+def _filter_warn(record: logging.LogRecord) -> bool:
+    """Filter out the records emitted by :func:`warn`, already shown on stderr."""
+    return not getattr(record, "_from_warn", False)
+
+
 def add_file_handler(
     fname: str | Path,
     mode: str = "a",
@@ -79,7 +91,49 @@ def add_file_handler(
     if verbose is not None:
         verbose = check_verbose(verbose)
         handler.setLevel(verbose)
-    logger.addHandler(handler)
+    if _listener is None:
+        logger.addHandler(handler)
+    else:
+        _listener.handlers = (*_listener.handlers, handler)
+
+
+def enable_queue_logging() -> None:
+    """Move the formatting and the I/O of the log records to a background thread.
+
+    The handlers of the logger, including the file handlers added afterwards with
+    :func:`~resp_audio_sleep.add_file_handler`, are served by a listener thread which
+    receives the records through a queue. Logging a record then costs a queue insertion
+    on the calling thread, which is suited for the real-time loops.
+
+    Notes
+    -----
+    The pending records are flushed when :func:`disable_queue_logging` is called,
+    including at interpreter exit.
+    """
+    global _listener
+
+    if _listener is not None:
+        return
+    queue = SimpleQueue()
+    _listener = QueueListener(queue, *logger.handlers, respect_handler_level=True)
+    for handler in logger.handlers[:]:
+        logger.removeHandler(handler)
+    logger.addHandler(QueueHandler(queue))
+    _listener.start()
+
+
+def disable_queue_logging() -> None:
+    """Flush the pending log records and restore synchronous logging."""
+    global _listener
+
+    if _listener is None:
+        return
+    for handler in logger.handlers[:]:
+        logger.removeHandler(handler)
+    _listener.stop()  # process the records left in the queue
+    for handler in _listener.handlers:
+        logger.addHandler(handler)
+    _listener = None
 
 
 @fill_doc
@@ -183,6 +237,8 @@ def warn(
     category: Warning = RuntimeWarning,
     module: str = _PACKAGE,
     ignore_namespaces: tuple[str, ...] | list[str] = (_PACKAGE,),
+    *,
+    interval: float | None = None,
 ) -> None:
     """Emit a warning with trace outside the requested namespace.
 
@@ -205,20 +261,31 @@ def warn(
         The name of the module emitting the warning.
     ignore_namespaces : list of str | tuple of str
         Namespaces to ignore when traversing the stack.
+    interval : float | None
+        If provided, the same message is emitted at most once every ``interval``
+        seconds. The repetitions in between are counted and reported when the message
+        is emitted again, or at interpreter exit. Use it for warnings raised from
+        loops.
     """
     if logging.WARNING < logger.level:
         return None
-    root_dirs = [
-        Path(import_module(namespace).__file__).parent
-        for namespace in ignore_namespaces
-    ]
-    frame = inspect.currentframe()
+    if interval is not None:
+        suppressed = _rate_limit(message, interval)
+        if suppressed is None:
+            return None
+        n_suppressed, elapsed = suppressed
+        if n_suppressed != 0:
+            message += (
+                f" (repeated {n_suppressed} time(s) in the last {elapsed:.1f} seconds)"
+            )
+    root_dirs = _get_root_dirs(tuple(ignore_namespaces))
+    frame = sys._getframe()
     while frame:  # at some point it will be None and exit the loop
-        fname = Path(frame.f_code.co_filename)
-        if fname.parent.name == "tests":
+        fname = frame.f_code.co_filename
+        if basename(dirname(fname)) == "tests":
             break  # treat tests as outside of the namespace
         lineno = frame.f_lineno
-        if not (any(str(fname).startswith(str(rd)) for rd in root_dirs)):
+        if not fname.startswith(root_dirs):
             break
         frame = frame.f_back
     del frame
@@ -228,16 +295,70 @@ def warn(
     warn_explicit(
         message,
         category,
-        str(fname),
+        fname,
         lineno,
         module,
         globals().get("__warningregistry__", {}),
     )
     # now we emit the warning to the logger, except to the default StreamHandler on
-    # stdout registered as the first handler.
-    logger.handlers[0].setLevel(logging.WARNING + 1)
-    logger.warning(message)
-    logger.handlers[0].setLevel(0)
+    # stdout which filters out the records flagged by '_from_warn'.
+    logger.warning(message, extra={"_from_warn": True})
+
+
+@lru_cache
+def _get_root_dirs(ignore_namespaces: tuple[str, ...]) -> tuple[str, ...]:
+    """Get the root directories of the ignored namespaces."""
+    return tuple(
+        str(Path(import_module(namespace).__file__).parent)
+        for namespace in ignore_namespaces
+    )
+
+
+def _rate_limit(message: str, interval: float) -> tuple[int, float] | None:
+    """Count a rate-limited message.
+
+    Parameters
+    ----------
+    message : str
+        Warning message.
+    interval : float
+        Minimum interval in seconds between 2 emissions of the message.
+
+    Returns
+    -------
+    suppressed : tuple of (int, float) | None
+        None if the message must be suppressed, else the number of repetitions
+        suppressed since the last emission and the time elapsed in seconds since the
+        last emission.
+    """
+    now = time.monotonic()
+    with _warn_lock:
+        last, n_suppressed = _warn_registry.get(message, (float("-inf"), 0))
+        if now - last < interval:
+            _warn_registry[message] = (last, n_suppressed + 1)
+            return None
+        _warn_registry[message] = (now, 0)
+    return n_suppressed, now - last
+
+
+def _report_suppressed_warnings() -> None:
+    """Report the rate-limited warnings suppressed since their last emission."""
+    now = time.monotonic()
+    with _warn_lock:
+        for message, (last, n_suppressed) in _warn_registry.items():
+            if n_suppressed != 0:
+                logger.warning(
+                    "%s (repeated %i time(s) in the last %.1f seconds)",
+                    message,
+                    n_suppressed,
+                    now - last,
+                )
+        _warn_registry.clear()
 
 
 logger = _init_logger()
+_listener: QueueListener | None = None
+_warn_lock = Lock()
+_warn_registry: dict[str, tuple[float, int]] = dict()
+atexit.register(disable_queue_logging)
+atexit.register(_report_suppressed_warnings)  # executed before the queue is drained
@@ -0,0 +1,337 @@
+from __future__ import annotations
+
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from ._checks import check_type, ensure_int
+from .logs import logger
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Sequence
+
+
+# quantiles of the observed distributions exposed by the endpoint
+_QUANTILES: tuple[float, ...] = (0.5, 0.9, 0.99)
+# minimum duration in seconds over which the rate of a counter is measured
+_RATE_WINDOW: float = 10.0
+
+
+class Metrics:
+    """Registry of the counters, gauges and distributions of a session.
+
+    The gauges and the distributions are updated with plain assignments in preallocated
+    slots, which are atomic under the GIL and cheap enough for the detection loop. The
+    counters are incremented under a lock, uncontended in practice. The aggregation,
+    e.g. the quantiles of a distribution or the rate of a counter, is computed by the
+    reader.
+
+    Parameters
+    ----------
+    n_observations : int
+        Number of recent observations kept per distribution.
+    labels : dict | None
+        Labels attached to every sample of the registry, e.g. ``{"bed": "1"}`` to
+        distinguish the registries of several sessions served by the same endpoint.
+    """
+
+    def __init__(
+        self, n_observations: int = 1000, *, labels: dict[str, str] | None = None
+    ) -> None:
+        n_observations = ensure_int(n_observations, "n_observations")
+        if n_observations <= 0:
+            raise ValueError("The argument 'n_observations' must be strictly positive.")
+        labels = dict() if labels is None else labels
+        check_type(labels, (dict,), "labels")
+        for key, value in labels.items():
+            check_type(key, (str,), "label")
+            check_type(value, (str,), "label value")
+        self._n_observations = n_observations
+        self._labels = labels
+        self._counters: dict[str, int] = dict()
+        self._gauges: dict[str, float] = dict()
+        self._callbacks: dict[str, Callable[[], float]] = dict()
+        self._observations: dict[str, _Distribution] = dict()
+        # snapshots of the counters taken by the readers, to measure the rates
+        self._snapshots: deque[tuple[float, dict[str, int]]] = deque()
+        self._lock = Lock()
+
+    def inc(self, name: str, value: int = 1) -> None:
+        """Increment a counter.
+
+        Parameters
+        ----------
+        name : str
+            Name of the counter.
+        value : int
+            Increment.
+        """
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set(self, name: str, value: float) -> None:
+        """Set a gauge.
+
+        Parameters
+        ----------
+        name : str
+            Name of the gauge.
+        value : float
+            Value of the gauge.
+        """
+        self._gauges[name] = value
+
+    def observe(self, name: str, value: float) -> None:
+        """Add an observation to a distribution.
+
+        Parameters
+        ----------
+        name : str
+            Name of the distribution.
+        value : float
+            Observed value.
+        """
+        distribution = self._observations.get(name)
+        if distribution is None:
+            distribution = _Distribution(self._n_observations)
+            self._observations[name] = distribution
+        distribution.values[distribution.count % distribution.values.size] = value
+        distribution.total += value
+        distribution.count += 1
+
+    def register(self, name: str, func: Callable[[], float]) -> None:
+        """Register a gauge evaluated by the reader.
+
+        Parameters
+        ----------
+        name : str
+            Name of the gauge.
+        func : callable
+            Function returning the value of the gauge, called when the metrics are read.
+        """
+        check_type(func, ("callable",), "func")
+        self._callbacks[name] = func
+
+    def unregister(self, name: str) -> None:
+        """Unregister a gauge evaluated by the reader."""
+        self._callbacks.pop(name, None)
+
+    def reset(self) -> None:
+        """Reset all the metrics."""
+        with self._lock:
+            self._counters.clear()
+            self._snapshots.clear()
+        self._gauges.clear()
+        self._callbacks.clear()
+        self._observations.clear()
+
+    def render(self) -> str:
+        """Render the metrics in the Prometheus text format.
+
+        Returns
+        -------
+        text : str
+            The metrics, one sample per line. The rate of each counter is exposed as a
+            ``<counter>_rate`` gauge in events per second, measured over at least the
+            last 10 seconds of renderings, or since the first rendering.
+        """
+        return render((self,))
+
+    def _collect(self) -> list[tuple[str, str, str]]:
+        """Collect the samples of the registry.
+
+        Returns
+        -------
+        samples : list of tuple
+            The samples as ``(family, type, line)``, where the line is the sample in
+            the Prometheus text format.
+        """
+        labels = _format_labels(self._labels)
+        samples = list()
+        # the rates are measured against the most recent snapshot older than the
+        # window, shared by the concurrent readers and independent of their number.
+        with self._lock:
+            now = time.monotonic()
+            counters = dict(self._counters)
+            self._snapshots.append((now, counters))
+            while (
+                2 <= len(self._snapshots)
+                and self._snapshots[1][0] <= now - _RATE_WINDOW
+            ):
+                self._snapshots.popleft()
+            start, reference = self._snapshots[0]
+        for name, value in counters.items():
+            samples.append((f"ras_{name}_total", "counter", f"{value}"))
+            if start < now:
+                rate = (value - reference.get(name, 0)) / (now - start)
+                samples.append((f"ras_{name}_rate", "gauge", f"{rate}"))
+        samples = [
+            (family, kind, f"{family}{labels} {value}")
+            for family, kind, value in samples
+        ]
+        # the dictionaries are copied since the writer can add entries concurrently
+        gauges = dict(self._gauges)
+        for name, func in dict(self._callbacks).items():
+            try:
+                gauges[name] = func()
+            except Exception as error:
+                logger.debug("The gauge '%s' failed: %s", name, error)
+        for name, value in gauges.items():
+            samples.append((f"ras_{name}", "gauge", f"ras_{name}{labels} {value}"))
+        for name, distribution in dict(self._observations).items():
+            count = distribution.count
+            total = distribution.total
+            values = distribution.values[: min(count, distribution.values.size)]
+            for quantile, value in zip(
+                _QUANTILES, np.quantile(values, _QUANTILES), strict=True
+            ):
+                quantile_labels = _format_labels(
+                    dict(self._labels, quantile=str(quantile))
+                )
+                samples.append(
+                    (f"ras_{name}", "summary", f"ras_{name}{quantile_labels} {value}")
+                )
+            samples.append(
+                (f"ras_{name}", "summary", f"ras_{name}_sum{labels} {total}")
+            )
+            samples.append(
+                (f"ras_{name}", "summary", f"ras_{name}_count{labels} {count}")
+            )
+        return samples
+
+    @property
+    def counters(self) -> dict[str, int]:
+        """Snapshot of the counters."""
+        with self._lock:
+            return dict(self._counters)
+
+    @property
+    def labels(self) -> dict[str, str]:
+        """Labels attached to every sample of the registry."""
+        return dict(self._labels)
+
+
+def render(registries: Sequence[Metrics]) -> str:
+    """Render the metrics of several registries in the Prometheus text format.
+
+    The samples of the same metric are grouped under a single type declaration, thus
+    the registries should be distinguished by their labels.
+
+    Parameters
+    ----------
+    registries : sequence of Metrics
+        The registries to render.
+
+    Returns
+    -------
+    text : str
+        The metrics, one sample per line.
+    """
+    families: dict[str, tuple[str, list[str]]] = dict()
+    for registry in registries:
+        check_type(registry, (Metrics,), "registry")
+        for family, kind, line in registry._collect():
+            families.setdefault(family, (kind, list()))[1].append(line)
+    lines = list()
+    for family, (kind, samples) in sorted(families.items()):
+        lines.append(f"# TYPE {family} {kind}")
+        lines.extend(samples)
+    return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    """Format labels in the Prometheus text format."""
+    if len(labels) == 0:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}"
+
+
+class _Distribution:
+    """Ring of the recent observations of a distribution.
+
+    The count and the sum cover all the observations, as required by a summary.
+    """
+
+    __slots__ = ("count", "total", "values")
+
+    def __init__(self, n_observations: int) -> None:
+        self.values = np.full(n_observations, np.nan)
+        self.count = 0
+        self.total = 0.0
+
+
+class MetricsServer:
+    """HTTP endpoint serving the metrics in the Prometheus text format.
+
+    The server is bound to the loopback interface and runs in a background thread. The
+    metrics are available at ``http://127.0.0.1:<port>/metrics``.
+
+    Parameters
+    ----------
+    metrics : Metrics | sequence of Metrics
+        The metrics to serve. Several registries are served together, e.g. one per
+        session, and should be distinguished by their labels.
+    port : int
+        Port on which the server listens. If 0, a free port is selected.
+    """
+
+    def __init__(self, metrics: Metrics | Sequence[Metrics], port: int = 0) -> None:
+        metrics = (metrics,) if isinstance(metrics, Metrics) else tuple(metrics)
+        for registry in metrics:
+            check_type(registry, (Metrics,), "metrics")
+        port = ensure_int(port, "port")
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), _MetricsHandler)
+        self._server.daemon_threads = True
+        self._server.metrics = metrics
+        self._thread = None
+
+    def start(self) -> None:
+        """Start serving the metrics."""
+        if self._thread is not None:
+            raise RuntimeError("The metrics server is already running.")
+        self._thread = Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        logger.info("Metrics served at http://127.0.0.1:%i/metrics.", self.port)
+
+    def stop(self) -> None:
+        """Stop serving the metrics and close the socket."""
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+
+    @property
+    def port(self) -> int:
+        """Port on which the server listens."""
+        return self._server.server_address[1]
+
+    @property
+    def running(self) -> bool:
+        """Whether the server is running."""
+        return self._thread is not None
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """Handler answering the requests to the metrics endpoint."""
+
+    def do_GET(self) -> None:  # noqa: N802
+        if self.path.rstrip("/") not in ("", "/metrics"):
+            self.send_error(404)
+            return
+        body = render(self.server.metrics).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:  # noqa: A002
+        logger.debug("Metrics server: " + format, *args)
+
+
+metrics = Metrics()
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import cProfile
+import pstats
+from contextlib import contextmanager
+from io import StringIO
+from typing import TYPE_CHECKING
+
+from ._checks import check_type, ensure_int, ensure_path
+from .logs import logger
+
+if TYPE_CHECKING:
+    from collections.abc import Generator
+    from pathlib import Path
+
+
+class Profiler:
+    """Profiler of the blocks of a session.
+
+    Each block is profiled with :mod:`cProfile`, limited to the thread running the
+    block, and its profile is saved in ``{index:02d}-{block}.prof`` where the index
+    counts the blocks of the session. The profiles can be inspected with
+    :class:`pstats.Stats` or with a viewer such as ``snakeviz``.
+
+    Parameters
+    ----------
+    directory : str | Path
+        Directory in which the profiles are saved.
+    """
+
+    def __init__(self, directory: str | Path) -> None:
+        self._directory = ensure_path(directory, must_exist=False)
+        self._directory.mkdir(parents=True, exist_ok=True)
+        self._n_blocks = 0
+        self._stats = None
+
+    @contextmanager
+    def block(self, name: str) -> Generator[None, None, None]:
+        """Profile a block.
+
+        Parameters
+        ----------
+        name : str
+            Name of the block, used in the file name of the profile.
+        """
+        check_type(name, (str,), "name")
+        self._n_blocks += 1
+        fname = self._directory / f"{self._n_blocks:02d}-{name}.prof"
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            profile.dump_stats(fname)
+            if self._stats is None:
+                self._stats = pstats.Stats(profile)
+            else:
+                self._stats.add(profile)
+            logger.info("Profile of the block '%s' saved to %s.", name, fname)
+
+    def summary(self, n_functions: int = 20) -> None:
+        """Log the hottest functions across the profiled blocks.
+
+        Parameters
+        ----------
+        n_functions : int
+            Number of functions to log, sorted by the time spent in the function
+            itself, excluding its callees.
+        """
+        n_functions = ensure_int(n_functions, "n_functions")
+        if self._stats is None:
+            logger.info("Profiler: no block profiled.")
+            return
+        stream = StringIO()
+        self._stats.stream = stream
+        self._stats.sort_stats(pstats.SortKey.TIME).print_stats(n_functions)
+        logger.info(
+            "Profiler: top %i functions across %i block(s):\n%s",
+            n_functions,
+            self._n_blocks,
+            stream.getvalue().strip("\n"),
+        )
+
+    @property
+    def directory(self) -> Path:
+        """Directory in which the profiles are saved."""
+        return self._directory
+
+    @property
+    def n_blocks(self) -> int:
+        """Number of profiled blocks."""
+        return self._n_blocks
@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import gc
+import os
+from contextlib import contextmanager
+from threading import Lock
+from typing import TYPE_CHECKING, Any
+
+from ._checks import check_type, ensure_int
+from .logs import logger
+
+if TYPE_CHECKING:
+    from collections.abc import Generator, Sequence
+
+
+# flags of mlockall, see <sys/mman.h>
+_MCL_CURRENT: int = 1
+_MCL_FUTURE: int = 2
+# scheduling state of the calling thread before the real-time mode, restored by the
+# helper threads started within the block, see release_thread()
+_released: dict[str, Any] = dict()
+# process-wide state shared by the real-time blocks run concurrently in several threads,
+# e.g. the beds of an orchestrator
+_process: dict[str, Any] = {"n_blocks": 0, "n_mlock": 0, "gc_enabled": True}
+_process_lock = Lock()
+
+
+@contextmanager
+def realtime(
+    cores: Sequence[int] | None = None,
+    *,
+    priority: int | None = 10,
+    mlock: bool = False,
+) -> Generator[dict[str, bool], None, None]:
+    """Run a block in real-time mode.
+
+    In real-time mode:
+
+    * the objects allocated so far are moved to a permanent generation with
+      :func:`gc.freeze` and the automatic garbage collection is disabled. A collection
+      is run when the block exits, e.g. between 2 blocks.
+    * the calling thread is pinned to the selected CPU cores.
+    * the calling thread requests the ``SCHED_FIFO`` real-time scheduling policy, or a
+      lower niceness if the real-time policy is not permitted.
+    * the memory of the process is locked in RAM to prevent page faults.
+
+    Each step is attempted independently, and the previous state is restored when the
+    block exits. The steps requiring privileges can fail, e.g. without the
+    ``CAP_SYS_NICE`` capability or with a low ``RLIMIT_MEMLOCK`` limit. The garbage
+    collection and the memory locking are process-wide, thus if several threads run a
+    real-time block concurrently, they are restored when the last block exits.
+
+    The threads started within the block inherit the affinity and the scheduling policy
+    of the calling thread. The helper threads, e.g. the acquisition threads of the
+    monitors or the watchdog, call :func:`release_thread` when they start to run on the
+    previous cores and policy instead of competing with the task thread.
+
+    Parameters
+    ----------
+    cores : sequence of int | None
+        CPU cores to which the calling thread is pinned. If None, the affinity is not
+        changed.
+    priority : int | None
+        Real-time priority between 1 and 99 requested for the calling thread. If None,
+        the scheduling priority is not changed.
+    mlock : bool
+        If True, lock the current and future memory of the process in RAM.
+
+    Yields
+    ------
+    report : dict
+        Whether each step succeeded, for the keys ``"gc"``, ``"affinity"``,
+        ``"priority"`` and ``"mlock"``. The steps not requested are absent.
+    """
+    if cores is not None:
+        cores = [ensure_int(core, "core") for core in cores]
+        if len(cores) == 0:
+            raise ValueError("The argument 'cores' must contain at least one core.")
+    if priority is not None:
+        priority = ensure_int(priority, "priority")
+        if not 1 <= priority <= 99:
+            raise ValueError("The argument 'priority' must be between 1 and 99.")
+    check_type(mlock, (bool,), "mlock")
+    report = dict()
+    messages = list()
+    # garbage collection
+    with _process_lock:
+        if _process["n_blocks"] == 0:
+            _process["gc_enabled"] = gc.isenabled()
+            gc.collect()
+            gc.freeze()
+            gc.disable()
+        _process["n_blocks"] += 1
+    report["gc"] = True
+    messages.append("automatic garbage collection disabled")
+    # CPU affinity
+    affinity = None
+    if cores is not None:
+        try:
+            affinity = os.sched_getaffinity(0)
+            os.sched_setaffinity(0, cores)
+            _released["affinity"] = affinity
+            report["affinity"] = True
+            messages.append(f"pinned to core(s) {', '.join(map(str, cores))}")
+        except (AttributeError, OSError) as error:
+            affinity = None
+            report["affinity"] = False
+            messages.append(f"CPU affinity failed ({error})")
+    # scheduling priority
+    scheduler = None
+    niceness = None
+    if priority is not None:
+        try:
+            scheduler = (os.sched_getscheduler(0), os.sched_getparam(0))
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(priority))
+            _released["scheduler"] = scheduler
+            report["priority"] = True
+            messages.append(f"SCHED_FIFO priority {priority}")
+        except (AttributeError, OSError) as error:
+            scheduler = None
+            try:
+                niceness = os.getpriority(os.PRIO_PROCESS, 0)
+                os.setpriority(os.PRIO_PROCESS, 0, -10)
+                _released["niceness"] = niceness
+                report["priority"] = True
+                messages.append(f"SCHED_FIFO failed ({error}), niceness set to -10")
+            except (AttributeError, OSError) as error_nice:
+                niceness = None
+                report["priority"] = False
+                messages.append(
+                    f"SCHED_FIFO failed ({error}), niceness failed ({error_nice})"
+                )
+    # memory locking
+    libc = None
+    if mlock:
+        with _process_lock:
+            libc, error = _mlockall()
+            if libc is not None:
+                _process["n_mlock"] += 1
+        report["mlock"] = libc is not None
+        messages.append(
+            "memory locked" if libc is not None else f"memory locking failed ({error})"
+        )
+    logger.info("Real-time mode: %s.", ", ".join(messages))
+    try:
+        yield report
+    finally:
+        if scheduler is not None:
+            os.sched_setscheduler(0, *scheduler)
+        if niceness is not None:
+            os.setpriority(os.PRIO_PROCESS, 0, niceness)
+        if affinity is not None:
+            os.sched_setaffinity(0, affinity)
+        with _process_lock:
+            if libc is not None:
+                _process["n_mlock"] -= 1
+                if _process["n_mlock"] == 0:
+                    libc.munlockall()
+            _process["n_blocks"] -= 1
+            if _process["n_blocks"] == 0:
+                _released.clear()
+                gc.unfreeze()
+                if _process["gc_enabled"]:
+                    gc.enable()
+                gc.collect()
+
+
+def release_thread() -> None:
+    """Restore the scheduling of the calling thread from before the real-time mode.
+
+    A thread started within :func:`realtime` inherits the CPU affinity and the
+    ``SCHED_FIFO`` policy of the task thread. A helper thread spinning or polling on
+    the same cores with the same priority competes with the task thread, and a busy task
+    thread starves it. This function restores the affinity and the scheduling policy
+    from before the real-time mode, and does nothing outside of the real-time mode.
+    """
+    state = dict(_released)
+    try:
+        if "scheduler" in state:
+            os.sched_setscheduler(0, *state["scheduler"])
+        if "niceness" in state:
+            os.setpriority(os.PRIO_PROCESS, 0, state["niceness"])
+        if "affinity" in state:
+            os.sched_setaffinity(0, state["affinity"])
+    except (AttributeError, OSError) as error:
+        logger.warning(
+            "The scheduling of the helper thread is not restored (%s).", error
+        )
+
+
+def _mlockall() -> tuple[ctypes.CDLL | None, str | None]:
+    """Lock the current and future memory of the process.
+
+    Returns
+    -------
+    libc : CDLL | None
+        The C library used to lock the memory, or None if the memory is not locked.
+    error : str | None
+        The reason for which the memory is not locked.
+    """
+    name = ctypes.util.find_library("c")
+    if name is None:
+        return None, "C library not found"
+    libc = ctypes.CDLL(name, use_errno=True)
+    if not hasattr(libc, "mlockall"):
+        return None, "mlockall not available"
+    if libc.mlockall(_MCL_CURRENT | _MCL_FUTURE) != 0:
+        return None, os.strerror(ctypes.get_errno())
+    return libc, None
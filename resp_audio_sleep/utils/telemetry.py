@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import os
+import time
+from threading import Event, Lock, Thread
+from typing import TYPE_CHECKING
+
+import numpy as np
+import psutil
+
+from ._checks import check_type, ensure_int, ensure_path
+from .logs import logger
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from numpy.typing import NDArray
+
+
+# number of threads, sorted by CPU usage, stored in each sample
+_N_THREADS: int = 8
+_TELEMETRY_DTYPE = np.dtype(
+    [
+        ("time", np.float64),  # wall-clock time of the sample
+        ("cpu", np.float32),  # CPU usage of the process in %, 100% per core
+        ("rss", np.int64),  # resident set size in bytes
+        # context switches since the last sample
+        ("ctx_voluntary", np.int64),
+        ("ctx_involuntary", np.int64),
+        ("n_fds", np.int32),  # number of open file descriptors, -1 if not available
+        ("n_threads", np.int32),  # number of threads of the process
+        ("load", np.float32),  # system load averaged over the last minute
+        ("thread_ids", np.int64, (_N_THREADS,)),  # busiest threads, 0 if padded
+        ("thread_cpu", np.float32, (_N_THREADS,)),  # CPU usage of the busiest threads
+    ]
+)
+
+
+class TelemetrySampler:
+    """Sampler of the resources used by the process in a background thread.
+
+    The samples are written in a preallocated ring of structured rows. Once the ring is
+    full, the oldest samples are overwritten.
+
+    Parameters
+    ----------
+    interval : float
+        Delay in seconds between 2 samples.
+    n_samples : int
+        Number of samples in the ring.
+    """
+
+    def __init__(self, interval: float = 1.0, n_samples: int = 86400) -> None:
+        check_type(interval, ("numeric",), "interval")
+        if interval <= 0:
+            raise ValueError("The argument 'interval' must be strictly positive.")
+        n_samples = ensure_int(n_samples, "n_samples")
+        if n_samples <= 0:
+            raise ValueError("The argument 'n_samples' must be strictly positive.")
+        self._interval = interval
+        self._process = psutil.Process()
+        self._samples = np.zeros(n_samples, dtype=_TELEMETRY_DTYPE)
+        self._n_samples = 0  # total number of samples, including the overwritten ones
+        self._lock = Lock()
+        self._stop_event = Event()
+        self._thread = None
+        self._last = self._read_counters()
+        self._process.cpu_percent()  # the first call initializes the measure
+
+    def start(self) -> None:
+        """Start sampling."""
+        if self._thread is not None:
+            raise RuntimeError("The telemetry sampler is already running.")
+        self._stop_event.clear()
+        self._thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling."""
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self) -> None:
+        """Run the sampling loop in the background thread."""
+        while not self._stop_event.wait(self._interval):
+            try:
+                self.sample()
+            except Exception as error:
+                logger.error("The telemetry sampler failed: %s", error)
+                return
+
+    def _read_counters(self) -> tuple[float, dict[int, float], tuple[int, int]]:
+        """Read the cumulative counters of the process."""
+        threads = {
+            thread.id: thread.user_time + thread.system_time
+            for thread in self._process.threads()
+        }
+        ctx = self._process.num_ctx_switches()
+        return time.monotonic(), threads, (ctx.voluntary, ctx.involuntary)
+
+    def sample(self) -> None:
+        """Sample the resources used by the process and add the sample to the ring."""
+        last_time, last_threads, last_ctx = self._last
+        now, threads, ctx = self._read_counters()
+        self._last = (now, threads, ctx)
+        elapsed = max(now - last_time, 1e-6)
+        thread_ids = np.array(list(threads), dtype=np.int64)
+        thread_cpu = np.array(
+            [
+                (cpu - last_threads.get(tid, cpu)) / elapsed * 100
+                for tid, cpu in threads.items()
+            ],
+            dtype=np.float32,
+        )
+        order = np.argsort(thread_cpu)[::-1][:_N_THREADS]
+        try:
+            n_fds = self._process.num_fds()
+        except (AttributeError, psutil.Error):  # not available on Windows
+            n_fds = -1
+        with self._lock:
+            row = self._samples[self._n_samples % self._samples.size]
+            row["time"] = time.time()
+            row["cpu"] = self._process.cpu_percent()
+            row["rss"] = self._process.memory_info().rss
+            row["ctx_voluntary"] = ctx[0] - last_ctx[0]
+            row["ctx_involuntary"] = ctx[1] - last_ctx[1]
+            row["n_fds"] = n_fds
+            row["n_threads"] = len(threads)
+            row["load"] = os.getloadavg()[0] if hasattr(os, "getloadavg") else np.nan
+            row["thread_ids"] = 0
+            row["thread_cpu"] = 0
+            row["thread_ids"][: order.size] = thread_ids[order]
+            row["thread_cpu"][: order.size] = thread_cpu[order]
+            self._n_samples += 1
+
+    def summary(self, start: float | None = None) -> None:
+        """Log a summary of the samples.
+
+        Parameters
+        ----------
+        start : float | None
+            Wall-clock time from which the samples are summarized, e.g. the start of a
+            block. If None, all the samples in the ring are summarized.
+        """
+        samples = self.samples
+        if start is not None:
+            samples = samples[start <= samples["time"]]
+        if samples.size == 0:
+            logger.info("Telemetry: no sample.")
+            return
+        logger.info(
+            "Telemetry on %i sample(s): CPU %.1f%% (max %.1f%%), busiest thread max "
+            "%.1f%%, RSS max %.1f MB, %i involuntary context switch(es), %i open file "
+            "descriptor(s) max, load max %.2f.",
+            samples.size,
+            np.mean(samples["cpu"]),
+            np.max(samples["cpu"]),
+            np.max(samples["thread_cpu"][:, 0]),
+            np.max(samples["rss"]) / 2**20,
+            np.sum(samples["ctx_involuntary"]),
+            np.max(samples["n_fds"]),
+            np.max(samples["load"]),
+        )
+
+    def save(self, fname: str | Path, *, overwrite: bool = False) -> None:
+        """Save the samples in an NPZ file.
+
+        Parameters
+        ----------
+        fname : str | Path
+            Path to the NPZ file.
+        overwrite : bool
+            If True, overwrite an existing file.
+        """
+        fname = ensure_path(fname, must_exist=False)
+        if fname.suffix != ".npz":
+            raise ValueError("The file extension must be '.npz'.")
+        if fname.exists() and not overwrite:
+            raise FileExistsError(f"The file {fname} already exists.")
+        fname.parent.mkdir(parents=True, exist_ok=True)
+        np.savez(fname, telemetry=self.samples, interval=np.array(self._interval))
+
+    @property
+    def samples(self) -> NDArray:
+        """Structured array of the samples in the ring, oldest first."""
+        with self._lock:
+            if self._n_samples <= self._samples.size:
+                return self._samples[: self._n_samples].copy()
+            idx = self._n_samples % self._samples.size
+            return np.concatenate((self._samples[idx:], self._samples[:idx]))
+
+    @property
+    def running(self) -> bool:
+        """Whether the sampler is running."""
+        return self._thread is not None
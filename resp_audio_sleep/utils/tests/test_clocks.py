@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import time
+
+import pytest
+from numpy.testing import assert_allclose
+
+from resp_audio_sleep.utils.clocks import ClockMapper
+
+
+def test_clock_mapper():
+    """Test the estimation of the offset and drift between 2 clocks."""
+    origin = time.perf_counter()
+
+    def target() -> float:
+        return 1000 + 1.001 * (time.perf_counter() - origin)
+
+    mapper = ClockMapper(time.perf_counter, target, n_samples=10)
+    assert mapper.n_samples == 1
+    assert mapper.drift == 0
+    now = time.perf_counter()
+    assert_allclose(mapper(now), target(), atol=1e-3)
+    for _ in range(10):
+        time.sleep(0.02)
+        mapper.update()
+    assert mapper.n_samples == 10
+    assert_allclose(mapper.drift, 0.001, rtol=0.05)
+    # conversion of a timestamp in the future
+    timestamp = time.perf_counter() + 1
+    assert_allclose(mapper(timestamp), 1000 + 1.001 * (timestamp - origin), atol=1e-4)
+    source, target_time, uncertainty = mapper.sample()
+    assert 0 <= uncertainty < 1e-3
+    assert_allclose(target_time, 1000 + 1.001 * (source - origin), atol=1e-3)
+
+
+def test_clock_mapper_thread():
+    """Test the background updates of the clock mapper."""
+    mapper = ClockMapper(time.perf_counter, time.monotonic)
+    mapper.start(interval=0.01)
+    with pytest.raises(RuntimeError, match="already running"):
+        mapper.start()
+    assert mapper.running
+    time.sleep(0.2)
+    mapper.stop()
+    assert not mapper.running
+    assert 2 < mapper.n_samples
+    offset = time.monotonic() - time.perf_counter()
+    assert_allclose(mapper.offset, offset, atol=1e-3)
+    with pytest.raises(ValueError, match="must be at least 2"):
+        ClockMapper(time.perf_counter, time.monotonic, n_samples=1)
+    with pytest.raises(TypeError, match="'target' must be an instance of"):
+        ClockMapper(time.perf_counter, 101)
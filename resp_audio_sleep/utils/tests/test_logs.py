@@ -1,13 +1,20 @@
 from __future__ import annotations
 
 import logging
+import re
+import time
+import warnings
+from logging.handlers import QueueHandler
 from typing import TYPE_CHECKING
 
 import pytest
 
 from resp_audio_sleep.utils.logs import (
+    _report_suppressed_warnings,
     _use_log_level,
     add_file_handler,
+    disable_queue_logging,
+    enable_queue_logging,
     logger,
     verbose,
     warn,
@@ -164,3 +171,69 @@ def test_warn(tmp_path: Path):
         lines = file.readlines()
     assert len(lines) == 1
     assert "Grrrrr" in lines[0]
+
+
+def test_queue_logging(tmp_path: Path):
+    """Test logging through the queue listener thread."""
+    handlers = logger.handlers[:]
+    fname = tmp_path / "logs.txt"
+    add_file_handler(fname, verbose="INFO")
+    enable_queue_logging()
+    enable_queue_logging()  # no-op
+    assert len(logger.handlers) == 1
+    assert isinstance(logger.handlers[0], QueueHandler)
+    fname2 = tmp_path / "logs2.txt"
+    add_file_handler(fname2)  # served by the listener
+    assert len(logger.handlers) == 1
+    with _use_log_level("INFO"):
+        for k in range(100):
+            logger.info("test %i", k)
+        logger.debug("debug")
+        with pytest.warns(RuntimeWarning, match="Grrrrr"):
+            warn("Grrrrr", RuntimeWarning)
+    disable_queue_logging()
+    disable_queue_logging()  # no-op
+    assert logger.handlers[: len(handlers)] == handlers
+    assert len(logger.handlers) == len(handlers) + 2
+    for handler in logger.handlers[len(handlers) :]:
+        handler.close()
+        logger.removeHandler(handler)
+    for file in (fname, fname2):
+        with open(file) as fid:
+            lines = fid.readlines()
+        assert len(lines) == 101
+        assert all(f"test {k}" in line for k, line in enumerate(lines[:100]))
+        assert "Grrrrr" in lines[-1]
+
+
+def test_warn_interval(caplog: pytest.LogCaptureFixture):
+    """Test rate-limited warnings."""
+    with warnings.catch_warnings(record=True) as records, _use_log_level("WARNING"):
+        warnings.simplefilter("always")
+        for _ in range(5):
+            warn("Spam", RuntimeWarning, interval=0.5)
+        assert len(records) == 1
+        assert str(records[0].message) == "Spam"
+        warn("Eggs", RuntimeWarning, interval=0.5)  # counted separately
+        assert len(records) == 2
+        time.sleep(0.6)
+        warn("Spam", RuntimeWarning, interval=0.5)
+        assert len(records) == 3
+        # the elapsed time is measured since the last emission, not the interval
+        match = re.search(
+            r"repeated 4 time\(s\) in the last (\d+\.\d) seconds",
+            str(records[-1].message),
+        )
+        assert match is not None
+        assert 0.6 <= float(match.group(1))
+        warn("Spam", RuntimeWarning, interval=0.5)
+        assert len(records) == 3
+        caplog.clear()
+        _report_suppressed_warnings()
+        assert "Spam (repeated 1 time(s) in the last 0.0 seconds)" in caplog.text
+        assert "Eggs" not in caplog.text
+        # the registry is cleared after the report
+        warn("Spam", RuntimeWarning, interval=0.5)
+        assert len(records) == 4
+        assert str(records[-1].message) == "Spam"
+    _report_suppressed_warnings()
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+from threading import Thread
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+import pytest
+
+from resp_audio_sleep.utils.metrics import Metrics, MetricsServer, render
+
+
+def test_metrics():
+    """Test the rendering of the metrics."""
+    metrics = Metrics(n_observations=10)
+    metrics.inc("peaks_detected")
+    metrics.inc("peaks_detected", 2)
+    metrics.set("heart_rate_bpm", 60.0)
+    metrics.register("recorder_fill", lambda: 0.5)
+    metrics.register("broken", lambda: 1 / 0)
+    for value in range(20):
+        metrics.observe("detection_latency_seconds", value)
+    text = metrics.render()
+    assert "# TYPE ras_peaks_detected_total counter" in text
+    assert "ras_peaks_detected_total 3\n" in text
+    assert "ras_peaks_detected_rate" not in text  # first rendering
+    assert "ras_heart_rate_bpm 60.0\n" in text
+    assert "ras_recorder_fill 0.5\n" in text
+    assert "ras_broken" not in text
+    # only the last 10 observations are kept
+    assert 'ras_detection_latency_seconds{quantile="0.5"} 14.5\n' in text
+    assert "ras_detection_latency_seconds_sum 190.0\n" in text
+    assert "ras_detection_latency_seconds_count 20\n" in text
+    metrics.inc("peaks_detected")
+    text = metrics.render()
+    assert "ras_peaks_detected_total 4\n" in text
+    assert "ras_peaks_detected_rate " in text
+    metrics.unregister("recorder_fill")
+    assert "ras_recorder_fill" not in metrics.render()
+    metrics.reset()
+    assert metrics.render() == "\n"
+    with pytest.raises(ValueError, match="must be strictly positive"):
+        Metrics(n_observations=0)
+
+
+def test_metrics_concurrency(monkeypatch: pytest.MonkeyPatch):
+    """Test the counters and the rates with concurrent writers and readers."""
+    metrics = Metrics()
+
+    def _increment() -> None:
+        for _ in range(10000):
+            metrics.inc("peaks_detected")
+
+    threads = [Thread(target=_increment) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert metrics.counters["peaks_detected"] == 40000
+    # the rate does not depend on the number of readers
+    clock = iter([0.0, 5.0, 5.0, 15.0])
+    monkeypatch.setattr(
+        "resp_audio_sleep.utils.metrics.time.monotonic", lambda: next(clock)
+    )
+    metrics.reset()
+    metrics.render()
+    metrics.inc("peaks_detected", 10)
+    for _ in range(2):  # 2 readers at t=5 s, measured since t=0 s
+        assert "ras_peaks_detected_rate 2.0\n" in metrics.render()
+    metrics.inc("peaks_detected", 20)
+    # at t=15 s, measured since the last snapshot older than the window, at t=5 s
+    assert "ras_peaks_detected_rate 2.0\n" in render((metrics,))
+
+
+def test_metrics_server():
+    """Test the HTTP endpoint serving the metrics."""
+    metrics = Metrics()
+    metrics.inc("stimuli_delivered")
+    server = MetricsServer(metrics, port=0)
+    assert server.port != 0
+    server.start()
+    assert server.running
+    with pytest.raises(RuntimeError, match="already running"):
+        server.start()
+    try:
+        with urlopen(f"http://127.0.0.1:{server.port}/metrics", timeout=5) as response:
+            assert response.status == 200
+            assert "ras_stimuli_delivered_total 1" in response.read().decode()
+        with pytest.raises(HTTPError, match="404"):
+            urlopen(f"http://127.0.0.1:{server.port}/unknown", timeout=5)
+    finally:
+        server.stop()
+    assert not server.running
+
+
+def test_render_registries():
+    """Test the rendering of several labelled registries."""
+    registries = [Metrics(labels={"bed": name}) for name in ("1", "2")]
+    for k, registry in enumerate(registries):
+        registry.inc("peaks_detected", k + 1)
+        registry.observe("detection_latency_seconds", 0.05)
+    text = render(registries)
+    assert text.count("# TYPE ras_peaks_detected_total counter") == 1
+    assert 'ras_peaks_detected_total{bed="1"} 1\n' in text
+    assert 'ras_peaks_detected_total{bed="2"} 2\n' in text
+    assert 'ras_detection_latency_seconds{bed="2",quantile="0.5"} 0.05\n' in text
+    assert 'ras_detection_latency_seconds_sum{bed="1"} ' in text
+    assert 'ras_detection_latency_seconds_count{bed="1"} 1\n' in text
+    with pytest.raises(TypeError, match="must be an instance of"):
+        Metrics(labels={"bed": 1})
@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+import pstats
+import time
+from typing import TYPE_CHECKING
+
+import pytest
+
+from resp_audio_sleep.utils.logs import _use_log_level
+from resp_audio_sleep.utils.profiler import Profiler
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+def _hot_function() -> None:
+    """Spin for a short time."""
+    start = time.perf_counter()
+    while time.perf_counter() - start < 0.05:
+        pass
+
+
+def test_profiler(tmp_path: Path, caplog: pytest.LogCaptureFixture):
+    """Test profiling the blocks of a session."""
+    profiler = Profiler(tmp_path / "profiles")
+    profiler.summary()  # no-op without block
+    for name in ("baseline", "synchronous-respiration"):
+        with profiler.block(name):
+            _hot_function()
+    assert profiler.n_blocks == 2
+    fnames = sorted(path.name for path in profiler.directory.iterdir())
+    assert fnames == ["01-baseline.prof", "02-synchronous-respiration.prof"]
+    stats = pstats.Stats(str(profiler.directory / fnames[0]))
+    assert any(func[2] == "_hot_function" for func in stats.stats)
+    caplog.clear()
+    with _use_log_level("INFO"):
+        profiler.summary(n_functions=5)
+    assert "across 2 block(s)" in caplog.text
+    assert "_hot_function" in caplog.text
+    # the profile is saved if the block raises
+    with pytest.raises(RuntimeError, match="Boom"), profiler.block("isochronous"):
+        raise RuntimeError("Boom")
+    assert (profiler.directory / "03-isochronous.prof").exists()
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import gc
+import os
+import sys
+from threading import Event, Thread
+
+import pytest
+
+from resp_audio_sleep.utils.realtime import realtime, release_thread
+
+
+def test_realtime_gc():
+    """Test the control of the garbage collection in real-time mode."""
+    assert gc.isenabled()
+    with realtime(priority=None) as report:
+        assert report == {"gc": True}
+        assert not gc.isenabled()
+        assert 0 < gc.get_freeze_count()
+    assert gc.isenabled()
+    assert gc.get_freeze_count() == 0
+
+
+def test_realtime_concurrent():
+    """Test the process-wide state shared by concurrent real-time blocks."""
+    entered = Event()
+    release = Event()
+
+    def _block() -> None:
+        with realtime(priority=None):
+            entered.set()
+            release.wait()
+
+    thread = Thread(target=_block)
+    with realtime(priority=None):
+        thread.start()
+        entered.wait()
+    # the other block is still running
+    assert not gc.isenabled()
+    assert 0 < gc.get_freeze_count()
+    release.set()
+    thread.join()
+    assert gc.isenabled()
+    assert gc.get_freeze_count() == 0
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="Linux only")
+def test_realtime_linux():
+    """Test the CPU affinity, scheduling priority and memory locking."""
+    affinity = os.sched_getaffinity(0)
+    policy = os.sched_getscheduler(0)
+    niceness = os.getpriority(os.PRIO_PROCESS, 0)
+    core = min(affinity)
+    with realtime([core], priority=10, mlock=True) as report:
+        assert set(report) == {"gc", "affinity", "priority", "mlock"}
+        assert report["affinity"]
+        assert os.sched_getaffinity(0) == {core}
+        # the priority and the memory locking depend on the privileges
+        assert isinstance(report["priority"], bool)
+        assert isinstance(report["mlock"], bool)
+    assert os.sched_getaffinity(0) == affinity
+    assert os.sched_getscheduler(0) == policy
+    assert os.getpriority(os.PRIO_PROCESS, 0) == niceness
+
+
+def test_realtime_invalid():
+    """Test the validation of the real-time mode arguments."""
+    with pytest.raises(ValueError, match="between 1 and 99"):
+        with realtime(priority=100):
+            pass
+    with pytest.raises(ValueError, match="at least one core"):
+        with realtime([]):
+            pass
+    assert gc.isenabled()
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="Linux only")
+def test_release_thread():
+    """Test the restoration of the scheduling in the helper threads."""
+    affinity = os.sched_getaffinity(0)
+    policy = os.sched_getscheduler(0)
+    states = dict()
+
+    def _helper(name: str, release: bool) -> None:
+        if release:
+            release_thread()
+        states[name] = (os.sched_getaffinity(0), os.sched_getscheduler(0))
+
+    release_thread()  # no-op outside of the real-time mode
+    assert os.sched_getaffinity(0) == affinity
+    with realtime([min(affinity)], priority=10) as report:
+        if not report["priority"] or os.sched_getscheduler(0) != os.SCHED_FIFO:
+            pytest.skip("SCHED_FIFO not permitted.")
+        for name, release in (("inherited", False), ("released", True)):
+            thread = Thread(target=_helper, args=(name, release))
+            thread.start()
+            thread.join()
+    assert states["inherited"] == ({min(affinity)}, os.SCHED_FIFO)
+    assert states["released"] == (affinity, policy)
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import time
+from typing import TYPE_CHECKING
+
+import numpy as np
+import pytest
+
+from resp_audio_sleep.utils.telemetry import TelemetrySampler
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+def test_telemetry(tmp_path: Path):
+    """Test sampling the resources of the process."""
+    sampler = TelemetrySampler(interval=0.05, n_samples=5)
+    assert sampler.samples.size == 0
+    sampler.summary()  # no-op without sample
+    sampler.start()
+    with pytest.raises(RuntimeError, match="already running"):
+        sampler.start()
+    start = time.perf_counter()
+    while time.perf_counter() - start < 0.5:  # keep the main thread busy
+        pass
+    sampler.stop()
+    assert not sampler.running
+    samples = sampler.samples
+    assert samples.size == 5  # the ring is full
+    assert np.all(np.diff(samples["time"]) > 0)  # oldest first
+    assert np.all(samples["rss"] > 0)
+    assert np.all(samples["n_threads"] >= 2)
+    assert np.all(samples["thread_ids"][:, 0] != 0)
+    # the busiest thread is the spinning main thread
+    assert np.all(samples["thread_cpu"][:, 0] > 20)
+    assert np.all(samples["thread_cpu"][:, 0] >= samples["thread_cpu"][:, 1])
+    sampler.summary(samples["time"][2])
+    sampler.save(tmp_path / "telemetry.npz")
+    with np.load(tmp_path / "telemetry.npz") as npz:
+        assert np.array_equal(npz["telemetry"], samples)
+    with pytest.raises(FileExistsError, match="already exists"):
+        sampler.save(tmp_path / "telemetry.npz")
+    with pytest.raises(ValueError, match="must be strictly positive"):
+        TelemetrySampler(interval=0)
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import time
+
+import pytest
+
+from resp_audio_sleep.utils.watchdog import Watchdog
+
+
+def _stalling_function(duration: float) -> None:
+    """Block the calling thread."""
+    time.sleep(duration)
+
+
+def test_watchdog():
+    """Test the capture of the stack of a stalled loop."""
+    watchdog = Watchdog(threshold=0.05, n_stalls=2)
+    watchdog.start()
+    with pytest.raises(RuntimeError, match="already running"):
+        watchdog.start()
+    time.sleep(0.2)  # not armed before the first heartbeat
+    assert watchdog.n_stalls == 0
+    for duration in (0.01, 0.2, 0.01, 0.01, 0.15, 0.01):
+        watchdog.heartbeat()
+        _stalling_function(duration)
+    watchdog.heartbeat(allowance=0.3)  # intended sleep
+    time.sleep(0.2)
+    watchdog.heartbeat(float("inf"))
+    time.sleep(0.2)
+    watchdog.stop()
+    assert not watchdog.running
+    assert watchdog.n_stalls == 2
+    stalls = watchdog.stalls
+    assert [stall["stack"][-1].name for stall in stalls] == ["_stalling_function"] * 2
+    assert 0.2 <= stalls[0]["duration"] < 0.4
+    assert 0.15 <= stalls[1]["duration"] < 0.35
+    watchdog.summary()
+    with pytest.raises(ValueError, match="must be strictly positive"):
+        Watchdog(threshold=0)
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import time
+from typing import TYPE_CHECKING
+
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose
+
+from resp_audio_sleep.utils.writer import AsyncWriter
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+def test_writer(tmp_path: Path):
+    """Test the asynchronous writer."""
+    writer = AsyncWriter(maxsize=2)
+    assert writer.n_pending == 0
+    writer.flush()  # no-op before the first submission
+    data = np.arange(10, dtype=float)
+    futures = [
+        writer.submit(np.savetxt, tmp_path / f"{k}.txt", data * k) for k in range(5)
+    ]
+    writer.flush()
+    assert writer.n_pending == 0
+    assert all(future.done() for future in futures)
+    for k in range(5):
+        assert_allclose(np.loadtxt(tmp_path / f"{k}.txt"), data * k)
+    # jobs are executed in order
+    results = []
+    writer.submit(time.sleep, 0.2)
+    writer.submit(results.append, 1)
+    future = writer.submit(results.append, 2)
+    assert future.result(timeout=2) is None
+    assert results == [1, 2]
+    writer.shutdown()
+    assert writer._thread is None
+
+
+def test_writer_errors(tmp_path: Path):
+    """Test error handling of the asynchronous writer."""
+    with pytest.raises(ValueError, match="must be strictly positive"):
+        AsyncWriter(maxsize=0)
+    writer = AsyncWriter()
+    with pytest.raises(TypeError, match="'func' must be an instance of"):
+        writer.submit(101)
+
+    def _raise():
+        raise RuntimeError("Boom")
+
+    future = writer.submit(_raise, description="boom")
+    with pytest.raises(RuntimeError, match="Boom"):
+        future.result(timeout=2)
+    # the writer is still operational after a failed job
+    future = writer.submit(np.savetxt, tmp_path / "test.txt", np.ones(3))
+    future.result(timeout=2)
+    assert (tmp_path / "test.txt").exists()
+    writer.shutdown()
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import sys
+import time
+import traceback
+from collections import Counter, deque
+from threading import Event, Thread, get_ident
+
+from ._checks import check_type, ensure_int
+from .logs import logger
+from .realtime import release_thread
+
+
+class Watchdog:
+    """Watchdog capturing the stack of a thread which stalls.
+
+    The monitored thread calls :meth:`~Watchdog.heartbeat` in its loop. If no heartbeat
+    is received within ``threshold`` seconds, plus the allowance of the last heartbeat,
+    the stack of the monitored thread is captured from a background thread. The stall
+    ends with the next heartbeat. The watchdog is armed by the first heartbeat, and a
+    heartbeat with an infinite allowance disarms it, e.g. after the loop.
+
+    Parameters
+    ----------
+    threshold : float
+        Delay in seconds without heartbeat after which the thread is stalled.
+    n_stalls : int
+        Number of stalls kept in the ring of recorded stalls.
+    """
+
+    def __init__(self, threshold: float = 0.05, n_stalls: int = 100) -> None:
+        check_type(threshold, ("numeric",), "threshold")
+        if threshold <= 0:
+            raise ValueError("The argument 'threshold' must be strictly positive.")
+        n_stalls = ensure_int(n_stalls, "n_stalls")
+        if n_stalls <= 0:
+            raise ValueError("The argument 'n_stalls' must be strictly positive.")
+        self._threshold = threshold
+        self._stalls = deque(maxlen=n_stalls)
+        self._n_stalls = 0
+        self._last = time.perf_counter()
+        self._deadline = float("inf")
+        self._ident = None
+        self._stop_event = Event()
+        self._thread = None
+
+    def heartbeat(self, allowance: float = 0.0) -> None:
+        """Signal that the monitored thread is alive.
+
+        Parameters
+        ----------
+        allowance : float
+            Additional delay in seconds before the next heartbeat is expected, e.g. the
+            duration of an intended sleep.
+        """
+        self._last = time.perf_counter()
+        self._deadline = self._last + allowance + self._threshold
+
+    def start(self) -> None:
+        """Start monitoring the calling thread."""
+        if self._thread is not None:
+            raise RuntimeError("The watchdog is already running.")
+        self._ident = get_ident()
+        self._deadline = float("inf")
+        self._stop_event.clear()
+        self._thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop monitoring."""
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self) -> None:
+        """Run the monitoring loop in the background thread."""
+        release_thread()
+        stall = None
+        while not self._stop_event.wait(self._threshold / 4):
+            if stall is not None:
+                if self._last == stall["last"]:
+                    continue  # still stalled
+                stall["duration"] = self._last - stall["last"]
+                stall = None
+            if time.perf_counter() <= self._deadline:
+                continue
+            frame = sys._current_frames().get(self._ident)
+            stall = {
+                "time": time.time(),
+                "last": self._last,
+                "duration": None,
+                "stack": [] if frame is None else traceback.extract_stack(frame),
+            }
+            del frame
+            self._stalls.append(stall)
+            self._n_stalls += 1
+        if stall is not None and self._last != stall["last"]:
+            stall["duration"] = self._last - stall["last"]
+
+    def summary(self) -> None:
+        """Log a summary of the recorded stalls."""
+        if self._n_stalls == 0:
+            logger.info("Watchdog: no stall.")
+            return
+        durations = [
+            stall["duration"] for stall in self._stalls if stall["duration"] is not None
+        ]
+        locations = Counter(
+            _format_frame(stall["stack"][-1])
+            for stall in self._stalls
+            if len(stall["stack"]) != 0
+        )
+        logger.info(
+            "Watchdog: %i stall(s), longest %.1f ms. Most frequent location(s): %s.",
+            self._n_stalls,
+            max(durations, default=float("nan")) * 1000,
+            "; ".join(
+                f"{location} ({count})" for location, count in locations.most_common(3)
+            ),
+        )
+        longest = max(self._stalls, key=lambda stall: stall["duration"] or 0)
+        logger.debug(
+            "Stack of the longest stall:\n%s",
+            "".join(traceback.format_list(longest["stack"])),
+        )
+
+    @property
+    def stalls(self) -> list[dict]:
+        """Recorded stalls, oldest first.
+
+        Each stall is a dictionary with the keys ``"time"``, the wall-clock time at
+        which the stall was detected, ``"last"``, the :func:`time.perf_counter` time of
+        the last heartbeat before the stall, ``"duration"``, the delay in seconds
+        between the heartbeats around the stall or None if the stall did not end, and
+        ``"stack"``, the :class:`traceback.StackSummary` of the stalled thread.
+        """
+        return list(self._stalls)
+
+    @property
+    def n_stalls(self) -> int:
+        """Number of stalls detected, including the stalls dropped from the ring."""
+        return self._n_stalls
+
+    @property
+    def running(self) -> bool:
+        """Whether the watchdog is running."""
+        return self._thread is not None
+
+
+def _format_frame(frame: traceback.FrameSummary) -> str:
+    """Format the location of a frame."""
+    return f"{frame.name} ({frame.filename}:{frame.lineno})"
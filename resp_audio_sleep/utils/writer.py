@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import atexit
+import time
+from concurrent.futures import Future
+from queue import Queue
+from threading import Lock, Thread
+from typing import TYPE_CHECKING
+
+from ._checks import check_type, ensure_int
+from .logs import logger
+from .realtime import release_thread
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from typing import Any
+
+
+class AsyncWriter:
+    """Writer serializing files in a background thread.
+
+    Jobs are executed in the order of submission by a single worker thread. The job
+    queue is bounded, thus a submission blocks if the worker is too far behind.
+
+    Parameters
+    ----------
+    maxsize : int
+        Maximum number of pending jobs.
+    """
+
+    def __init__(self, maxsize: int = 16) -> None:
+        maxsize = ensure_int(maxsize, "maxsize")
+        if maxsize <= 0:
+            raise ValueError("The argument 'maxsize' must be strictly positive.")
+        self._queue = Queue(maxsize=maxsize)
+        self._lock = Lock()
+        self._thread = None
+
+    def submit(
+        self, func: Callable, *args: Any, description: str | None = None, **kwargs: Any
+    ) -> Future:
+        """Submit a job to the writer.
+
+        Parameters
+        ----------
+        func : callable
+            The function to execute in the background thread.
+        *args : tuple
+            Positional arguments passed to ``func``.
+        description : str | None
+            Description of the job used in the logs.
+        **kwargs : dict
+            Keyword arguments passed to ``func``.
+
+        Returns
+        -------
+        future : Future
+            Future which completes when the job is done.
+        """
+        check_type(func, ("callable",), "func")
+        check_type(description, (str, None), "description")
+        description = func.__qualname__ if description is None else description
+        with self._lock:
+            if self._thread is None:
+                self._thread = Thread(target=self._run, daemon=True)
+                self._thread.start()
+        future = Future()
+        self._queue.put((future, func, args, kwargs, description))
+        return future
+
+    def flush(self) -> None:
+        """Block until all submitted jobs are complete."""
+        if self._thread is None:
+            return
+        self._queue.join()
+
+    def shutdown(self) -> None:
+        """Complete all submitted jobs and stop the background thread."""
+        with self._lock:
+            if self._thread is None:
+                return
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        """Execute the submitted jobs."""
+        release_thread()
+        while True:
+            job = self._queue.get()
+            if job is None:
+                self._queue.task_done()
+                break
+            future, func, args, kwargs, description = job
+            if future.set_running_or_notify_cancel():
+                start = time.perf_counter()
+                try:
+                    result = func(*args, **kwargs)
+                except Exception as error:
+                    logger.error("Background job '%s' failed: %s", description, error)
+                    future.set_exception(error)
+                else:
+                    logger.info(
+                        "Background job '%s' complete in %.3f seconds.",
+                        description,
+                        time.perf_counter() - start,
+                    )
+                    future.set_result(result)
+            self._queue.task_done()
+
+    @property
+    def n_pending(self) -> int:
+        """Number of jobs pending in the queue."""
+        return self._queue.unfinished_tasks
+
+
+writer = AsyncWriter()
+atexit.register(writer.shutdown)
@@ -1,15 +1,19 @@
 from __future__ import annotations
 
+import multiprocessing as mp
+import time
+from bisect import bisect_left
+from collections import deque
+from multiprocessing.shared_memory import SharedMemory
 from typing import TYPE_CHECKING
 
 import numpy as np
 from matplotlib import pyplot as plt
 
-from .utils._checks import check_type
+from .utils._checks import check_type, ensure_int
 from .utils._docs import fill_doc
 
 if TYPE_CHECKING:
-    import numpy as np
     from numpy.typing import NDArray
 
 
@@ -17,12 +21,19 @@ if TYPE_CHECKING:
 class Viewer:
     """Viewer of a real-time respiration and/or cardiac signal with peak detection.
 
+    The artists are created once and updated in place, and only the artists are
+    redrawn on top of a cached background (blitting). The signal is decimated to the
+    pixel width of the axes with a min/max envelope, and the redraws are throttled to
+    a target frame rate.
+
     Parameters
     ----------
     %(ecg_ch_name)s
     %(resp_ch_name)s
     ecg_height : float | None
         The height of the ECG peaks as a percentage of the data range, between 0 and 1.
+    fps : float
+        Maximum frame rate of the viewer. Frames received faster are dropped.
     """
 
     def __init__(
@@ -30,7 +41,11 @@ class Viewer:
         ecg_ch_name: str | None,
         resp_ch_name: str | None,
         ecg_height: float | None,
+        fps: float = 30,
     ) -> None:
+        check_type(fps, ("numeric",), "fps")
+        if fps <= 0:
+            raise ValueError("The argument 'fps' must be strictly positive.")
         if plt.get_backend() != "QtAgg":
             plt.switch_backend("QtAgg")
         if not plt.isinteractive():
@@ -47,10 +62,34 @@ class Viewer:
         elif resp_ch_name is not None:
             self._axes = {"resp": axes}
             axes.set_title(f"Respiration: {resp_ch_name}")
-        self._peaks = {"ecg": [], "resp": []}
+        self._peaks = {ch_type: deque() for ch_type in self._axes}
         self._ecg_height = ecg_height
+        self._period = 1 / fps
+        self._last_draw = {ch_type: -np.inf for ch_type in self._axes}
+        # create the artists once, the x-axis is the time relative to the last sample
+        self._artists = dict()
+        for ch_type, ax in self._axes.items():
+            ax.set_xlabel("Time (s)")
+            artists = {
+                "signal": ax.plot([], [], animated=True)[0],
+                "peaks": ax.plot([], [], color="red", linestyle="--", animated=True)[0],
+            }
+            if ch_type == "ecg":
+                artists["height"] = ax.axhline(
+                    0, color="green", linestyle="--", animated=True
+                )
+            self._artists[ch_type] = artists
+        self._background = None
+        self._fig.canvas.mpl_connect("draw_event", self._on_draw)
         plt.show()
 
+    def _on_draw(self, event) -> None:
+        """Cache the background and redraw the artists after a full draw."""
+        self._background = self._fig.canvas.copy_from_bbox(self._fig.bbox)
+        for ch_type, ax in self._axes.items():
+            for artist in self._artists[ch_type].values():
+                ax.draw_artist(artist)
+
     @fill_doc
     def plot(
         self, ts: NDArray[np.float64], data: NDArray[np.float64], ch_type: str
@@ -68,26 +107,37 @@ class Viewer:
         assert ts.ndim == 1
         assert data.ndim == 1
         # prune peaks outside of the viewing window
-        for k, peak in enumerate(self._peaks[ch_type]):
-            if ts[0] <= peak:
-                idx = k
-                break
-        else:
-            idx = 0
-        self._peaks[ch_type] = self._peaks[ch_type][idx:]
-        # update plotting window
-        self._axes[ch_type].clear()
-        self._axes[ch_type].plot(ts, data)
-        for peak in self._peaks[ch_type]:
-            self._axes[ch_type].axvline(peak, color="red", linestyle="--")
+        peaks = self._peaks[ch_type]
+        for _ in range(bisect_left(peaks, ts[0])):
+            peaks.popleft()
+        # throttle the redraws
+        now = time.perf_counter()
+        if now - self._last_draw[ch_type] < self._period:
+            return
+        self._last_draw[ch_type] = now
+        ax = self._axes[ch_type]
+        artists = self._artists[ch_type]
+        times, values = _decimate(ts - ts[-1], data, max(int(ax.bbox.width), 1))
+        artists["signal"].set_data(times, values)
+        # draw the peaks as a single line broken by NaNs
+        ymin, ymax = np.min(data), np.max(data)
+        x = np.repeat(np.array(peaks) - ts[-1], 3)
+        x[2::3] = np.nan
+        y = np.tile([ymin, ymax, np.nan], len(peaks))
+        artists["peaks"].set_data(x, y)
         if ch_type == "ecg":
             assert self._ecg_height is not None  # sanity-check
-            self._axes[ch_type].axhline(
-                np.percentile(data, self._ecg_height * 100),
-                color="green",
-                linestyle="--",
-            )
-        self._fig.canvas.draw()
+            height = np.percentile(data, self._ecg_height * 100)
+            artists["height"].set_ydata([height, height])
+        # a full redraw is required when the axes limits change
+        if _update_limits(ax, times[0], ymin, ymax) or self._background is None:
+            self._fig.canvas.draw()
+        else:
+            self._fig.canvas.restore_region(self._background)
+            for axes_ch_type, axes in self._axes.items():
+                for artist in self._artists[axes_ch_type].values():
+                    axes.draw_artist(artist)
+            self._fig.canvas.blit(self._fig.bbox)
         self._fig.canvas.flush_events()
 
     @fill_doc
@@ -103,3 +153,285 @@ class Viewer:
         check_type(peak, ("numeric",), "peak")
         assert 0 < peak
         self._peaks[ch_type].append(peak)
+
+
+def _decimate(
+    times: NDArray[np.float64], data: NDArray[np.float64], n_bins: int
+) -> tuple[NDArray[np.float64], NDArray[np.float64]]:
+    """Decimate a signal to a min/max envelope of ``n_bins`` bins.
+
+    Parameters
+    ----------
+    times : array of shape (n_samples,)
+        The times of the samples.
+    data : array of shape (n_samples,)
+        The signal to decimate.
+    n_bins : int
+        The number of bins, typically the pixel width of the axes.
+
+    Returns
+    -------
+    times : array of shape (n_points,)
+        The times of the decimated signal.
+    data : array of shape (n_points,)
+        The decimated signal, alternating the minimum and maximum of each bin.
+    """
+    bin_size = data.size // n_bins
+    if bin_size < 2:
+        return times, data
+    n_samples = bin_size * n_bins
+    # trim the oldest samples to fit an integer number of bins
+    bins = data[-n_samples:].reshape(n_bins, bin_size)
+    envelope = np.empty((n_bins, 2), dtype=data.dtype)
+    envelope[:, 0] = bins.min(axis=1)
+    envelope[:, 1] = bins.max(axis=1)
+    times = times[-n_samples:].reshape(n_bins, bin_size)[:, [0, -1]]
+    return times.ravel(), envelope.ravel()
+
+
+def _update_limits(ax, xmin: float, ymin: float, ymax: float) -> bool:
+    """Update the axes limits if the data does not fit anymore.
+
+    The x-limits are only updated if the window duration changes by more than 1%. The
+    y-limits are expanded with a margin when the data exceeds them, and shrunk when
+    the data range occupies less than half of them, to limit the number of full
+    redraws.
+
+    Returns
+    -------
+    updated : bool
+        True if the limits were updated.
+    """
+    updated = False
+    xlim = ax.get_xlim()
+    if xlim[1] != 0 or 0.01 * abs(xmin) < abs(xlim[0] - xmin):
+        ax.set_xlim(xmin, 0)
+        updated = True
+    ylim = ax.get_ylim()
+    margin = 0.1 * (ymax - ymin) if ymin != ymax else 1
+    if ymin < ylim[0] or ylim[1] < ymax or (ymax - ymin) < 0.5 * (ylim[1] - ylim[0]):
+        ax.set_ylim(ymin - margin, ymax + margin)
+        updated = True
+    return updated
+
+
+@fill_doc
+class ViewerProcess:
+    """Viewer running in a separate process, fed through shared memory.
+
+    The detector writes its buffer and the detected peaks in a shared-memory block
+    with a cheap copy, while a separate process renders the viewer at its own capped
+    frame rate. The API matches :class:`~resp_audio_sleep.viz.Viewer`.
+
+    Parameters
+    ----------
+    %(ecg_ch_name)s
+    %(resp_ch_name)s
+    ecg_height : float | None
+        The height of the ECG peaks as a percentage of the data range, between 0 and 1.
+    n_samples : int
+        Number of samples in the detector buffer.
+    fps : float
+        Maximum frame rate of the viewer.
+    """
+
+    def __init__(
+        self,
+        ecg_ch_name: str | None,
+        resp_ch_name: str | None,
+        ecg_height: float | None,
+        n_samples: int,
+        fps: float = 20,
+    ) -> None:
+        n_samples = ensure_int(n_samples, "n_samples")
+        check_type(fps, ("numeric",), "fps")
+        if fps <= 0:
+            raise ValueError("The argument 'fps' must be strictly positive.")
+        ch_types = [
+            ch_type
+            for ch_type, ch_name in (("ecg", ecg_ch_name), ("resp", resp_ch_name))
+            if ch_name is not None
+        ]
+        self._buffers = {ch_type: _SharedBuffer(n_samples) for ch_type in ch_types}
+        ctx = mp.get_context("spawn")
+        self._stop_event = ctx.Event()
+        self._process = ctx.Process(
+            target=_run_viewer_process,
+            args=(
+                ecg_ch_name,
+                resp_ch_name,
+                ecg_height,
+                n_samples,
+                {ch_type: buffer.name for ch_type, buffer in self._buffers.items()},
+                fps,
+                self._stop_event,
+            ),
+            daemon=True,
+        )
+        self._process.start()
+
+    def __del__(self) -> None:  # noqa: D105
+        if hasattr(self, "_process"):
+            self.close()
+
+    @fill_doc
+    def plot(
+        self, ts: NDArray[np.float64], data: NDArray[np.float64], ch_type: str
+    ) -> None:
+        """Publish the respiration or cardiac data to the viewer process.
+
+        Parameters
+        ----------
+        ts : array of shape (n_samples,)
+            Timestamps of the respiration or cardiac data.
+        data : array of shape (n_samples,)
+            Respiration or cardiac data.
+        %(ch_type)s
+        """
+        self._buffers[ch_type].write(ts, data)
+
+    @fill_doc
+    def add_peak(self, peak: float, ch_type: str) -> None:
+        """Publish a peak to the viewer process.
+
+        Parameters
+        ----------
+        peak : float
+            Timestamp of the peak.
+        %(ch_type)s
+        """
+        self._buffers[ch_type].add_peak(peak)
+
+    def close(self) -> None:
+        """Stop the viewer process and release the shared memory."""
+        if self._process.is_alive():
+            self._stop_event.set()
+            self._process.join(timeout=2)
+            if self._process.is_alive():
+                self._process.kill()
+        for buffer in self._buffers.values():
+            buffer.close(unlink=True)
+        self._buffers = dict()
+
+
+class _SharedBuffer:
+    """Shared-memory block holding a buffer of samples and a ring of peaks.
+
+    The block is protected by a sequence counter, odd while a write is in progress,
+    which lets the reader detect and discard torn frames without locking.
+
+    Parameters
+    ----------
+    n_samples : int
+        Number of samples in the buffer.
+    n_peaks : int
+        Number of peaks kept in the ring of peaks.
+    name : str | None
+        Name of an existing shared-memory block to attach to. If None, a new block is
+        created.
+    """
+
+    # header: sequence counter, number of peaks added
+    _N_HEADER: int = 2
+
+    def __init__(self, n_samples: int, n_peaks: int = 64, name: str | None = None):
+        self._n_samples = n_samples
+        self._n_peaks = n_peaks
+        size = (self._N_HEADER + 2 * n_samples + n_peaks) * 8
+        if name is None:
+            self._shm = SharedMemory(create=True, size=size)
+        else:
+            self._shm = SharedMemory(name=name)
+        self._header = np.ndarray(
+            (self._N_HEADER,), dtype=np.int64, buffer=self._shm.buf
+        )
+        array = np.ndarray(
+            (2 * n_samples + n_peaks,),
+            dtype=np.float64,
+            buffer=self._shm.buf,
+            offset=self._N_HEADER * 8,
+        )
+        self._ts = array[:n_samples]
+        self._data = array[n_samples : 2 * n_samples]
+        self._peaks = array[2 * n_samples :]
+        if name is None:
+            self._header[:] = 0
+
+    def write(self, ts: NDArray[np.float64], data: NDArray[np.float64]) -> None:
+        """Write a new frame of samples."""
+        assert ts.size == data.size == self._n_samples  # sanity-check
+        self._header[0] += 1
+        self._ts[:] = ts
+        self._data[:] = data
+        self._header[0] += 1
+
+    def read(
+        self, counter: int
+    ) -> tuple[int, NDArray[np.float64], NDArray[np.float64]] | None:
+        """Read the last frame if it is newer than ``counter`` and not torn."""
+        start = int(self._header[0])
+        if start == counter or start % 2 == 1:
+            return None
+        ts = self._ts.copy()
+        data = self._data.copy()
+        if int(self._header[0]) != start:
+            return None  # the frame was overwritten while reading
+        return start, ts, data
+
+    def add_peak(self, peak: float) -> None:
+        """Add a peak to the ring of peaks."""
+        self._peaks[self._header[1] % self._n_peaks] = peak
+        self._header[1] += 1
+
+    def get_peaks(self, n_read: int) -> tuple[int, NDArray[np.float64]]:
+        """Get the peaks added since ``n_read`` peaks were read."""
+        n_added = int(self._header[1])
+        idx = np.arange(max(n_read, n_added - self._n_peaks), n_added) % self._n_peaks
+        return n_added, self._peaks[idx]
+
+    def close(self, unlink: bool = False) -> None:
+        """Release the shared-memory block."""
+        del self._header, self._ts, self._data, self._peaks
+        self._shm.close()
+        if unlink:
+            self._shm.unlink()
+
+    @property
+    def name(self) -> str:
+        """Name of the shared-memory block."""
+        return self._shm.name
+
+
+def _run_viewer_process(
+    ecg_ch_name: str | None,
+    resp_ch_name: str | None,
+    ecg_height: float | None,
+    n_samples: int,
+    names: dict[str, str],
+    fps: float,
+    stop_event: mp.synchronize.Event,
+) -> None:
+    """Render the shared-memory buffers in the viewer process."""
+    buffers = {
+        ch_type: _SharedBuffer(n_samples, name=name) for ch_type, name in names.items()
+    }
+    viewer = Viewer(ecg_ch_name, resp_ch_name, ecg_height)
+    counters = {ch_type: 0 for ch_type in buffers}
+    n_peaks = {ch_type: 0 for ch_type in buffers}
+    period = 1 / fps
+    try:
+        while not stop_event.is_set():
+            start = time.perf_counter()
+            for ch_type, buffer in buffers.items():
+                n_peaks[ch_type], peaks = buffer.get_peaks(n_peaks[ch_type])
+                for peak in peaks:
+                    viewer.add_peak(float(peak), ch_type)
+                frame = buffer.read(counters[ch_type])
+                if frame is None:
+                    continue
+                counters[ch_type], ts, data = frame
+                viewer.plot(ts, data, ch_type)
+            plt.pause(max(period - (time.perf_counter() - start), 0.001))
+    finally:
+        for buffer in buffers.values():
+            buffer.close()